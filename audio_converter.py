@@ -1,42 +1,241 @@
-from asyncio.log import logger
+import logging
 import os
+import subprocess
+import sys
 import tempfile
+import wave
 from pydub import AudioSegment
+from pydub.utils import mediainfo
+
+from chunk_reader import MS_PER_SECOND, PcmStreamChunkReader, StderrTail, WavReader
+from pcm import ENGINE_SAMPLE_RATE, convert_pcm_blocks
+
+logger = logging.getLogger(__name__)
 
 # Supported input audio formats
 SUPPORTED_FORMATS = ['wav', 'mp3', 'flac', 'ogg', 'm4a']
+# Frames converted at a time, bounding the memory used for resampling
+CONVERSION_BLOCK_FRAMES = 1 << 20
+
+def _write_engine_wav(wav_path, blocks, sample_rate, sample_width, channels, target_rate):
+    """Writes PCM blocks to wav_path as 16-bit mono at target_rate."""
+    with wave.open(wav_path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(target_rate)
+        for pcm in convert_pcm_blocks(blocks, sample_width, channels, sample_rate, target_rate):
+            out.writeframes(pcm)
+
+def _temp_wav_path(temp_dir=None):
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False, dir=temp_dir) as temp_wav_file:
+        return temp_wav_file.name
+
+def _cleanup_for(wav_path):
+    def cleanup():
+        try:
+            os.remove(wav_path)
+        except OSError as e:
+            logger.warning(f"Could not remove temporary file {wav_path}: {e}")
+    return cleanup
+
+def _read_frame_blocks(source, start_frame, end_frame):
+    """Yields the frames from start_frame up to end_frame of an open WavReader, a block at a time."""
+    source.setpos(start_frame)
+    for position in range(start_frame, end_frame, CONVERSION_BLOCK_FRAMES):
+        yield source.readframes(min(CONVERSION_BLOCK_FRAMES, end_frame - position))
 
-def convert_to_wav(input_path):
+def _convert_wav(input_path, sample_rate, start_ms=0, end_ms=None, temp_dir=None):
     """
-    Converts an audio file to WAV format if needed.
-    Returns the path to the WAV file.
+    Resamples and downmixes start_ms to end_ms of a WAV file not already in
+    the engine format, seeking past the audio before start_ms; returns None
+    if it is in the engine format.
     """
+    try:
+        source = WavReader(input_path)
+    except (wave.Error, EOFError):
+        # Left for the chunk reader, which reports unreadable WAV files
+        return None
+    with source:
+        audio_format = (source.getframerate(), source.getsampwidth(), source.getnchannels())
+        if audio_format == (sample_rate, 2, 1):
+            return None
+        frames = source.getnframes()
+        start_frame = min(int(start_ms * audio_format[0] // MS_PER_SECOND), frames)
+        end_frame = frames if end_ms is None else min(int(end_ms * audio_format[0] // MS_PER_SECOND), frames)
+        wav_path = _temp_wav_path(temp_dir)
+        try:
+            _write_engine_wav(wav_path, _read_frame_blocks(source, start_frame, end_frame), *audio_format, sample_rate)
+        except Exception:
+            os.remove(wav_path)
+            raise
+    logger.info(f"Converted {audio_format[0]} Hz, {audio_format[2]}-channel WAV to {sample_rate} Hz mono.")
+    return wav_path, _cleanup_for(wav_path)
+
+def _check_format(input_path):
+    """Returns the file extension of input_path, raising ValueError for unsupported formats."""
     file_extension = os.path.splitext(input_path)[1][1:].lower()
     if file_extension not in SUPPORTED_FORMATS:
         raise ValueError(
             f"Unsupported audio format: '{file_extension}'. "
             f"Supported formats: {', '.join(SUPPORTED_FORMATS)}"
         )
-    # If already WAV, return as-is.
-    if file_extension == "wav":
-        return input_path
+    return file_extension
+
+def _ffmpeg_decode_command(input_path, sample_rate, channels, start_ms=0, end_ms=None):
+    """
+    Builds the ffmpeg command decoding input_path to s16le PCM on stdout. A
+    start or end time is given before -i, so ffmpeg seeks in the container
+    and never decodes the audio before start_ms.
+    """
+    command = [AudioSegment.converter, "-nostdin", "-loglevel", "error"]
+    if start_ms:
+        command += ["-ss", f"{start_ms / MS_PER_SECOND:.3f}"]
+    if end_ms is not None:
+        command += ["-t", f"{(end_ms - start_ms) / MS_PER_SECOND:.3f}"]
+    return command + [
+        "-i", input_path,
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate), "-ac", str(channels),
+        "-",
+    ]
+
+def _decode_range(input_path, sample_rate, start_ms=0, end_ms=None, temp_dir=None):
+    """Decodes [start_ms, end_ms) of a compressed file with ffmpeg into a temporary engine-format WAV."""
+    wav_path = _temp_wav_path(temp_dir)
+    try:
+        process = subprocess.Popen(_ffmpeg_decode_command(input_path, sample_rate, 1, start_ms, end_ms),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr = StderrTail(process.stderr)
+        with process, wave.open(wav_path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(sample_rate)
+            for pcm in iter(lambda: process.stdout.read(CONVERSION_BLOCK_FRAMES * 2), b""):
+                out.writeframes(pcm)
+            process.wait()
+            error = stderr.text()
+        if process.returncode != 0:
+            raise ValueError(f"Audio decoder exited with status {process.returncode}: {error}")
+    except Exception as e:
+        _cleanup_for(wav_path)()
+        raise ValueError(f"Failed to convert audio file '{input_path}': {e}")
+    return wav_path, _cleanup_for(wav_path)
+
+def probe_duration_ms(input_path):
+    """
+    Returns the duration of an audio file in milliseconds without decoding it:
+    WAV durations come from the header, others from ffprobe.
+    """
+    file_extension = _check_format(input_path)
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input audio file not found: '{input_path}'")
+    try:
+        if file_extension == "wav":
+            with WavReader(input_path) as source:
+                return round(source.getnframes() * MS_PER_SECOND / source.getframerate())
+        return round(float(mediainfo(input_path)["duration"]) * MS_PER_SECOND)
+    except Exception as e:
+        raise ValueError(f"Could not read the duration of '{input_path}': {e}")
 
+def needs_conversion(input_path, sample_rate=ENGINE_SAMPLE_RATE):
+    """Returns False for a WAV file that convert_to_wav would use as-is, True for anything it converts."""
+    if os.path.splitext(input_path)[1][1:].lower() != "wav":
+        return True
     try:
-        # Create a temporary WAV file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav_file:
-            wav_path = temp_wav_file.name
+        with WavReader(input_path) as source:
+            return (source.getframerate(), source.getsampwidth(), source.getnchannels()) != (sample_rate, 2, 1)
+    except (OSError, wave.Error, EOFError):
+        return False
+
+def convert_to_wav(input_path, sample_rate=ENGINE_SAMPLE_RATE, start_ms=0, end_ms=None, temp_dir=None):
+    """
+    Converts an audio file to a 16-bit mono WAV at sample_rate, the format
+    both engines work in, so chunks need no per-chunk resampling and carry no
+    extra channels or samples. Returns the input path if it already is such a
+    WAV file, otherwise (wav_path, cleanup) for a temporary file.
 
-        audio = AudioSegment.from_file(input_path, format=file_extension)
-        audio.export(wav_path, format="wav")
+    Only start_ms to end_ms of the recording is converted: compressed input
+    is decoded by ffmpeg, which seeks instead of decoding everything before
+    start_ms, and WAV input is read from start_ms on. The converted WAV then
+    begins at start_ms (see WavChunkReader's offset_ms); a WAV returned as-is
+    begins at 0. Fresh and ranged conversions go through the same decoder,
+    so they produce the same PCM for the same part of the recording.
+    The temporary file is created in temp_dir, or the system's default.
+    """
+    file_extension = _check_format(input_path)
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input audio file not found: '{input_path}'")
+    # WAV files in the engine format are used as-is
+    if file_extension == "wav":
+        return _convert_wav(input_path, sample_rate, start_ms, end_ms, temp_dir) or input_path
+    if start_ms or end_ms is not None:
+        logger.info(f"Decoding {start_ms / MS_PER_SECOND:g}s to "
+                    f"{'the end' if end_ms is None else f'{end_ms / MS_PER_SECOND:g}s'} of '{input_path}'.")
+    return _decode_range(input_path, sample_rate, start_ms, end_ms, temp_dir)
 
-        def cleanup():
-            try:
-                os.remove(wav_path)
-            except OSError as e:
-                logger.warning(f"Could not remove temporary file {wav_path}: {e}")
 
-        return wav_path, cleanup
-    except FileNotFoundError:
+def open_pcm_stream(input_path, chunk_duration=60, sample_rate=ENGINE_SAMPLE_RATE, channels=1,
+                    start_ms=0, end_ms=None, first_index=0):
+    """
+    Starts ffmpeg decoding input_path straight to s16le PCM on a pipe, resampled
+    to sample_rate and downmixed to `channels`. Returns a PcmStreamChunkReader
+    that yields chunks as ffmpeg produces them, so no intermediate WAV is written
+    and transcription can start before decoding has finished.
+
+    Chunks cover start_ms to end_ms of the recording. Decoding starts at chunk
+    first_index, seeking past the earlier chunks instead of decoding them.
+    """
+    _check_format(input_path)
+    if not os.path.exists(input_path):
         raise FileNotFoundError(f"Input audio file not found: '{input_path}'")
-    except Exception as e:
-        raise ValueError(f"Failed to convert audio file '{input_path}': {e}")
+
+    seek_ms = start_ms + first_index * chunk_duration * MS_PER_SECOND
+    if end_ms is not None:
+        seek_ms = min(seek_ms, end_ms)
+    command = _ffmpeg_decode_command(input_path, sample_rate, channels, seek_ms, end_ms)
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise ValueError(f"Failed to start ffmpeg to decode '{input_path}': {e}")
+    return PcmStreamChunkReader(process.stdout, sample_rate, sample_width=2, channels=channels,
+                                chunk_duration=chunk_duration, process=process,
+                                start_ms=start_ms, first_index=first_index)
+
+def _ffmpeg_live_command(source, sample_rate, channels, input_format=None):
+    """
+    Builds the ffmpeg command decoding live input to s16le PCM on stdout.
+    Probing is kept short and input buffering off, so the first PCM comes out
+    as soon as a little audio has arrived.
+    """
+    command = [AudioSegment.converter, "-nostdin", "-loglevel", "error",
+               "-fflags", "nobuffer", "-probesize", "32768"]
+    if input_format:
+        command += ["-f", input_format]
+    return command + [
+        "-i", "pipe:0" if source == "-" else source,
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate), "-ac", str(channels),
+        "-",
+    ]
+
+def open_live_stream(source, chunk_duration=60, input_format=None, sample_rate=ENGINE_SAMPLE_RATE, channels=1):
+    """
+    Opens live audio, from standard input if source is "-" or else from a
+    named pipe, and returns a PcmStreamChunkReader whose chunks come out as
+    the audio arrives. With input_format "s16le" the input is raw 16-bit PCM
+    at sample_rate with `channels` channels and is read directly. Any other
+    input is decoded by ffmpeg (input_format, if given, is passed as its -f)
+    into ENGINE_SAMPLE_RATE mono PCM.
+    """
+    if input_format == "s16le":
+        stream = sys.stdin.buffer if source == "-" else open(source, "rb")
+        return PcmStreamChunkReader(stream, sample_rate, sample_width=2, channels=channels, chunk_duration=chunk_duration)
+
+    command = _ffmpeg_live_command(source, ENGINE_SAMPLE_RATE, 1, input_format)
+    try:
+        # ffmpeg reads "-" from the standard input it inherits
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise ValueError(f"Failed to start ffmpeg to decode live input '{source}': {e}")
+    return PcmStreamChunkReader(process.stdout, ENGINE_SAMPLE_RATE, sample_width=2, channels=1,
+                                chunk_duration=chunk_duration, process=process)
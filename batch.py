@@ -0,0 +1,172 @@
+import glob
+import json
+import logging
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_converter import convert_to_wav, SUPPORTED_FORMATS
+from transcriber import EngineOptions, OutputOptions, transcribe_audio_in_chunks, create_executor
+from output_formatter import open_writers
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(manifest_path):
+    """Returns the entries of a manifest file, one path or glob per line."""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def collect_inputs(inputs, manifest_path=None):
+    """
+    Expands file paths, directories and glob patterns into a de-duplicated list
+    of input files, keeping the order of the entries. Directories contribute
+    every file with a supported audio extension. Plain paths are kept even if
+    they do not exist, so they are reported as failures instead of dropped.
+    """
+    entries = list(inputs)
+    if manifest_path:
+        entries.extend(read_manifest(manifest_path))
+
+    paths = []
+    for entry in entries:
+        if os.path.isdir(entry):
+            matches = sorted(
+                os.path.join(entry, name) for name in os.listdir(entry)
+                if os.path.splitext(name)[1][1:].lower() in SUPPORTED_FORMATS
+            )
+        elif glob.has_magic(entry):
+            matches = sorted(glob.glob(entry))
+            if not matches:
+                logger.warning(f"Pattern '{entry}' did not match any files.")
+        else:
+            matches = [entry]
+        paths.extend(matches)
+
+    seen = set()
+    return [path for path in paths if not (path in seen or seen.add(path))]
+
+
+def _output_paths(input_paths, output_dir, output_formats):
+    """
+    Maps each input to {format: OUTPUT_DIR/<name>.<format>}, numbering clashing
+    names. All formats of one input share the same name.
+    """
+    if isinstance(output_formats, str):
+        output_formats = [output_formats]
+    used = set()
+    outputs = []
+    for path in input_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = stem
+        counter = 1
+        while name in used:
+            name = f"{stem}_{counter}"
+            counter += 1
+        used.add(name)
+        outputs.append({output_format: os.path.join(output_dir, f"{name}.{output_format}") for output_format in output_formats})
+    return outputs
+
+
+def _convert(input_path, metrics=None, conversion_cache=None, temp_dir=None):
+    """
+    Converts one input to WAV, through the conversion cache if one is given,
+    otherwise into temp_dir; returns (wav_path, cleanup).
+    """
+    with metrics.time("conversion") if metrics is not None else nullcontext():
+        if conversion_cache is not None:
+            wav_path, _, cleanup = conversion_cache.convert(input_path)
+            return wav_path, cleanup
+        result = convert_to_wav(input_path, temp_dir=temp_dir)
+    if isinstance(result, tuple):
+        return result
+    return result, lambda: None
+
+
+def run_batch(input_paths, output_dir, chunk_duration=60, language="id-ID", output_format="txt",
+              engine="google", temp_dir=None, engine_options=None,
+              summary_path=None, metrics=None, conversion_cache=None, **transcribe_options):
+    """
+    Transcribes every input into output_dir, one file per output format
+    (output_format may be a single format or a list), and returns a list of per-file status
+    dictionaries, which are also written to summary_path as JSON.
+    engine_options (a transcriber.EngineOptions) and the other
+    transcribe_options are passed through to transcribe_audio_in_chunks.
+
+    The engine is shared across files: the faster-whisper model is loaded once per
+    process and any worker pool is created once for the whole batch. The next
+    file is decoded in the background while the current one is transcribed, and
+    a failing file is recorded in the summary without stopping the run.
+    With metrics, the timings of all files are collected into the one job.
+    With a conversion_cache (a ConversionCache), inputs converted in earlier
+    runs, or earlier in this one, are not decoded again.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if summary_path is None:
+        summary_path = os.path.join(output_dir, "batch_summary.json")
+    output_paths = _output_paths(input_paths, output_dir, output_format)
+
+    engine_options = engine_options or EngineOptions()
+    executor, max_in_flight = create_executor(engine, engine_options.concurrency, engine_options.workers,
+                                              engine_options.cpu_threads, engine_options.whisper_options())
+    pool = (executor, max_in_flight) if executor is not None else None
+    results = []
+
+    with ThreadPoolExecutor(max_workers=1) as decoder:
+        next_conversion = decoder.submit(_convert, input_paths[0], metrics, conversion_cache, temp_dir) if input_paths else None
+        try:
+            for index, (input_path, paths) in enumerate(zip(input_paths, output_paths)):
+                output_path = next(iter(paths.values()))
+                conversion = next_conversion
+                # Start decoding the next file before transcribing this one
+                next_conversion = decoder.submit(_convert, input_paths[index + 1], metrics, conversion_cache, temp_dir) if index + 1 < len(input_paths) else None
+
+                started_at = time.monotonic()
+                status = {"input": input_path, "output": output_path, "outputs": paths}
+                cleanup = None
+                try:
+                    wav_path, cleanup = conversion.result()
+                    with open_writers(paths) as writer:
+                        chunks = transcribe_audio_in_chunks(
+                            wav_path,
+                            chunk_duration=chunk_duration,
+                            language=language,
+                            engine=engine,
+                            engine_options=engine_options,
+                            pool=pool,
+                            output=OutputOptions(on_chunk=writer.write_chunk, metrics=metrics),
+                            **transcribe_options
+                        )
+                    status.update({
+                        "status": "ok",
+                        "chunks": len(chunks),
+                        "audio_seconds": chunks[-1]["end_time"] if chunks else 0.0,
+                    })
+                    logger.info(f"[{index + 1}/{len(input_paths)}] Transcribed '{input_path}' to '{output_path}'.")
+                except Exception as e:
+                    status.update({"status": "failed", "error": str(e)})
+                    if metrics is not None:
+                        metrics.increment("files_failed")
+                    logger.error(f"[{index + 1}/{len(input_paths)}] Failed to transcribe '{input_path}': {e}")
+                finally:
+                    if cleanup is not None:
+                        cleanup()
+                status["elapsed_seconds"] = round(time.monotonic() - started_at, 3)
+                results.append(status)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            # An interrupted run may leave the prefetched file converted but unused
+            if next_conversion is not None and not next_conversion.cancel():
+                try:
+                    next_conversion.result()[1]()
+                except Exception:
+                    pass
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"total": len(results), "succeeded": len(results) - failed, "failed": failed, "files": results}, f, indent=2)
+    logger.info(f"Batch finished: {len(results) - failed} succeeded, {failed} failed. Summary saved to '{summary_path}'.")
+    return results
@@ -0,0 +1,93 @@
+import hashlib
+import threading
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import speech_recognition as sr
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do"]
+# Words of fake transcript per second of audio, roughly conversational speech
+WORDS_PER_SECOND = 2.5
+
+
+class FakeEngine:
+    """
+    Deterministic stand-in for the Google API request and WhisperModel. Each call
+    sleeps for `latency` seconds plus up to `jitter`, then returns placeholder
+    text or fails. Outcomes depend only on the chunk audio and seed, so
+    repeated runs fail the same chunks whatever order they run in.
+    error_rate of calls raise a request error; unrecognized_rate of calls
+    report no speech. engine_seconds totals the simulated latency.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, unrecognized_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unrecognized_rate = unrecognized_rate
+        self.seed = seed
+        self.calls = 0
+        self.errors = 0
+        self.engine_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _draws(self, audio_bytes):
+        digest = hashlib.sha256(self.seed.to_bytes(8, "little") + audio_bytes).digest()
+        return int.from_bytes(digest[:8], "little") / 2 ** 64, int.from_bytes(digest[8:16], "little") / 2 ** 64
+
+    def _respond(self, audio_bytes, audio_seconds, unrecognized_error, request_error):
+        outcome, jitter = self._draws(audio_bytes)
+        delay = self.latency + self.jitter * jitter
+        with self._lock:
+            self.calls += 1
+            self.engine_seconds += delay
+        time.sleep(delay)
+        if outcome < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise request_error("injected failure")
+        if outcome < self.error_rate + self.unrecognized_rate:
+            raise unrecognized_error()
+        offset = int(outcome * 2 ** 32)
+        return " ".join(WORDS[(offset + i) % len(WORDS)] for i in range(max(1, int(audio_seconds * WORDS_PER_SECOND))))
+
+    def recognize(self, pcm, sample_rate, language="en-US", **kwargs):
+        """Replacement for google_engine.recognize."""
+        audio_seconds = len(pcm) / 2 / sample_rate
+        return self._respond(pcm, audio_seconds, sr.UnknownValueError, sr.RequestError)
+
+    def whisper_model(self, model_size, device="cpu", compute_type="int8", cpu_threads=0):
+        """Replacement for faster_whisper.WhisperModel."""
+        engine = self
+
+        class _NoSpeech(Exception):
+            pass
+
+        class FakeWhisperModel:
+            def transcribe(self, samples, beam_size=5, language=None, word_timestamps=False):
+                audio_seconds = len(samples) / 16000
+                try:
+                    text = engine._respond(samples.tobytes(), audio_seconds, _NoSpeech, RuntimeError)
+                except _NoSpeech:
+                    return iter([]), SimpleNamespace(language=language)
+                segment = SimpleNamespace(text=text, start=0.0, end=audio_seconds, avg_logprob=-0.2, words=None)
+                return iter([segment]), SimpleNamespace(language=language)
+
+        return FakeWhisperModel()
+
+    def install(self, engine):
+        """Context manager that routes `engine` ('google' or 'faster-whisper') to this fake."""
+        fake = self
+        stack = ExitStack()
+        if engine == "google":
+            import google_engine
+            stack.enter_context(patch.object(google_engine, "recognize", fake.recognize))
+        elif engine == "faster-whisper":
+            import whisper_engine
+            stack.enter_context(patch.object(whisper_engine, "WhisperModel", self.whisper_model))
+            stack.enter_context(patch.object(whisper_engine, "FASTER_WHISPER_MODEL", None))
+        else:
+            raise ValueError(f"Unsupported transcription engine: {engine}")
+        return stack
@@ -0,0 +1,220 @@
+"""
+Benchmark of the per-chunk cost of a Google engine request against a local
+stub endpoint that answers at once, so the timings are the client-side
+overhead. It compares speech_recognition's recognize_google, the baseline,
+which encodes FLAC with the flac tool and opens a new connection per
+request, with the same FLAC over a keep-alive connection from a
+ConnectionPool, and with google_engine posting the raw PCM as audio/l16
+over one. The encoding of each chunk is timed on its own as well.
+--connect-latency makes the stub wait before serving every new
+connection, standing in for the TCP and TLS handshakes with the real
+endpoint. Without a flac tool only the audio/l16 path runs. The run fails
+if a path is slower than the baseline by more than --max-slowdown:
+
+    python -m benchmarks.google_requests --durations 5 15 60 --requests 20 --connect-latency 0.05 --output google_results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import speech_recognition as sr
+from speech_recognition.audio import get_flac_converter
+
+import google_engine
+from pcm import ENGINE_SAMPLE_RATE
+from tuning import synthetic_clip
+
+logger = logging.getLogger(__name__)
+
+STUB_RESPONSE = ('{"result":[]}\n{"result":[{"alternative":[{"transcript":"stub"}],"final":true}],"result_index":0}\n').encode()
+
+
+class StubServer:
+    """
+    Local stand-in for the Google speech endpoint; records the size of every
+    request body and counts connections. Every new connection waits
+    connect_latency seconds before it is served.
+    """
+
+    def __init__(self, latency=0.0, connect_latency=0.0):
+        body_sizes = self.body_sizes = []
+        server = self
+        self.connections = 0
+
+        class StubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this a kept connection waits on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+                time.sleep(connect_latency)
+
+            def do_POST(self):
+                body_sizes.append(len(self.rfile.read(int(self.headers["Content-Length"]))))
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(STUB_RESPONSE)))
+                self.end_headers()
+                self.wfile.write(STUB_RESPONSE)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/speech-api/v2/recognize"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _recognize_google(pcm, url, session):
+    return sr.Recognizer().recognize_google(sr.AudioData(pcm, ENGINE_SAMPLE_RATE, 2), language="en-US", endpoint=url)
+
+
+def _flac_keep_alive(pcm, url, session):
+    flac_data = sr.AudioData(pcm, ENGINE_SAMPLE_RATE, 2).get_flac_data()
+    return session.post(url, flac_data, {"Content-Type": f"audio/x-flac; rate={ENGINE_SAMPLE_RATE}"})
+
+
+def _keep_alive(pcm, url, session):
+    return google_engine.transcribe(pcm, (ENGINE_SAMPLE_RATE, 2, 1), "en-US", endpoint=url, session=session)["text"]
+
+
+def _encode_flac(pcm):
+    return sr.AudioData(pcm, ENGINE_SAMPLE_RATE, 2).get_flac_data()
+
+
+def _encode_l16(pcm):
+    return google_engine._pcm16_mono(pcm, ENGINE_SAMPLE_RATE, 2, 1)[0]
+
+
+BASELINE_PATH = "recognize_google"
+PATHS = {BASELINE_PATH: _recognize_google, "flac_keep_alive": _flac_keep_alive, "keep_alive": _keep_alive}
+# Paths and encodings that run the flac tool
+FLAC_PATHS = {BASELINE_PATH, "flac_keep_alive"}
+ENCODINGS = {"flac": _encode_flac, "l16": _encode_l16}
+# Median slowdown against the baseline tolerated before the run fails, for timing noise
+DEFAULT_MAX_SLOWDOWN = 0.1
+
+
+def run_path(path, pcm, requests, server):
+    """Sends the chunk `requests` times through one path and returns its timing record."""
+    request = PATHS[path]
+    with google_engine.ConnectionPool(pool_size=1) as session:
+        # One untimed request warms up imports and lookup tables (and opens the kept connection)
+        request(pcm, server.url, session)
+        connections = server.connections
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            request(pcm, server.url, session)
+            timings.append(time.perf_counter() - started)
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "request_bytes": server.body_sizes[-1],
+        "connections": server.connections - connections,
+    }
+
+
+def time_encoding(encoding, pcm, requests):
+    """Encodes the chunk `requests` times as a request body and returns its timing record."""
+    encode = ENCODINGS[encoding]
+    encode(pcm)
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        body = encode(pcm)
+        timings.append(time.perf_counter() - started)
+    return {"median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000, "bytes": len(body)}
+
+
+def find_regressions(results, max_slowdown=DEFAULT_MAX_SLOWDOWN):
+    """Returns a line for every path whose median is slower than the baseline's by more than max_slowdown."""
+    regressions = []
+    for case in results["cases"]:
+        baseline = case["paths"].get(BASELINE_PATH)
+        if baseline is None:
+            continue
+        for path, stats in case["paths"].items():
+            if stats["median_ms"] > baseline["median_ms"] * (1 + max_slowdown):
+                regressions.append(f"{case['chunk_seconds']:g}s chunk: {path} {stats['median_ms']:.1f} ms is slower "
+                                   f"than {BASELINE_PATH} {baseline['median_ms']:.1f} ms")
+    return regressions
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Per-chunk overhead of Google engine requests against a local stub.")
+    parser.add_argument("--durations", nargs="+", type=float, default=[5, 15, 60],
+                        help="Chunk lengths in seconds (default: 5 15 60)")
+    parser.add_argument("--requests", type=int, default=20, help="Timed requests per chunk length and path (default: 20)")
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="Seconds the stub waits before serving each new connection, standing in for "
+                             "TCP and TLS setup (default: 0)")
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help="Fraction by which a path's median may exceed the recognize_google baseline before "
+                             f"the run fails (default: {DEFAULT_MAX_SLOWDOWN:g})")
+    parser.add_argument("--output", default="google_results.json", help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments(argv)
+    paths, encodings = list(PATHS), list(ENCODINGS)
+    try:
+        get_flac_converter()
+    except OSError:
+        logger.warning("No flac tool found; only the audio/l16 path is measured.")
+        paths = [path for path in paths if path not in FLAC_PATHS]
+        encodings.remove("flac")
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "settings": {"requests": args.requests, "sample_rate": ENGINE_SAMPLE_RATE, "connect_latency": args.connect_latency,
+                     "max_slowdown": args.max_slowdown},
+        "cases": [],
+    }
+    with StubServer(connect_latency=args.connect_latency) as server:
+        for seconds in args.durations:
+            pcm = (synthetic_clip(seconds) * 32767).astype("<i2").tobytes()
+            case = {"chunk_seconds": seconds, "pcm_bytes": len(pcm),
+                    "encodings": {encoding: time_encoding(encoding, pcm, args.requests) for encoding in encodings},
+                    "paths": {path: run_path(path, pcm, args.requests, server) for path in paths}}
+            logger.info(f"{seconds:g}s chunk encoding: " + ", ".join(
+                f"{encoding} {stats['median_ms']:.2f} ms ({stats['bytes']} bytes)"
+                for encoding, stats in case["encodings"].items()))
+            logger.info(f"{seconds:g}s chunk: " + ", ".join(
+                f"{path} {stats['median_ms']:.1f} ms ({stats['request_bytes']} bytes, {stats['connections']} connections)"
+                for path, stats in case["paths"].items()))
+            results["cases"].append(case)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results saved to '{args.output}'.")
+    regressions = find_regressions(results, args.max_slowdown)
+    if regressions:
+        sys.exit("Slower than the baseline:\n" + "\n".join(regressions))
+    return results
+
+
+if __name__ == "__main__":
+    main()
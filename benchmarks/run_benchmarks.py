@@ -0,0 +1,219 @@
+"""
+Offline benchmark of the conversion, transcription and formatting stages.
+
+Generates synthetic WAV/MP3 inputs, transcribes them with a fake engine of
+configurable latency and error rate, and writes the measurements as JSON:
+
+    python -m benchmarks.run_benchmarks --durations 60 600 --latency 0.05 --output results.json
+    python -m benchmarks.run_benchmarks --baseline old_results.json --output new_results.json
+
+Every stage runs in a freshly spawned process, so its peak RSS is not
+inflated by earlier stages.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks.fake_engine import FakeEngine
+from benchmarks.synthetic_audio import ffmpeg_available, make_input
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ["txt", "srt", "vtt"]
+
+
+def _rss_mb():
+    """Current resident set size in MB (Linux), or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(function, *args, **kwargs):
+    baseline_rss_mb = _rss_mb()
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    stats = {
+        "seconds": time.perf_counter() - started,
+        "baseline_rss_mb": baseline_rss_mb,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return result, stats
+
+
+def _stage_convert(input_path):
+    from audio_converter import convert_to_wav
+
+    result, stats = _measure(convert_to_wav, input_path)
+    # The caller removes the converted file once the case is finished
+    return result[0] if isinstance(result, tuple) else result, stats
+
+
+def _stage_transcribe(wav_path, engine, chunk_duration, concurrency, fake_options):
+    from transcriber import EngineOptions, transcribe_audio_in_chunks
+
+    fake = FakeEngine(**fake_options)
+    with fake.install(engine):
+        chunks, stats = _measure(transcribe_audio_in_chunks, wav_path, chunk_duration=chunk_duration,
+                                 language="en-US", engine=engine,
+                                 engine_options=EngineOptions(concurrency=concurrency))
+    audio_seconds = chunks[-1]["end_time"] if chunks else 0.0
+    parallelism = concurrency if engine == "google" else 1
+    stats.update({
+        "chunks": len(chunks),
+        "audio_seconds": audio_seconds,
+        "audio_seconds_per_wall_second": audio_seconds / stats["seconds"] if stats["seconds"] else None,
+        "engine_seconds": fake.engine_seconds,
+        # Wall time not explained by the simulated engine latency, spread over the chunks
+        "per_chunk_overhead_ms": max(0.0, stats["seconds"] - fake.engine_seconds / parallelism) / len(chunks) * 1000
+        if chunks else None,
+        "engine_calls": fake.calls,
+        "failed_chunks": sum(1 for chunk in chunks if chunk["status"] == "failed"),
+    })
+    return chunks, stats
+
+
+def _stage_format(chunks, output_format):
+    from output_formatter import format_transcription
+
+    text, stats = _measure(format_transcription, chunks, output_format)
+    stats["output_bytes"] = len(text.encode("utf-8"))
+    return None, stats
+
+
+def _run_stage(stage, *args):
+    # Child processes keep quiet; the parent reports the results
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.setdefault("TQDM_DISABLE", "1")
+    return stage(*args)
+
+
+def _in_fresh_process(stage, *args):
+    """Runs a stage in a newly spawned interpreter and returns its (result, stats)."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_run_stage, stage, *args).result()
+
+
+def run_case(directory, input_format, seconds, engine, chunk_duration, concurrency, fake_options):
+    """Benchmarks one synthetic input through all three stages and returns the case record."""
+    input_path = make_input(directory, input_format, seconds)
+    case = {"input_format": input_format, "audio_seconds": seconds, "input_bytes": os.path.getsize(input_path)}
+    wav_path, convert_stats = _in_fresh_process(_stage_convert, input_path)
+    try:
+        chunks, transcribe_stats = _in_fresh_process(_stage_transcribe, wav_path, engine, chunk_duration,
+                                                     concurrency, fake_options)
+    finally:
+        if wav_path != input_path:
+            os.remove(wav_path)
+        os.remove(input_path)
+    case["stages"] = {
+        "convert_to_wav": convert_stats,
+        "transcribe_audio_in_chunks": transcribe_stats,
+        "format_transcription": {
+            output_format: _in_fresh_process(_stage_format, chunks, output_format)[1] for output_format in OUTPUT_FORMATS
+        },
+    }
+    return case
+
+
+def compare(baseline, results):
+    """Returns lines comparing stage timings of matching cases in two result files."""
+    def timings(run):
+        flat = {}
+        for case in run["cases"]:
+            if "stages" not in case:
+                continue
+            key = f"{case['input_format']} {case['audio_seconds']}s"
+            flat[f"{key} convert_to_wav"] = case["stages"]["convert_to_wav"]["seconds"]
+            flat[f"{key} transcribe_audio_in_chunks"] = case["stages"]["transcribe_audio_in_chunks"]["seconds"]
+            for output_format, stats in case["stages"]["format_transcription"].items():
+                flat[f"{key} format_transcription[{output_format}]"] = stats["seconds"]
+        return flat
+
+    old, new = timings(baseline), timings(results)
+    lines = []
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name] / old[name] if old[name] else float("inf")
+        lines.append(f"{name}: {old[name]:.3f}s -> {new[name]:.3f}s ({ratio:.2f}x)")
+    return lines
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of conversion, transcription and formatting.")
+    parser.add_argument("--durations", nargs="+", type=float, default=[60, 600],
+                        help="Lengths of the synthetic inputs in seconds (default: 60 600)")
+    parser.add_argument("--formats", nargs="+", default=["wav", "mp3"], choices=["wav", "mp3"],
+                        help="Input formats to generate; MP3 needs ffmpeg and is skipped without it (default: wav mp3)")
+    parser.add_argument("--engine", default="google", choices=["google", "faster-whisper"],
+                        help="Engine whose code path is exercised with the fake backend (default: google)")
+    parser.add_argument("--chunk", type=int, default=60, help="Chunk duration in seconds (default: 60)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Google requests in flight (default: 1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated engine latency per chunk in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of engine calls that fail")
+    parser.add_argument("--unrecognized-rate", type=float, default=0.0,
+                        help="Fraction of engine calls that find no speech")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake engine's outcomes")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare the timings against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments(argv)
+    fake_options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                    "unrecognized_rate": args.unrecognized_rate, "seed": args.seed}
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "settings": {"engine": args.engine, "chunk": args.chunk, "concurrency": args.concurrency, **fake_options},
+        "cases": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for input_format in args.formats:
+            for seconds in args.durations:
+                if input_format == "mp3" and not ffmpeg_available():
+                    logger.warning(f"Skipping {input_format} {seconds:g}s: ffmpeg not found.")
+                    results["cases"].append({"input_format": input_format, "audio_seconds": seconds,
+                                             "skipped": "ffmpeg not found"})
+                    continue
+                case = run_case(directory, input_format, seconds, args.engine, args.chunk, args.concurrency,
+                                fake_options)
+                transcribe = case["stages"]["transcribe_audio_in_chunks"]
+                logger.info(f"{input_format} {seconds:g}s: convert {case['stages']['convert_to_wav']['seconds']:.2f}s, "
+                            f"transcribe {transcribe['seconds']:.2f}s "
+                            f"({transcribe['audio_seconds_per_wall_second']:.1f} audio s/wall s, "
+                            f"{transcribe['per_chunk_overhead_ms']:.1f} ms overhead/chunk, "
+                            f"peak RSS {transcribe['peak_rss_mb']:.0f} MB)")
+                results["cases"].append(case)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results saved to '{args.output}'.")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            for line in compare(json.load(f), results):
+                logger.info(line)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+from pydub import AudioSegment
+
+from tuning import synthetic_clip
+
+# Audio is generated this many seconds at a time, so long inputs never sit in memory
+BLOCK_SECONDS = 10
+
+
+def make_wav(path, seconds, sample_rate=44100, channels=2, seed=0):
+    """
+    Writes a 16-bit WAV of speech-like synthetic audio. The defaults match a
+    typical CD-quality recording, so conversion and resampling do real work.
+    """
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        remaining = seconds
+        block = 0
+        while remaining > 0:
+            block_seconds = min(BLOCK_SECONDS, remaining)
+            samples = synthetic_clip(block_seconds, sample_rate=sample_rate, seed=seed + block)
+            pcm = (samples * 32767).astype("<i2")
+            if channels > 1:
+                # Slightly different channels, so downmixing is not a no-op
+                pcm = np.stack([pcm] + [(pcm * (1 - 0.1 * c)).astype("<i2") for c in range(1, channels)], axis=1)
+            wav_file.writeframes(pcm.tobytes())
+            remaining -= block_seconds
+            block += 1
+    return path
+
+
+def ffmpeg_available():
+    return shutil.which(AudioSegment.converter) is not None
+
+
+def make_mp3(path, seconds, sample_rate=44100, channels=2, seed=0, bitrate="128k"):
+    """Writes an MP3 of synthetic audio by encoding a temporary WAV with ffmpeg."""
+    if not ffmpeg_available():
+        raise RuntimeError("ffmpeg is required to generate MP3 inputs")
+    wav_path = f"{path}.source.wav"
+    make_wav(wav_path, seconds, sample_rate, channels, seed)
+    try:
+        subprocess.run([AudioSegment.converter, "-nostdin", "-loglevel", "error", "-y", "-i", wav_path,
+                        "-b:a", bitrate, path], check=True)
+    finally:
+        os.remove(wav_path)
+    return path
+
+
+def make_input(directory, audio_format, seconds, **options):
+    """Generates a synthetic input of the given format ('wav' or 'mp3') and returns its path."""
+    path = os.path.join(directory, f"synthetic_{int(seconds)}s.{audio_format}")
+    if audio_format == "wav":
+        return make_wav(path, seconds, **options)
+    if audio_format == "mp3":
+        return make_mp3(path, seconds, **options)
+    raise ValueError(f"Unsupported benchmark input format: {audio_format}")
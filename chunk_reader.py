@@ -0,0 +1,302 @@
+import collections
+import os
+import struct
+import threading
+import time
+import wave
+
+MS_PER_SECOND = 1000
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Data chunk sizes left unset by tools that write the header before the audio
+UNKNOWN_DATA_SIZES = (0, 0xFFFFFFFF)
+# Decoder diagnostics kept for error messages: the last lines, each cut to a bounded length
+STDERR_TAIL_LINES = 20
+STDERR_LINE_BYTES = 1024
+
+
+class StderrTail:
+    """
+    Drains a decoder's stderr pipe on a background thread, keeping only its
+    last lines. A pipe nobody reads fills up and blocks a chatty decoder, so
+    stderr must be consumed while stdout is being read.
+    """
+
+    def __init__(self, pipe):
+        self._lines = collections.deque(maxlen=STDERR_TAIL_LINES)
+        self._thread = threading.Thread(target=self._drain, args=(pipe,), daemon=True)
+        self._thread.start()
+
+    def _drain(self, pipe):
+        try:
+            for line in pipe:
+                self._lines.append(line[-STDERR_LINE_BYTES:])
+        except (OSError, ValueError):
+            pass
+
+    def text(self, timeout=1.0):
+        """Returns the kept stderr tail once the pipe has closed (or after timeout seconds)."""
+        self._thread.join(timeout)
+        return b"".join(self._lines).decode(errors="replace").strip()
+
+
+class WavReader:
+    """
+    Reads PCM WAV files with the part of wave.Wave_read's interface used here.
+    Unlike the wave module, it also accepts WAVE_FORMAT_EXTENSIBLE headers
+    (format 65534), which many recorders and DAWs write, when their
+    sub-format is PCM. Malformed or non-PCM files raise wave.Error.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._parse_header()
+        except Exception:
+            self._file.close()
+            raise
+        self._position = 0
+
+    def _parse_header(self):
+        riff = self._file.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:] != b"WAVE":
+            raise wave.Error("file does not start with RIFF id")
+        fmt = None
+        while True:
+            header = self._file.read(8)
+            if len(header) < 8:
+                raise wave.Error("data chunk missing")
+            chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = self._file.read(size)
+                self._file.seek(size & 1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                break
+            else:
+                # Chunks are padded to an even length
+                self._file.seek(size + (size & 1), os.SEEK_CUR)
+        if fmt is None or len(fmt) < 16:
+            raise wave.Error("fmt chunk missing")
+
+        format_tag, self._channels, self._rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            # The sub-format GUID starts with the plain format tag
+            format_tag = struct.unpack("<H", fmt[24:26])[0]
+        if format_tag != WAVE_FORMAT_PCM:
+            raise wave.Error(f"unknown format: {format_tag}")
+        if not self._channels or not self._rate or not bits:
+            raise wave.Error("bad fmt chunk")
+        self._sample_width = (bits + 7) // 8
+        self._frame_size = self._sample_width * self._channels
+
+        self._data_start = self._file.tell()
+        available = os.fstat(self._file.fileno()).st_size - self._data_start
+        data_size = available if size in UNKNOWN_DATA_SIZES else min(size, available)
+        self._frames = data_size // self._frame_size
+
+    def getnchannels(self):
+        return self._channels
+
+    def getsampwidth(self):
+        return self._sample_width
+
+    def getframerate(self):
+        return self._rate
+
+    def getnframes(self):
+        return self._frames
+
+    def setpos(self, position):
+        if not 0 <= position <= self._frames:
+            raise wave.Error("position not in range")
+        self._position = position
+
+    def readframes(self, frames):
+        frames = max(min(frames, self._frames - self._position), 0)
+        self._file.seek(self._data_start + self._position * self._frame_size)
+        data = self._file.read(frames * self._frame_size)
+        self._position += len(data) // self._frame_size
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class WavChunkReader:
+    """
+    Reads fixed-length chunks from a PCM WAV file without loading the whole file.
+    Chunk boundaries are computed from the WAV header, so reading chunk N only
+    seeks to its first frame and reads that chunk's frames.
+
+    Times are on the recording's timeline. start_ms and end_ms limit the
+    chunks to that range of the recording, with chunk 0 starting at start_ms.
+    offset_ms is the recording time of the file's first frame, for a WAV
+    decoded from part of a longer recording; windows before it cannot be read.
+    """
+
+    def __init__(self, wav_path, chunk_duration=60, start_ms=0, end_ms=None, offset_ms=0):
+        try:
+            self._wav = WavReader(wav_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"WAV file not found: {wav_path}")
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"Error loading WAV file {wav_path}: {e}")
+
+        self.sample_rate = self._wav.getframerate()
+        self.sample_width = self._wav.getsampwidth()
+        self.channels = self._wav.getnchannels()
+        self.total_frames = self._wav.getnframes()
+        self.offset_ms = offset_ms
+        self.start_ms = start_ms
+        self.total_duration_ms = offset_ms + round(self.total_frames * MS_PER_SECOND / self.sample_rate)
+        if end_ms is not None:
+            self.total_duration_ms = min(self.total_duration_ms, end_ms)
+        self.chunk_duration_ms = chunk_duration * MS_PER_SECOND
+        range_ms = max(self.total_duration_ms - start_ms, 0)
+        self.num_chunks = -(-range_ms // self.chunk_duration_ms) if self.chunk_duration_ms > 0 else 0
+
+    def _ms_to_frame(self, ms):
+        return min(max(int((ms - self.offset_ms) * self.sample_rate // MS_PER_SECOND), 0), self.total_frames)
+
+    def chunk_bounds(self, index):
+        """Returns (start_ms, end_ms) of the chunk at the given index."""
+        start_ms = self.start_ms + index * self.chunk_duration_ms
+        end_ms = min(start_ms + self.chunk_duration_ms, self.total_duration_ms)
+        return start_ms, end_ms
+
+    def read_window(self, start_ms, end_ms):
+        """Returns the raw PCM frames between start_ms and end_ms."""
+        start_frame = self._ms_to_frame(start_ms)
+        end_frame = self._ms_to_frame(min(end_ms, self.total_duration_ms))
+        if end_frame <= start_frame:
+            return b""
+        self._wav.setpos(start_frame)
+        return self._wav.readframes(end_frame - start_frame)
+
+    def read_chunk(self, index):
+        return self.read_window(*self.chunk_bounds(index))
+
+    def iter_chunks(self, start_index=0):
+        """Yields (index, start_ms, end_ms, pcm) for every chunk from start_index on."""
+        for i in range(start_index, self.num_chunks):
+            start_ms, end_ms = self.chunk_bounds(i)
+            yield i, start_ms, end_ms, self.read_window(start_ms, end_ms)
+
+    def close(self):
+        self._wav.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PcmStreamChunkReader:
+    """
+    Reads fixed-length chunks from a stream of raw interleaved PCM (e.g. an
+    ffmpeg stdout pipe) as the data arrives. The total length is unknown up
+    front, so num_chunks is None. If a decoding process is given, it is
+    waited on at end of stream and a non-zero exit status raises ValueError.
+    Chunk 0 starts at start_ms of the recording; a stream decoded from a
+    later chunk boundary begins with chunk first_index. wait_seconds adds up
+    the time reads spent blocked waiting for the stream.
+    """
+
+    def __init__(self, stream, sample_rate, sample_width=2, channels=1, chunk_duration=60, process=None,
+                 start_ms=0, first_index=0):
+        self._stream = stream
+        self._process = process
+        self._stderr = StderrTail(process.stderr) if process is not None and process.stderr else None
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.chunk_duration_ms = chunk_duration * MS_PER_SECOND
+        self.num_chunks = None
+        self.start_ms = start_ms
+        self._first_index = first_index
+        self._frame_size = sample_width * channels
+        # Audio already read by peek_frames, returned again by the next reads
+        self._pending = b""
+        self.wait_seconds = 0.0
+
+    def _read_exactly(self, size):
+        parts = [self._pending[:size]]
+        self._pending = self._pending[size:]
+        remaining = size - len(parts[0])
+        while remaining > 0:
+            started = time.perf_counter()
+            data = self._stream.read(remaining)
+            self.wait_seconds += time.perf_counter() - started
+            if not data:
+                break
+            parts.append(data)
+            remaining -= len(data)
+        return b"".join(parts)
+
+    def _check_process(self):
+        if self._process is None:
+            return
+        returncode = self._process.wait()
+        if returncode != 0:
+            stderr = self._stderr.text() if self._stderr else ""
+            raise ValueError(f"Audio decoder exited with status {returncode}: {stderr}")
+
+    def read_frames(self, frames):
+        """
+        Returns the next `frames` frames, blocking until they arrive; fewer at
+        the end of the stream and b"" after it, once the decoder has been checked.
+        """
+        pcm = self._read_exactly(frames * self._frame_size)
+        pcm = pcm[:len(pcm) - len(pcm) % self._frame_size]
+        if not pcm:
+            self._check_process()
+        return pcm
+
+    def peek_frames(self, frames):
+        """
+        Returns up to the next `frames` frames without consuming them, blocking
+        until they arrive or the stream ends; later reads return them again.
+        """
+        pcm = self._read_exactly(frames * self._frame_size)
+        pcm = pcm[:len(pcm) - len(pcm) % self._frame_size]
+        self._pending = pcm + self._pending
+        return pcm
+
+    def iter_chunks(self, start_index=0):
+        """
+        Yields (index, start_ms, end_ms, pcm) for every chunk from start_index on.
+        A stream cannot seek, so chunks before start_index are read and discarded.
+        """
+        chunk_frames = int(self.chunk_duration_ms * self.sample_rate // MS_PER_SECOND)
+        index = self._first_index
+        while True:
+            pcm = self.read_frames(chunk_frames)
+            if not pcm:
+                return
+            if index >= start_index:
+                start_ms = self.start_ms + index * self.chunk_duration_ms
+                frames = len(pcm) // self._frame_size
+                end_ms = start_ms + round(frames * MS_PER_SECOND / self.sample_rate)
+                yield index, start_ms, end_ms, pcm
+            index += 1
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+                self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
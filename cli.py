@@ -1,25 +1,236 @@
 import argparse
+import sys
 
-def parse_arguments():
+from engines import AUTO_LANGUAGE, ENGINE_NAMES, LANGUAGE_DETECTING_ENGINES
+from transcription_cache import DEFAULT_CACHE_SIZE_MB
+from conversion_cache import DEFAULT_CONVERSION_CACHE_SIZE_MB
+from progress_journal import DEFAULT_FSYNC_EVERY
+from output_formatter import OUTPUT_FORMATS
+from pcm import ENGINE_SAMPLE_RATE
+from sharding import parse_shard
+from retry import DEFAULT_RETRIES, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_MAX_DELAY
+from transcriber import DEFAULT_LANGUAGE_DETECTION_SECONDS
+from tuning import DEFAULT_PROFILE_PATH, DEFAULT_TUNE_COMPUTE_TYPES, SYNTHETIC_CLIP_SECONDS
+
+def _add_transcription_options(parser):
+    """Adds the options shared by single-file and batch transcription."""
+    parser.add_argument("--chunk", type=int, default=60,
+                        help="Chunk duration in seconds (default: 60)")
+    parser.add_argument("--language", type=str, default="id-ID",
+                        help="Language code for transcription, converted to each engine's form (id-ID becomes id "
+                             "for faster-whisper), or 'auto' to detect it once with faster-whisper "
+                             "(default: id-ID for Indonesian)")
+    parser.add_argument("--language-detection-seconds", type=float, default=DEFAULT_LANGUAGE_DETECTION_SECONDS,
+                        help="With --language auto, detect the language on this many seconds from the start "
+                             f"(default: {DEFAULT_LANGUAGE_DETECTION_SECONDS})")
+    parser.add_argument("--output-format", type=str, nargs="+", default=["txt"], choices=OUTPUT_FORMATS,
+                        help="One or more output formats, all written in the same run; json and jsonl keep "
+                             "per-segment timestamps and confidence (default: txt)")
+    parser.add_argument("--word-timestamps", action="store_true",
+                        help="With faster-whisper, add per-word timestamps and probabilities to json/jsonl output.")
+    parser.add_argument("--engine", type=str, default="google", choices=ENGINE_NAMES,
+                        help="Transcription engine to use (default: google)")
+    parser.add_argument("--segmentation", type=str, default="fixed", choices=["fixed", "vad"],
+                        help="How to cut chunks: fixed --chunk windows, or 'vad' to cut in pauses "
+                             "and skip silent stretches (default: fixed)")
+    parser.add_argument("--min-chunk", type=float, default=5,
+                        help="With --segmentation vad, the shortest chunk in seconds; --chunk is the longest (default: 5)")
+    parser.add_argument("--silence-threshold", type=float, default=-40.0,
+                        help="With --segmentation vad, the level in dBFS below which audio counts as silence (default: -40)")
+    parser.add_argument("--min-silence", type=float, default=0.5,
+                        help="With --segmentation vad, the shortest pause in seconds that may be skipped (default: 0.5)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of Google recognition requests to keep in flight (default: 1)")
+    parser.add_argument("--rate-limit", type=float,
+                        help="Maximum Google recognition requests per second (default: unlimited)")
+    parser.add_argument("--google-endpoint", type=str,
+                        help="URL of the Google recognition API, e.g. a local stand-in server for testing "
+                             "(default: Google's Web Speech endpoint)")
+    parser.add_argument("--google-pool-size", type=int,
+                        help="Keep-alive connections to the Google endpoint kept open between requests "
+                             "(default: --concurrency; 0 opens a new connection per request)")
+    parser.add_argument("--google-connect-timeout", type=float,
+                        help="Seconds to wait for a connection to the Google endpoint (default: 10)")
+    parser.add_argument("--google-read-timeout", type=float,
+                        help="Seconds to wait for the Google endpoint to respond (default: 60)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Times a chunk whose recognition request fails is retried (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_BASE_DELAY,
+                        help=f"Backoff before the first retry in seconds; it doubles on every further retry and "
+                             f"is randomized (default: {DEFAULT_RETRY_BASE_DELAY:g})")
+    parser.add_argument("--retry-max-delay", type=float, default=DEFAULT_RETRY_MAX_DELAY,
+                        help=f"Longest backoff between retries in seconds (default: {DEFAULT_RETRY_MAX_DELAY:g})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of faster-whisper worker processes, each with its own model (default: 1)")
+    parser.add_argument("--cpu-threads", type=int, default=0,
+                        help="CPU threads per faster-whisper model (default: all cores, split between workers)")
+    parser.add_argument("--model-size", type=str,
+                        help="faster-whisper model size or path (default: tuned profile, else small)")
+    parser.add_argument("--compute-type", type=str,
+                        help="faster-whisper compute type, e.g. int8, int16 or float32 (default: tuned profile, else int8)")
+    parser.add_argument("--device", type=str, choices=["cpu", "cuda", "auto"],
+                        help="Device for faster-whisper (default: tuned profile, else cpu)")
+    parser.add_argument("--tuning-profile", type=str, default=DEFAULT_PROFILE_PATH,
+                        help=f"Profile written by 'main.py tune'; its settings for this host are used unless "
+                             f"overridden (default: {DEFAULT_PROFILE_PATH})")
+    parser.add_argument("--temp-dir", type=str,
+                        help="Path to a custom temporary directory for audio processing. Converted audio is "
+                             "cached there across runs and resumes.")
+    parser.add_argument("--conversion-cache-size", type=float, default=DEFAULT_CONVERSION_CACHE_SIZE_MB,
+                        help=f"Size cap in MB of the converted audio cached in --temp-dir; least recently used "
+                             f"files are evicted, and 0 disables the cache (default: {DEFAULT_CONVERSION_CACHE_SIZE_MB})")
+    parser.add_argument("--cache", type=str,
+                        help="Path to a SQLite transcription cache; chunks whose audio was transcribed before "
+                             "with the same engine settings are not sent to the engine again.")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_SIZE_MB,
+                        help=f"Size cap of the transcription cache in MB; least recently used entries are evicted "
+                             f"(default: {DEFAULT_CACHE_SIZE_MB})")
+    parser.add_argument("--metrics", type=str,
+                        help="Write per-stage timings, real-time factor and error counts to this file when the job "
+                             "ends: a Prometheus textfile if it ends in .prom, JSON otherwise.")
+
+def _check_transcription_options(parser, args):
+    """Rejects option combinations shared by single-file and batch transcription that cannot work."""
+    if args.language == AUTO_LANGUAGE and args.engine not in LANGUAGE_DETECTING_ENGINES:
+        parser.error(f"--language {AUTO_LANGUAGE} needs an engine that detects the language "
+                     f"({', '.join(LANGUAGE_DETECTING_ENGINES)}); give a language code for --engine {args.engine}")
+
+def _parse_batch_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Transcribe many audio files in one run, sharing a single loaded engine. "
+                    "Inputs may be file paths, directories or glob patterns."
+    )
+    parser.add_argument("inputs", nargs="*", help="Audio files, directories or glob patterns to transcribe")
+    parser.add_argument("--manifest", type=str,
+                        help="Text file listing one input path or glob per line (blank lines and # comments are ignored)")
+    parser.add_argument("--output-dir", type=str, required=True,
+                        help="Directory that receives one output file per input")
+    parser.add_argument("--summary", type=str,
+                        help="Path of the per-file status summary (default: OUTPUT_DIR/batch_summary.json)")
+    _add_transcription_options(parser)
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("provide at least one input or --manifest")
+    _check_transcription_options(parser, args)
+    args.command = "batch"
+    return args
+
+def _parse_tune_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py tune",
+        description="Benchmark faster-whisper model sizes, compute types and thread counts on this machine "
+                    "and save the fastest configuration that meets the targets to the tuning profile."
+    )
+    parser.add_argument("--clip", type=str,
+                        help="Audio clip to benchmark on (default: a synthetic speech-like clip)")
+    parser.add_argument("--reference", type=str,
+                        help="Text file with the clip's correct transcript, used to measure word error rate")
+    parser.add_argument("--duration", type=float, default=SYNTHETIC_CLIP_SECONDS,
+                        help=f"Length of the synthetic clip in seconds (default: {SYNTHETIC_CLIP_SECONDS})")
+    parser.add_argument("--language", type=str,
+                        help="Language code of the clip, e.g. en or id-ID (default: detect)")
+    parser.add_argument("--model-sizes", nargs="+",
+                        help="Model sizes to compare (default: tiny base small medium with --reference, "
+                             "otherwise only small, since accuracy cannot be measured)")
+    parser.add_argument("--compute-types", nargs="+", default=DEFAULT_TUNE_COMPUTE_TYPES,
+                        help=f"Compute types to compare (default: {' '.join(DEFAULT_TUNE_COMPUTE_TYPES)})")
+    parser.add_argument("--threads", nargs="+", type=int,
+                        help="CPU thread counts to compare (default: 1, half and all cores)")
+    parser.add_argument("--device", type=str, default="cpu", choices=["cpu", "cuda", "auto"],
+                        help="Device to benchmark (default: cpu)")
+    parser.add_argument("--max-rtf", type=float,
+                        help="Speed target: slowest acceptable real-time factor (processing seconds per audio second)")
+    parser.add_argument("--max-wer", type=float, default=0.3,
+                        help="Accuracy target with --reference: highest acceptable word error rate (default: 0.3)")
+    parser.add_argument("--repeats", type=int, default=1,
+                        help="Timed runs per configuration; the fastest counts (default: 1)")
+    parser.add_argument("--profile", type=str, default=DEFAULT_PROFILE_PATH,
+                        help=f"Profile file to update (default: {DEFAULT_PROFILE_PATH})")
+    args = parser.parse_args(argv)
+    args.command = "tune"
+    return args
+
+def _parse_merge_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py merge",
+        description="Merge the outputs of the shards of one recording (see --shard) into one transcript "
+                    "ordered by time, renumbering SRT cues. Shards may be progress files or srt, vtt, "
+                    "json or jsonl output."
+    )
+    parser.add_argument("output_text", help="Path of the merged output file")
+    parser.add_argument("shards", nargs="+", help="Progress files or timed outputs of the shards")
+    parser.add_argument("--output-format", type=str, nargs="+", default=["txt"], choices=OUTPUT_FORMATS,
+                        help="One or more output formats (default: txt); with several, one file per format is written.")
+    args = parser.parse_args(argv)
+    args.command = "merge"
+    return args
+
+def _shard(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_arguments(argv=None):
     """
     Parses command-line arguments.
     """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "batch":
+        return _parse_batch_arguments(argv[1:])
+    if argv and argv[0] == "tune":
+        return _parse_tune_arguments(argv[1:])
+    if argv and argv[0] == "merge":
+        return _parse_merge_arguments(argv[1:])
+
     parser = argparse.ArgumentParser(
         description="CLI tool to convert audio files to text using speech recognition. "
                     "Supported formats: wav, mp3, flac, ogg, m4a. "
-                    "If necessary, the tool converts the file to WAV."
+                    "If necessary, the tool converts the file to WAV.",
+        epilog="Run 'main.py batch --help' to transcribe many files in one invocation, "
+               "'main.py tune --help' to tune faster-whisper for this machine, "
+               "or 'main.py merge --help' to merge the outputs of --shard runs."
     )
-    parser.add_argument("input_audio", help="Path to the input audio file")
-    parser.add_argument("output_text", help="Path to the output text file")
-    parser.add_argument("--chunk", type=int, default=60,
-                        help="Chunk duration in seconds (default: 60)")
-    parser.add_argument("--language", type=str, default="id-ID",
-                        help="Language code for transcription (default: id-ID for Indonesian)")
-    parser.add_argument("--output-format", type=str, default="txt", choices=["txt", "srt", "vtt"],
-                        help="Output format for the transcription (default: txt)")
+    parser.add_argument("input_audio",
+                        help="Path to the input audio file, or '-' or a named pipe for live audio transcribed as it arrives")
+    parser.add_argument("output_text", help="Path to the output text file, or '-' for standard output")
     parser.add_argument("--resume", type=str, help="Path to a progress file to resume transcription from.")
-    parser.add_argument("--engine", type=str, default="google", choices=["google", "faster-whisper"],
-                        help="Transcription engine to use (default: google)")
-    parser.add_argument("--temp-dir", type=str, help="Path to a custom temporary directory for audio processing.")
-    
-    return parser.parse_args()
+    parser.add_argument("--fsync-every", type=int, default=DEFAULT_FSYNC_EVERY,
+                        help=f"Flush the progress file to disk every N chunks (default: {DEFAULT_FSYNC_EVERY}; 0 leaves it to the OS).")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="With --resume, transcribe again only the chunks the progress file records as failed "
+                             "(and any not reached yet), keeping the successful ones.")
+    _add_transcription_options(parser)
+    parser.add_argument("--pipe-decode", action="store_true",
+                        help="Decode non-WAV input with ffmpeg straight into a 16 kHz mono PCM pipe "
+                             "instead of a temporary WAV, so transcription starts before decoding finishes.")
+    parser.add_argument("--start-time", type=float,
+                        help="Transcribe from this many seconds into the recording; compressed input is only "
+                             "decoded from there on.")
+    parser.add_argument("--end-time", type=float,
+                        help="Stop transcribing this many seconds into the recording.")
+    parser.add_argument("--shard", type=_shard, metavar="INDEX/COUNT",
+                        help="Transcribe only shard INDEX of COUNT (counting from 1), a contiguous run of chunks, "
+                             "so one recording can be spread across machines; combine the shards with 'main.py merge'.")
+    parser.add_argument("--input-format",
+                        help="Format of live input from '-' or a named pipe: 's16le' for raw 16-bit PCM read as is, "
+                             "or any ffmpeg input format (e.g. 'mp3', 'ogg'); by default ffmpeg detects it.")
+    parser.add_argument("--input-rate", type=int, default=ENGINE_SAMPLE_RATE,
+                        help=f"Sample rate of raw (--input-format s16le) live input (default: {ENGINE_SAMPLE_RATE}).")
+    parser.add_argument("--input-channels", type=int, default=1,
+                        help="Channel count of raw (--input-format s16le) live input (default: 1).")
+
+    args = parser.parse_args(argv)
+    _check_transcription_options(parser, args)
+    if args.retry_failed and not args.resume:
+        parser.error("--retry-failed needs the progress file given with --resume")
+    if args.start_time is not None and args.start_time < 0:
+        parser.error("--start-time must not be negative")
+    if args.end_time is not None and args.end_time <= (args.start_time or 0):
+        parser.error("--end-time must be after --start-time")
+    if args.input_rate <= 0 or args.input_channels <= 0:
+        parser.error("--input-rate and --input-channels must be positive")
+    args.command = "transcribe"
+    return args
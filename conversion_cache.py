@@ -0,0 +1,202 @@
+import collections
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from audio_converter import convert_to_wav, needs_conversion
+from pcm import ENGINE_SAMPLE_RATE
+from progress_journal import hash_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONVERSION_CACHE_SIZE_MB = 2048
+# Subdirectory of --temp-dir holding the cached WAV files and their index
+CACHE_DIRECTORY = "conversion_cache"
+# Eviction frees space down to this fraction of the size cap
+EVICTION_TARGET = 0.9
+
+
+class ConversionCache:
+    """
+    Persistent cache of converted audio: engine-format WAV files in a
+    directory, indexed in SQLite by the input's content hash, the sample rate
+    and the part of the recording that was decoded. A later run over the same
+    audio, whatever its file name, output format or language, reads the WAV
+    instead of decoding the input again. An entry also serves any run that
+    needs only part of its range, such as a resume further along. The least
+    recently used files are deleted once their total size passes
+    max_size_bytes, except those pinned by a convert() whose cleanup has not
+    run yet, so a file being transcribed is never deleted under its reader.
+    """
+
+    def __init__(self, directory, max_size_bytes=DEFAULT_CONVERSION_CACHE_SIZE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Keys of entries in use, with the number of convert() callers holding each
+        self._pins = collections.Counter()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(os.path.join(directory, "conversions.sqlite"),
+                                               check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS conversions ("
+                "key TEXT PRIMARY KEY, input_hash TEXT NOT NULL, sample_rate INTEGER NOT NULL, "
+                "start_ms INTEGER NOT NULL, end_ms INTEGER, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS conversions_input ON conversions (input_hash, sample_rate)")
+            self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM conversions").fetchone()[0]
+        except (OSError, sqlite3.Error) as e:
+            raise ValueError(f"Could not open conversion cache '{directory}': {e}")
+
+    @staticmethod
+    def make_key(input_hash, sample_rate, start_ms, end_ms):
+        settings = {"input_hash": input_hash, "sample_rate": sample_rate, "start_ms": start_ms, "end_ms": end_ms}
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def lookup(self, input_hash, sample_rate, start_ms=0, end_ms=None, pin=False):
+        """
+        Returns (wav_path, offset_ms) of a cached conversion covering start_ms
+        to end_ms (None: the end of the recording), where offset_ms is the
+        recording time the WAV begins at, or None on a miss. With pin, the
+        entry is kept from eviction until release(wav_path).
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, start_ms FROM conversions WHERE input_hash = ? AND sample_rate = ? AND start_ms <= ? "
+                "AND (end_ms IS NULL OR (? IS NOT NULL AND end_ms >= ?)) ORDER BY start_ms DESC",
+                (input_hash, sample_rate, start_ms, end_ms, end_ms)
+            ).fetchall()
+            for key, offset_ms in rows:
+                if not os.path.exists(self._path(key)):
+                    # Deleted behind the cache's back; forget it
+                    self._remove(key)
+                    continue
+                self.hits += 1
+                self._connection.execute("UPDATE conversions SET last_used = ? WHERE key = ?", (time.time(), key))
+                if pin:
+                    self._pins[key] += 1
+                return self._path(key), offset_ms
+            self.misses += 1
+            return None
+
+    def store(self, wav_path, input_hash, sample_rate, start_ms=0, end_ms=None, pin=False):
+        """
+        Moves a converted WAV into the cache and returns its new path, or None
+        if it is larger than the whole cache, in which case it stays where it
+        is. Entries whose range the new one covers are dropped unless pinned.
+        With pin, the new entry is kept from eviction until release(path).
+        """
+        size = os.path.getsize(wav_path)
+        if size > self.max_size_bytes:
+            logger.info(f"Converted audio ({size / (1024 * 1024):.0f} MB) is larger than the conversion cache; not caching it.")
+            return None
+        key = self.make_key(input_hash, sample_rate, start_ms, end_ms)
+        path = self._path(key)
+        os.replace(wav_path, path)
+        with self._lock:
+            covered = self._connection.execute(
+                "SELECT key FROM conversions WHERE input_hash = ? AND sample_rate = ? AND start_ms >= ? "
+                "AND (? IS NULL OR (end_ms IS NOT NULL AND end_ms <= ?)) AND key != ?",
+                (input_hash, sample_rate, start_ms, end_ms, end_ms, key)
+            ).fetchall()
+            for (covered_key,) in covered:
+                if not self._pins[covered_key]:
+                    self._remove(covered_key)
+            previous = self._connection.execute("SELECT size FROM conversions WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO conversions (key, input_hash, sample_rate, start_ms, end_ms, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, input_hash, sample_rate, start_ms, end_ms, size, time.time())
+            )
+            self._size += size - (previous[0] if previous else 0)
+            if pin:
+                self._pins[key] += 1
+            if self._size > self.max_size_bytes:
+                self._evict(keep=key)
+        return path
+
+    def release(self, wav_path):
+        """Unpins an entry returned by a lookup or store with pin, letting it be evicted again."""
+        key = os.path.splitext(os.path.basename(wav_path))[0]
+        with self._lock:
+            self._pins[key] -= 1
+            if self._pins[key] <= 0:
+                del self._pins[key]
+
+    def _remove(self, key):
+        row = self._connection.execute("SELECT size FROM conversions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        self._connection.execute("DELETE FROM conversions WHERE key = ?", (key,))
+        self._size -= row[0]
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove cached conversion '{self._path(key)}': {e}")
+
+    def _evict(self, keep):
+        """
+        Deletes least recently used conversions, never `keep` or a pinned one,
+        until the size is below the eviction target.
+        """
+        target = self.max_size_bytes * EVICTION_TARGET
+        rows = self._connection.execute("SELECT key FROM conversions WHERE key != ? ORDER BY last_used, rowid", (keep,)).fetchall()
+        evicted = 0
+        for (key,) in rows:
+            if self._size <= target:
+                break
+            if self._pins[key]:
+                continue
+            self._remove(key)
+            evicted += 1
+        logger.debug(f"Evicted {evicted} files from conversion cache '{self.directory}'.")
+
+    def convert(self, input_path, start_ms=0, end_ms=None, sample_rate=ENGINE_SAMPLE_RATE, input_hash=None):
+        """
+        Returns (wav_path, offset_ms, cleanup) for input_path like
+        audio_converter.convert_to_wav, converting only on a miss. A cached
+        file belongs to the cache and stays pinned until cleanup is called,
+        so conversions of other inputs, such as a batch's prefetch of the next
+        file, cannot evict it while it is read. input_hash saves hashing the
+        input again if the caller already has it.
+        """
+        if not needs_conversion(input_path, sample_rate):
+            return input_path, 0, lambda: None
+        input_hash = input_hash or hash_file(input_path)
+        cached = self.lookup(input_hash, sample_rate, start_ms, end_ms, pin=True)
+        if cached is not None:
+            logger.info(f"Using cached conversion of '{input_path}'.")
+            return cached[0], cached[1], lambda: self.release(cached[0])
+
+        wav_path, cleanup = convert_to_wav(input_path, sample_rate, start_ms=start_ms, end_ms=end_ms, temp_dir=self.directory)
+        cached_path = self.store(wav_path, input_hash, sample_rate, start_ms, end_ms, pin=True)
+        if cached_path is None:
+            return wav_path, start_ms, cleanup
+        return cached_path, start_ms, lambda: self.release(cached_path)
+
+    @property
+    def size_bytes(self):
+        return self._size
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
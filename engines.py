@@ -0,0 +1,46 @@
+import importlib
+
+# Modules implementing each --engine choice. An engine module is imported the
+# first time that engine is used, so a google run never loads faster-whisper
+# and CTranslate2, and --help loads neither engine.
+#
+# Each engine module provides:
+#   transcribe(pcm, audio_format, language, **options) -> {"text": ..., "segments": [...]}, where
+#       audio_format is (sample_rate, sample_width, channels) of the raw pcm and
+#       the optional segments carry start/end seconds relative to the chunk,
+#       text, confidence and optionally words;
+#       raises UnrecognizedAudioError, EngineRequestError or EngineRejectedError
+#   cache_settings(**options) -> dict of the options that affect the text
+#   normalize_language(language) -> the engine's code for a --language value,
+#       e.g. "id" for "id-ID" with faster-whisper
+# and optionally, if the engine can tell which language is spoken:
+#   detect_language(pcm, audio_format, **options) -> (language, probability)
+ENGINE_MODULES = {
+    "google": "google_engine",
+    "faster-whisper": "whisper_engine",
+}
+ENGINE_NAMES = list(ENGINE_MODULES)
+# --language value that detects the language once and pins it for every chunk
+AUTO_LANGUAGE = "auto"
+# Engines whose module provides detect_language, so the command line can
+# refuse --language auto for the others without importing any engine
+LANGUAGE_DETECTING_ENGINES = ["faster-whisper"]
+
+
+class UnrecognizedAudioError(Exception):
+    """The engine found no speech it could transcribe in the chunk."""
+
+
+class EngineRequestError(Exception):
+    """The engine could not be reached or was unavailable; the request may succeed if retried."""
+
+
+class EngineRejectedError(Exception):
+    """The engine refused the request itself (e.g. a bad key or malformed audio); retrying cannot help."""
+
+
+def get_engine(name):
+    """Imports (once) and returns the module implementing engine `name`."""
+    if name not in ENGINE_MODULES:
+        raise ValueError(f"Unsupported transcription engine: {name}")
+    return importlib.import_module(ENGINE_MODULES[name])
@@ -0,0 +1,199 @@
+import http.client
+import socket
+import threading
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+import speech_recognition as sr
+from speech_recognition.recognizers import google as google_api
+
+from engines import EngineRejectedError, EngineRequestError, UnrecognizedAudioError
+from pcm import pcm_to_float32, resample, float32_to_pcm16
+
+# The API rejects audio below this sample rate
+MIN_SAMPLE_RATE = 8000
+# Too Many Requests; like server errors, it may pass, while other 4xx statuses will not
+TOO_MANY_REQUESTS = 429
+# Seconds to wait for a connection to the endpoint, and for each response
+GOOGLE_CONNECT_TIMEOUT = 10.0
+GOOGLE_READ_TIMEOUT = 60.0
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections to the recognition endpoint, shared by
+    every chunk of a run, so only the first request on each connection pays
+    for TCP and TLS setup. Each request takes an idle connection or opens
+    one, so concurrent requests never share a connection. Up to pool_size
+    connections are kept open between requests; with 0 every request opens
+    and closes its own connection. connect_timeout and read_timeout, in
+    seconds, bound connecting and each wait for the server.
+    """
+
+    def __init__(self, pool_size=1, connect_timeout=GOOGLE_CONNECT_TIMEOUT, read_timeout=GOOGLE_READ_TIMEOUT):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.connections_opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _take(self, origin):
+        with self._lock:
+            for position, (idle_origin, connection) in enumerate(self._idle):
+                if idle_origin == origin:
+                    del self._idle[position]
+                    return connection
+        return None
+
+    def _open(self, origin):
+        scheme, host, port = origin
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        # Small requests on a kept connection must not wait for the previous response's ACK
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.connections_opened += 1
+        return connection
+
+    def _release(self, origin, connection):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((origin, connection))
+                return
+        connection.close()
+
+    def post(self, url, body, headers):
+        """
+        Posts body to url and returns (status, reason, response body). A kept
+        connection the server has closed in the meantime is replaced and the
+        request sent once more; other errors are raised.
+        """
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        connection = self._take(origin)
+        reused = connection is not None
+        while True:
+            if connection is None:
+                connection = self._open(origin)
+            try:
+                connection.request("POST", target, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.BadStatusLine):
+                connection.close()
+                if not reused:
+                    raise
+                connection, reused = None, False
+            except Exception:
+                connection.close()
+                raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(origin, connection)
+        return response.status, response.reason, data
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, connection in idle:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RequestRejected(sr.RequestError):
+    """The endpoint answered with a client error other than 429, which a retry would repeat."""
+
+
+def _status_error(status, reason):
+    """Returns the error for an HTTP error status: RequestRejected unless the status may pass on retry."""
+    message = f"recognition request failed: {reason}"
+    if status == TOO_MANY_REQUESTS or status >= 500:
+        return sr.RequestError(message)
+    return RequestRejected(f"{message} (HTTP {status})")
+
+
+def _pcm16_mono(pcm, sample_rate, sample_width, channels):
+    """Returns (pcm, sample_rate) as 16-bit mono at MIN_SAMPLE_RATE or more, converting only if needed."""
+    if sample_width == 2 and channels == 1 and sample_rate >= MIN_SAMPLE_RATE:
+        return pcm, sample_rate
+    samples = pcm_to_float32(pcm, sample_width, channels)
+    if sample_rate < MIN_SAMPLE_RATE:
+        samples = resample(samples, sample_rate, MIN_SAMPLE_RATE)
+        sample_rate = MIN_SAMPLE_RATE
+    return float32_to_pcm16(samples), sample_rate
+
+
+def recognize(pcm, sample_rate, language, endpoint=None, session=None):
+    """
+    Posts 16-bit mono PCM to the Google Web Speech API as audio/l16 and
+    returns the best transcript. The samples go out as they are, so no
+    encoder runs per chunk. Raises sr.UnknownValueError if no speech was
+    recognized and sr.RequestError if the request failed, as
+    recognize_google does; a client error other than 429 raises its
+    subclass RequestRejected. With a session (a ConnectionPool) the request
+    goes over one of its kept connections; without, a new connection is
+    opened and closed for it.
+    """
+    url = google_api.create_request_builder(endpoint=endpoint or google_api.ENDPOINT, language=language).build_url()
+    headers = {"Content-Type": f"audio/l16; rate={sample_rate}"}
+    if session is not None:
+        try:
+            status, reason, body = session.post(url, pcm, headers)
+        except (http.client.HTTPException, OSError) as e:
+            raise sr.RequestError(f"recognition connection failed: {e}")
+        if status >= 400:
+            raise _status_error(status, reason)
+        response_text = body.decode("utf-8")
+    else:
+        try:
+            with urlopen(Request(url, data=pcm, headers=headers)) as response:
+                response_text = response.read().decode("utf-8")
+        except HTTPError as e:
+            raise _status_error(e.code, e.reason)
+        except URLError as e:
+            raise sr.RequestError(f"recognition connection failed: {e.reason}")
+    return google_api.OutputParser(show_all=False, with_confidence=False).parse(response_text)
+
+
+def transcribe(pcm, audio_format, language, endpoint=None, rate_limiter=None, session=None):
+    """
+    Sends one chunk to the Google Web Speech API and returns {"text": ...}.
+    The chunk is posted as raw 16-bit PCM rather than FLAC, which would run
+    the flac tool once per chunk. endpoint overrides the API URL;
+    rate_limiter, a TokenBucket, is waited on before the request; session,
+    a ConnectionPool, keeps connections open across chunks. The API
+    reports no timings within the chunk.
+    """
+    pcm, sample_rate = _pcm16_mono(pcm, *audio_format)
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    try:
+        return {"text": recognize(pcm, sample_rate, language, endpoint=endpoint, session=session)}
+    except sr.UnknownValueError as e:
+        raise UnrecognizedAudioError() from e
+    except RequestRejected as e:
+        raise EngineRejectedError(str(e)) from e
+    except sr.RequestError as e:
+        raise EngineRequestError(str(e)) from e
+
+
+def normalize_language(language):
+    """The API takes BCP-47 tags such as 'id-ID' as they are; 'id_ID' is accepted too."""
+    return language.replace("_", "-")
+
+
+def cache_settings(**options):
+    # The endpoint, rate limit and connection pool do not change the transcription
+    return {}
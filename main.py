@@ -1,42 +1,77 @@
 import os
+import stat
 import sys
 import tempfile
+import time
 import json
 import logging
-from audio_converter import convert_to_wav
-from transcriber import transcribe_audio_in_chunks
+from contextlib import contextmanager, nullcontext
+from audio_converter import convert_to_wav, needs_conversion, open_live_stream, open_pcm_stream
+from transcriber import EngineOptions, OutputOptions, SegmentationOptions, transcribe_audio_in_chunks
+from chunk_reader import MS_PER_SECOND
 from cli import parse_arguments
-from output_formatter import format_transcription
+from batch import collect_inputs, run_batch
+from transcription_cache import TranscriptionCache
+from conversion_cache import ConversionCache, CACHE_DIRECTORY as CONVERSION_CACHE_DIRECTORY
+from tuning import (DEFAULT_TUNE_MODEL_SIZES, default_thread_counts, host_key, load_clip, resolve_whisper_settings,
+                    run_tuning, save_profile, select_best, synthetic_clip)
+from progress_journal import load_progress, hash_file, make_header, ResumeMismatchError, DEFAULT_FSYNC_EVERY
+from retry import RetryPolicy
+from output_formatter import open_writers, output_paths
+from metrics import Metrics
+from engines import AUTO_LANGUAGE, get_engine
+from pcm import ENGINE_SAMPLE_RATE
+from sharding import merge_shards, shard_time_range
 
 FILE_SIZE_WARNING_THRESHOLD = 1 * 1024 * 1024 * 1024  # 1GB
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def handle_resume(resume_path):
-    """Handles resuming a transcription from a progress file."""
+def handle_resume(resume_path, expected_header=None):
+    """
+    Handles resuming a transcription from a progress file. If expected_header is
+    given, a journal written for another input or other settings is refused.
+    """
     transcribed_chunks = []
     start_chunk_index = 0
     if resume_path and os.path.exists(resume_path):
         try:
-            with open(resume_path, 'r') as f:
-                progress_data = json.load(f)
-                transcribed_chunks = progress_data.get('transcribed_chunks', [])
-                start_chunk_index = progress_data.get('last_chunk_index', 0) + 1
+            transcribed_chunks, last_chunk_index = load_progress(resume_path, expected_header)
+            start_chunk_index = last_chunk_index + 1
             logger.info(f"Resuming transcription from chunk {start_chunk_index} using progress file '{resume_path}'")
+        except ResumeMismatchError:
+            raise
         except (json.JSONDecodeError, Exception) as e:
             logger.warning(f"Could not load progress file '{resume_path}': {e}. Starting new transcription.")
     elif resume_path:
         logger.warning(f"Progress file '{resume_path}' not found. Starting new transcription.")
     return transcribed_chunks, start_chunk_index
 
-def _load_or_initialize_chunks(resume_path):
+def _load_or_initialize_chunks(resume_path, expected_header=None):
     """Loads existing transcribed chunks from a resume file or initializes them."""
-    return handle_resume(resume_path)
+    return handle_resume(resume_path, expected_header)
+
+def _time_range_ms(start_time, end_time):
+    """Returns (start_ms, end_ms) for start and end times in seconds; end_ms is None for the end of the recording."""
+    start_ms = round((start_time or 0) * MS_PER_SECOND)
+    end_ms = round(end_time * MS_PER_SECOND) if end_time is not None else None
+    if start_ms < 0:
+        raise ValueError(f"Start time must not be negative, got {start_time}")
+    if end_ms is not None and end_ms < start_ms:
+        raise ValueError(f"End time {end_time} must not be before start time {start_time or 0}")
+    return start_ms, end_ms
 
-def _convert_and_prepare_audio(input_audio_path):
-    """Converts audio to WAV and returns the path and cleanup function."""
-    result = convert_to_wav(input_audio_path)
+def _journal_header(input_hash, chunk_duration, language, engine, segmentation, time_range=None):
+    """Builds the progress journal header identifying this input and these settings."""
+    return make_header(input_hash, chunk_duration, engine, language, segmentation.settings(), time_range)
+
+def _convert_and_prepare_audio(input_audio_path, start_ms=0, end_ms=None, temp_dir=None):
+    """
+    Converts audio to WAV in temp_dir, decoding only from start_ms to end_ms,
+    and returns the path and cleanup function.
+    """
+    result = convert_to_wav(input_audio_path, start_ms=start_ms, end_ms=end_ms, temp_dir=temp_dir)
     if isinstance(result, tuple):
         wav_path, cleanup_func = result
         temp_wav_file = wav_path
@@ -46,44 +81,287 @@ def _convert_and_prepare_audio(input_audio_path):
         temp_wav_file = None
     return wav_path, temp_wav_file, cleanup_func
 
-def _transcribe_and_append_chunks(wav_path, chunk_duration, language, start_chunk_index, resume_path, engine, transcribed_chunks, temp_dir):
-    """Transcribes audio chunks and appends them to the main list."""
+def _is_wav(input_audio_path):
+    return os.path.splitext(input_audio_path)[1].lower() == ".wav"
+
+def _is_live_input(input_audio_path):
+    """True for "-" (standard input) and named pipes, which are transcribed as the audio arrives."""
+    if input_audio_path == "-":
+        return True
+    try:
+        return stat.S_ISFIFO(os.stat(input_audio_path).st_mode)
+    except OSError:
+        return False
+
+def _open_pcm_pipe(input_audio_path, chunk_duration, start_ms=0, end_ms=None, first_index=0):
+    """Opens an ffmpeg decode pipe for compressed input, or returns None for WAV input."""
+    if _is_wav(input_audio_path):
+        return None
+    logger.info("Decoding audio through an ffmpeg pipe; transcription starts as soon as the first chunk arrives.")
+    return open_pcm_stream(input_audio_path, chunk_duration, start_ms=start_ms, end_ms=end_ms, first_index=first_index)
+
+def _transcribe_and_append_chunks(wav_path, chunk_duration, language, start_chunk_index, engine, transcribed_chunks, reader=None, **transcribe_options):
+    """
+    Transcribes audio chunks and appends them to the main list.
+    transcribe_options are passed through to transcribe_audio_in_chunks.
+    """
     logger.info("Transcribing audio... This may take some time.")
     new_chunks = transcribe_audio_in_chunks(
         wav_path,
         chunk_duration=chunk_duration,
         language=language,
         start_chunk_index=start_chunk_index,
-        resume_path=resume_path,
         engine=engine,
-        temp_dir=temp_dir,
-        existing_chunks=transcribed_chunks
+        existing_chunks=transcribed_chunks,
+        reader=reader,
+        **transcribe_options
     )
     if new_chunks is not None:
         transcribed_chunks[:] = new_chunks  # Update in place to maintain reference
 
-def _save_transcription_output(transcribed_chunks, output_text_path, output_format):
-    """Formats and saves the transcribed text to the output file."""
-    formatted_transcription = format_transcription(transcribed_chunks, output_format)
-    with open(output_text_path, "w", encoding="utf-8") as outfile:
-        outfile.write(formatted_transcription)
-    logger.info(f"Transcription completed. Output saved to '{output_text_path}'.")
+@contextmanager
+def _save_transcription_output(transcribed_chunks, output_text_path, output_format, stream=True):
+    """
+    Streams the transcription to the output file, or to one file per format
+    if output_format is a list (see output_formatter.output_paths). The chunks
+    restored from a resume file are written right away; the function yielded
+    writes each new chunk as it is transcribed, so the files always hold every
+    finished chunk. With stream=False nothing is yielded and the files are
+    written from transcribed_chunks once the block finishes.
+    """
+    paths = output_paths(output_text_path, output_format)
+    if stream:
+        with open_writers(paths) as writer:
+            writer.write_chunks(transcribed_chunks)
+            yield writer.write_chunk
+    else:
+        yield None
+        with open_writers(paths) as writer:
+            writer.write_chunks(transcribed_chunks)
+    saved = ", ".join(f"'{path}'" for path in paths.values())
+    logger.info(f"Transcription completed. Output saved to {saved}.")
+
+def _timed(metrics, stage):
+    """Times a block under `stage` when metrics are collected."""
+    return metrics.time(stage) if metrics is not None else nullcontext()
 
-def process_audio(input_audio_path, output_text_path, chunk_duration, language, output_format, resume_path, engine, temp_dir):
-    """Converts, transcribes, and formats the audio."""
+def process_audio(input_audio_path, output_text_path, chunk_duration, language, output_format, resume_path, engine, temp_dir, pipe_decode=False, metrics=None, retry_failed=False, start_time=None, end_time=None, conversion_cache=None, segmentation=None, fsync_every=DEFAULT_FSYNC_EVERY, **transcribe_options):
+    """
+    Converts, transcribes, and formats the audio. With retry_failed, the chunks
+    the resume file records as failed are transcribed again. start_time and
+    end_time, in seconds, limit the transcription to that part of the
+    recording. Compressed input is decoded only from where transcription
+    starts, so a resumed run does not decode the chunks it already has.
+    With a conversion_cache (a ConversionCache), converted audio is kept
+    across runs and only decoded if no earlier run left it in the cache.
+    segmentation is a transcriber.SegmentationOptions; the other
+    transcribe_options are passed through to transcribe_audio_in_chunks.
+    """
+    segmentation = segmentation or SegmentationOptions()
     temp_wav_file = None
+    release_conversion = None
+    reader = None
+    pipe_open_seconds = 0.0
     try:
-        transcribed_chunks, start_chunk_index = _load_or_initialize_chunks(resume_path)
-        wav_path, temp_wav_file, cleanup_func = _convert_and_prepare_audio(input_audio_path)
-        _transcribe_and_append_chunks(wav_path, chunk_duration, language, start_chunk_index, resume_path, engine, transcribed_chunks, temp_dir)
-        _save_transcription_output(transcribed_chunks, output_text_path, output_format)
+        start_ms, end_ms = _time_range_ms(start_time, end_time)
+        time_range = [start_ms, end_ms] if start_ms or end_ms is not None else None
+        # The content hash identifies the input to both the journal and the conversion cache
+        # An engine-format WAV is read in place, so without a journal it is never hashed
+        cache_conversion = conversion_cache is not None and not pipe_decode and needs_conversion(input_audio_path)
+        input_hash = hash_file(input_audio_path) if resume_path or cache_conversion else None
+        journal_header = None
+        if resume_path:
+            journal_header = _journal_header(input_hash, chunk_duration, language, engine, segmentation, time_range)
+        transcribed_chunks, start_chunk_index = _load_or_initialize_chunks(resume_path, journal_header)
+        if retry_failed and pipe_decode:
+            # Failed chunks are read again by their times, which a decode pipe cannot seek to
+            logger.warning("--pipe-decode is ignored with --retry-failed.")
+            pipe_decode = False
+        # Fixed chunks after a resume point can be decoded on their own; VAD plans
+        # its segments over the whole range and retried chunks lie anywhere in it
+        first_index = start_chunk_index if segmentation.mode == "fixed" and not retry_failed else 0
+        decode_start_ms = start_ms + first_index * chunk_duration * MS_PER_SECOND
+        if end_ms is not None:
+            decode_start_ms = min(decode_start_ms, end_ms)
+        if pipe_decode:
+            opened = time.perf_counter()
+            reader = _open_pcm_pipe(input_audio_path, chunk_duration, start_ms, end_ms, first_index)
+            pipe_open_seconds = time.perf_counter() - opened
+        if reader is not None:
+            wav_path = None
+        elif conversion_cache is not None:
+            with _timed(metrics, "conversion"):
+                wav_path, decode_start_ms, release_conversion = conversion_cache.convert(
+                    input_audio_path, decode_start_ms, end_ms, input_hash=input_hash)
+        else:
+            with _timed(metrics, "conversion"):
+                wav_path, temp_wav_file, cleanup_func = _convert_and_prepare_audio(input_audio_path, decode_start_ms, end_ms,
+                                                                                   temp_dir)
+            if temp_wav_file is None:
+                # A WAV already in the engine format is used as-is and the reader seeks in it
+                decode_start_ms = 0
+        # Retried chunks replace results in the middle of the transcript, so that output is written at the end
+        with _save_transcription_output(transcribed_chunks, output_text_path, output_format, stream=not retry_failed) as write_chunk:
+            output = OutputOptions(resume_path, journal_header, fsync_every, on_chunk=write_chunk, metrics=metrics)
+            _transcribe_and_append_chunks(wav_path, chunk_duration, language, start_chunk_index, engine, transcribed_chunks, reader=reader, segmentation=segmentation, output=output, retry_failed=retry_failed, start_ms=start_ms, end_ms=end_ms, wav_offset_ms=decode_start_ms, **transcribe_options)
     finally:
+        if reader is not None:
+            # Stops ffmpeg if the transcription did not get far enough to close the reader itself
+            reader.close()
+            if metrics is not None:
+                # The pipe decodes while chunks are transcribed; count the time spent waiting for it
+                metrics.observe("conversion", pipe_open_seconds + reader.wait_seconds)
+        if release_conversion is not None:
+            release_conversion()
         if temp_wav_file and isinstance(temp_wav_file, str) and os.path.exists(temp_wav_file):
             try:
                 os.remove(temp_wav_file)
             except OSError as e:
                 logger.warning(f"Could not remove temporary file '{temp_wav_file}': {e}")
 
+def process_stream(input_audio_path, output_text_path, chunk_duration, language, output_format, engine, input_format=None, input_rate=ENGINE_SAMPLE_RATE, input_channels=1, metrics=None, **transcribe_options):
+    """
+    Transcribes live audio from standard input ("-") or a named pipe while it
+    arrives (see audio_converter.open_live_stream). Each chunk is written to
+    the output as soon as it is recognized, so the transcript trails the audio
+    by at most chunk_duration plus the engine's time. Live audio is never
+    written to disk, so it takes no temporary directory.
+    """
+    reader = open_live_stream(input_audio_path, chunk_duration, input_format, input_rate, input_channels)
+    logger.info(f"Transcribing live input from '{input_audio_path}' in chunks of up to {chunk_duration}s.")
+    transcribed_chunks = []
+    with _save_transcription_output(transcribed_chunks, output_text_path, output_format) as write_chunk:
+        output = OutputOptions(on_chunk=write_chunk, metrics=metrics)
+        _transcribe_and_append_chunks(None, chunk_duration, language, 0, engine, transcribed_chunks, reader=reader, output=output, **transcribe_options)
+
+def _check_live_options(args):
+    """Raises ValueError for options that need the whole recording up front, which live input does not have."""
+    unsupported = [option for option, value in [("--resume", args.resume), ("--retry-failed", args.retry_failed),
+                                                ("--shard", args.shard), ("--start-time", args.start_time),
+                                                ("--end-time", args.end_time)] if value]
+    if unsupported:
+        raise ValueError(f"{', '.join(unsupported)} cannot be used with live input from '{args.input_audio}'.")
+
+def _open_cache(args):
+    """Opens the transcription cache requested with --cache, if any."""
+    if not args.cache:
+        return None
+    cache = TranscriptionCache(args.cache, max_size_bytes=int(args.cache_size * 1024 * 1024))
+    logger.info(f"Using transcription cache '{args.cache}'.")
+    return cache
+
+def _open_conversion_cache(args):
+    """Opens the conversion cache in --temp-dir, if one was given and the cache is not disabled."""
+    if not args.temp_dir or args.conversion_cache_size <= 0:
+        return None
+    return ConversionCache(os.path.join(args.temp_dir, CONVERSION_CACHE_DIRECTORY),
+                           max_size_bytes=int(args.conversion_cache_size * 1024 * 1024))
+
+def _engine_options(args):
+    """Builds the EngineOptions from the command line, resolving faster-whisper settings left unset."""
+    options = {
+        "concurrency": args.concurrency,
+        "rate_limit": args.rate_limit,
+        "google_endpoint": args.google_endpoint,
+        "google_pool_size": args.google_pool_size,
+        "google_connect_timeout": args.google_connect_timeout,
+        "google_read_timeout": args.google_read_timeout,
+        "workers": args.workers,
+        "cpu_threads": args.cpu_threads,
+        "word_timestamps": args.word_timestamps,
+        "language_detection_seconds": args.language_detection_seconds,
+    }
+    if args.engine == "faster-whisper":
+        options.update(resolve_whisper_settings(args.model_size, args.compute_type, args.device,
+                                                args.cpu_threads, args.workers, args.tuning_profile))
+    return EngineOptions(**options)
+
+def _transcribe_options(args, cache=None):
+    """Collects the tuning options shared by single-file and batch runs."""
+    return {
+        "cache": cache,
+        "engine_options": _engine_options(args),
+        "segmentation": SegmentationOptions(args.segmentation, args.min_chunk, args.silence_threshold, args.min_silence),
+        "retry_policy": RetryPolicy(args.retries, args.retry_delay, args.retry_max_delay),
+    }
+
+def _open_metrics(args):
+    """Starts collecting metrics if --metrics was given."""
+    if not getattr(args, "metrics", None):
+        return None
+    return Metrics(args.engine)
+
+def _write_metrics(metrics, path):
+    """Writes the collected metrics; a failure here must not fail the transcription."""
+    if metrics is None:
+        return
+    try:
+        metrics.write(path)
+        logger.info(f"Metrics saved to '{path}'.")
+    except OSError as e:
+        logger.warning(f"Could not write metrics to '{path}': {e}")
+
+def run_batch_command(args, cache=None, metrics=None, conversion_cache=None):
+    """Runs the 'batch' subcommand."""
+    input_paths = collect_inputs(args.inputs, args.manifest)
+    if not input_paths:
+        raise ValueError("No input files matched the given paths, globs or manifest.")
+    logger.info(f"Transcribing {len(input_paths)} files into '{args.output_dir}'.")
+    results = run_batch(
+        input_paths,
+        args.output_dir,
+        chunk_duration=args.chunk,
+        language=args.language,
+        output_format=args.output_format,
+        engine=args.engine,
+        temp_dir=args.temp_dir,
+        summary_path=args.summary,
+        metrics=metrics,
+        conversion_cache=conversion_cache,
+        **_transcribe_options(args, cache)
+    )
+    return results
+
+def run_tune_command(args):
+    """Runs the 'tune' subcommand and returns the configuration saved to the profile."""
+    if args.clip:
+        wav_path, _, cleanup_func = _convert_and_prepare_audio(args.clip)
+        try:
+            samples = load_clip(wav_path)
+        finally:
+            cleanup_func()
+    else:
+        samples = synthetic_clip(args.duration)
+    reference = None
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = f.read()
+
+    model_sizes = args.model_sizes or (DEFAULT_TUNE_MODEL_SIZES if reference else [get_engine("faster-whisper").DEFAULT_WHISPER_MODEL_SIZE])
+    if reference is None and len(model_sizes) > 1:
+        logger.warning("Without --reference accuracy is not measured, so the fastest (smallest) model will be chosen.")
+    thread_counts = args.threads or default_thread_counts()
+    logger.info(f"Tuning faster-whisper for {host_key()}: models {model_sizes}, compute types {args.compute_types}, "
+                f"threads {thread_counts}.")
+    language = args.language
+    if language == AUTO_LANGUAGE:
+        language = None
+    elif language:
+        language = get_engine("faster-whisper").normalize_language(language)
+    results = run_tuning(samples, model_sizes, args.compute_types, thread_counts, device=args.device,
+                         language=language, reference=reference, repeats=args.repeats)
+    best = select_best(results, max_rtf=args.max_rtf, max_wer=args.max_wer)
+    if best is None:
+        raise ValueError("No configuration met the tuning targets; relax --max-rtf or --max-wer, or try other candidates.")
+    save_profile(args.profile, best)
+    logger.info(f"Saved {best['model_size']}/{best['compute_type']} with {best['cpu_threads']} threads "
+                f"(RTF {best['rtf']:.3f}) for {host_key()} to '{args.profile}'.")
+    return best
+
+def run_merge_command(args):
+    """Runs the 'merge' subcommand and returns the merged chunks."""
+    return merge_shards(args.shards, args.output_text, args.output_format)
+
 def main(args=None):
     """
     Main function of the application.
@@ -93,18 +371,79 @@ def main(args=None):
     if args is None:
         args = parse_arguments()
 
+    if getattr(args, "command", "transcribe") == "tune":
+        try:
+            run_tune_command(args)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"{str(e)}")
+            raise
+        return
+
+    if getattr(args, "command", "transcribe") == "merge":
+        try:
+            run_merge_command(args)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"{str(e)}")
+            raise
+        return
+
+    if getattr(args, "command", "transcribe") == "batch":
+        cache = None
+        conversion_cache = None
+        metrics = _open_metrics(args)
+        try:
+            cache = _open_cache(args)
+            conversion_cache = _open_conversion_cache(args)
+            run_batch_command(args, cache, metrics, conversion_cache)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"{str(e)}")
+            raise
+        finally:
+            if cache is not None:
+                cache.close()
+            if conversion_cache is not None:
+                conversion_cache.close()
+            _write_metrics(metrics, getattr(args, "metrics", None))
+        return
+
     input_audio_path = args.input_audio
+    live = _is_live_input(input_audio_path)
 
-    if not os.path.exists(input_audio_path):
+    if not live and not os.path.exists(input_audio_path):
         logger.error(f"Input file '{input_audio_path}' does not exist.")
         raise FileNotFoundError(f"Input file '{input_audio_path}' does not exist.")
 
-    file_size = os.path.getsize(input_audio_path)
+    file_size = os.path.getsize(input_audio_path) if not live else 0
     if file_size > FILE_SIZE_WARNING_THRESHOLD:
         logger.warning(f"File is larger than {FILE_SIZE_WARNING_THRESHOLD // (1024 * 1024 * 1024)}GB. "
               "Processing may be slow or problematic. Consider splitting the file.")
 
+    cache = None
+    conversion_cache = None
+    metrics = _open_metrics(args)
     try:
+        if live:
+            _check_live_options(args)
+            cache = _open_cache(args)
+            process_stream(
+                input_audio_path,
+                args.output_text,
+                args.chunk,
+                args.language,
+                args.output_format,
+                args.engine,
+                input_format=args.input_format,
+                input_rate=args.input_rate,
+                input_channels=args.input_channels,
+                metrics=metrics,
+                **_transcribe_options(args, cache)
+            )
+            return
+        start_time, end_time = args.start_time, args.end_time
+        if args.shard:
+            start_time, end_time = shard_time_range(input_audio_path, args.shard, args.chunk, start_time, end_time)
+        cache = _open_cache(args)
+        conversion_cache = _open_conversion_cache(args)
         process_audio(
             args.input_audio,
             args.output_text,
@@ -113,7 +452,15 @@ def main(args=None):
             args.output_format,
             args.resume,
             args.engine,
-            args.temp_dir
+            args.temp_dir,
+            pipe_decode=args.pipe_decode,
+            fsync_every=args.fsync_every,
+            metrics=metrics,
+            retry_failed=args.retry_failed,
+            start_time=start_time,
+            end_time=end_time,
+            conversion_cache=conversion_cache,
+            **_transcribe_options(args, cache)
         )
     except (FileNotFoundError, ValueError) as e:
         logger.error(f"{str(e)}")
@@ -121,6 +468,12 @@ def main(args=None):
     except Exception as e:
         logger.critical(f"An unexpected error occurred: {str(e)}")
         sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+        if conversion_cache is not None:
+            conversion_cache.close()
+        _write_metrics(metrics, getattr(args, "metrics", None))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from cache lookups to slow engine calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROMETHEUS_PREFIX = "audio_to_text"
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Histogram:
+    """Durations observed for one stage; raw values are kept for exact percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.values = []
+
+    def observe(self, value):
+        self.values.append(value)
+
+    def bucket_counts(self):
+        """Cumulative counts per upper bound, as Prometheus expects them."""
+        return [(bound, sum(1 for value in self.values if value <= bound)) for bound in self.buckets]
+
+    def summary(self):
+        values = sorted(self.values)
+        return {
+            "count": len(values),
+            "sum": sum(values),
+            "mean": sum(values) / len(values) if values else None,
+            "p50": _percentile(values, 0.5),
+            "p90": _percentile(values, 0.9),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1] if values else None,
+            "buckets": {str(bound): count for bound, count in self.bucket_counts()},
+        }
+
+
+class Metrics:
+    """
+    Collects per-stage timings and counters for one job and exports them as a
+    JSON summary or a Prometheus textfile. Every metric carries the job's
+    engine label, so files from different engines can be told apart when
+    scraped together. Safe to use from pipeline threads.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.started_at = time.monotonic()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Context manager recording the duration of its block under `stage`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def record_chunk(self, chunk):
+        """Counts a finished chunk by status and adds its length to the processed audio."""
+        self.increment(f"chunks_{chunk['status']}")
+        self.increment("audio_seconds", chunk["end_time"] - chunk["start_time"])
+
+    def summary(self):
+        wall_seconds = time.monotonic() - self.started_at
+        audio_seconds = self.counters.get("audio_seconds", 0.0)
+        chunks = {name[len("chunks_"):]: count for name, count in self.counters.items() if name.startswith("chunks_")}
+        return {
+            "engine": self.engine,
+            "wall_seconds": wall_seconds,
+            "audio_seconds": audio_seconds,
+            # Processing seconds per second of audio; below 1 is faster than real time
+            "real_time_factor": wall_seconds / audio_seconds if audio_seconds else None,
+            "chunks": chunks,
+            "errors": chunks.get("failed", 0),
+            "counters": {name: count for name, count in self.counters.items()
+                         if not name.startswith("chunks_") and name != "audio_seconds"},
+            "gauges": dict(self.gauges),
+            "stages": {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())},
+        }
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        engine = f'engine="{self.engine}"'
+        metric = f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {metric} Time spent per chunk or job in each processing stage.",
+                 f"# TYPE {metric} histogram"]
+        for stage, histogram in sorted(self.stages.items()):
+            labels = f'{engine},stage="{stage}"'
+            for bound, count in histogram.bucket_counts():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {len(histogram.values)}')
+            lines.append(f"{metric}_sum{{{labels}}} {sum(histogram.values)}")
+            lines.append(f"{metric}_count{{{labels}}} {len(histogram.values)}")
+
+        def add(name, kind, help_text, samples):
+            lines.extend([f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}", f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}"])
+            for labels, value in samples:
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{','.join([engine, *labels])}}} {value}")
+
+        add("chunks_total", "counter", "Chunks processed by final status.",
+            [([f'status="{status}"'], count) for status, count in sorted(summary["chunks"].items())])
+        add("errors_total", "counter", "Chunks whose transcription failed.", [([], summary["errors"])])
+        add("audio_seconds_total", "counter", "Seconds of audio processed.", [([], summary["audio_seconds"])])
+        add("wall_seconds", "gauge", "Wall-clock duration of the job.", [([], summary["wall_seconds"])])
+        if summary["real_time_factor"] is not None:
+            add("real_time_factor", "gauge", "Processing seconds per second of audio.",
+                [([], summary["real_time_factor"])])
+        for name, count in sorted(summary["counters"].items()):
+            add(f"{name}_total", "counter", f"Count of {name.replace('_', ' ')}.", [([], count)])
+        for name, value in sorted(summary["gauges"].items()):
+            add(name, "gauge", f"{name.replace('_', ' ').capitalize()}.", [([], value)])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes a Prometheus textfile if path ends in .prom, otherwise a JSON
+        summary. The file is replaced atomically, so a textfile collector
+        never reads it half-written.
+        """
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.summary(), indent=2)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
@@ -1,12 +1,36 @@
+import io
+import json
+import os
+import sys
+
+OUTPUT_FORMATS = ["txt", "srt", "vtt", "json", "jsonl"]
+# Output path that writes to standard output
+STDOUT_PATH = "-"
+
+def _spoken_chunks(transcribed_chunks):
+    # Silent chunks only hold a place in the timeline; they produce no text or cues
+    return [chunk for chunk in transcribed_chunks if not chunk.get("silent")]
+
+def chunk_segments(chunk):
+    """
+    Returns the timed segments of a chunk. Engines that report segments
+    (faster-whisper) store them in the chunk; for the others the whole chunk
+    is one segment. Every output format is rendered from these segments.
+    """
+    if not all(k in chunk for k in ("start_time", "end_time", "text")):
+        raise KeyError("Each chunk must contain 'start_time', 'end_time', and 'text' keys.")
+    if chunk.get("segments"):
+        return chunk["segments"]
+    return [{"start": chunk["start_time"], "end": chunk["end_time"], "text": chunk["text"]}]
+
 def format_transcription(transcribed_chunks, output_format):
-    if output_format == "txt":
-        return " ".join([chunk["text"] for chunk in transcribed_chunks])
-    elif output_format == "srt":
-        return to_srt(transcribed_chunks)
-    elif output_format == "vtt":
-        return to_vtt(transcribed_chunks)
-    else:
+    if output_format not in WRITERS:
         raise ValueError(f"Unsupported output format: {output_format}")
+    buffer = io.StringIO()
+    writer = WRITERS[output_format](buffer)
+    writer.write_chunks(transcribed_chunks)
+    writer.finish()
+    return buffer.getvalue()
 
 def _format_time(seconds):
     hours = int(seconds // 3600)
@@ -15,27 +39,193 @@ def _format_time(seconds):
     milliseconds = int((seconds - int(seconds)) * 1000)
     return f"{hours:02}:{minutes:02}:{secs:02},{milliseconds:03}"
 
+class TranscriptWriter:
+    """
+    Writes a transcript to a text stream one chunk at a time. Each chunk is
+    flushed as soon as it is written, so the file can be read while the job
+    is still running and holds every finished chunk if the job dies. Only
+    the cue counter is kept, so memory use does not grow with the transcript.
+    The finished file is identical to what format_transcription returns.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.cues = 0
+        self._finished = False
+        self._write_header()
+
+    def _write_header(self):
+        pass
+
+    def _write_footer(self):
+        pass
+
+    def _write_cue(self, segment, chunk):
+        raise NotImplementedError
+
+    def write_chunk(self, chunk):
+        if chunk.get("silent"):
+            return
+        for segment in chunk_segments(chunk):
+            self._write_cue(segment, chunk)
+            self.cues += 1
+        self.stream.flush()
+
+    def write_chunks(self, chunks):
+        for chunk in chunks:
+            self.write_chunk(chunk)
+
+    def finish(self):
+        """Writes whatever closes the document; called once, by close() for files."""
+        if not self._finished:
+            self._finished = True
+            self._write_footer()
+            self.stream.flush()
+
+    def close(self):
+        try:
+            self.finish()
+        finally:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class TxtWriter(TranscriptWriter):
+    def _write_cue(self, segment, chunk):
+        self.stream.write(f"{' ' if self.cues else ''}{segment['text']}")
+
+class SrtWriter(TranscriptWriter):
+    def _write_cue(self, segment, chunk):
+        start_time = _format_time(segment["start"])
+        end_time = _format_time(segment["end"])
+        # Cues are separated by a blank line, written in front of every cue but the first
+        separator = "\n" if self.cues else ""
+        self.stream.write(f"{separator}{self.cues + 1}\n{start_time} --> {end_time}\n{segment['text']}\n")
+
+class VttWriter(TranscriptWriter):
+    def _write_header(self):
+        self.stream.write("WEBVTT\n")
+        self.stream.flush()
+
+    def _write_cue(self, segment, chunk):
+        start_time = _format_time(segment["start"]).replace(',', '.')
+        end_time = _format_time(segment["end"]).replace(',', '.')
+        self.stream.write(f"\n{start_time} --> {end_time}\n{segment['text']}\n")
+
+def _segment_record(segment, chunk):
+    # The chunk status tells consumers whether the text is a transcription or an error marker
+    return {**segment, "status": chunk.get("status", "ok")}
+
+class JsonlWriter(TranscriptWriter):
+    """One JSON object per segment and line; every line is complete as soon as it is written."""
+
+    def _write_cue(self, segment, chunk):
+        self.stream.write(json.dumps(_segment_record(segment, chunk), ensure_ascii=False) + "\n")
+
+class JsonWriter(TranscriptWriter):
+    """A {"segments": [...]} document; the closing brackets are written when the writer finishes."""
+
+    def _write_header(self):
+        self.stream.write('{"segments": [')
+        self.stream.flush()
+
+    def _write_cue(self, segment, chunk):
+        separator = "," if self.cues else ""
+        self.stream.write(f"{separator}\n  {json.dumps(_segment_record(segment, chunk), ensure_ascii=False)}")
+
+    def _write_footer(self):
+        self.stream.write("\n]}\n" if self.cues else "]}\n")
+
+WRITERS = {"txt": TxtWriter, "srt": SrtWriter, "vtt": VttWriter, "json": JsonWriter, "jsonl": JsonlWriter}
+
+class FanOutWriter:
+    """Passes every chunk to several writers, so one run renders all formats in a single pass."""
+
+    def __init__(self, writers):
+        self.writers = writers
+
+    def write_chunk(self, chunk):
+        for writer in self.writers:
+            writer.write_chunk(chunk)
+
+    def write_chunks(self, chunks):
+        for chunk in chunks:
+            self.write_chunk(chunk)
+
+    def close(self):
+        errors = []
+        for writer in self.writers:
+            try:
+                writer.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def output_paths(output_path, output_formats):
+    """
+    Maps each output format to its file. A single format is written to
+    output_path as given; with several, each gets output_path's name with the
+    format as its extension, e.g. talk.txt, talk.srt and talk.json.
+    """
+    if isinstance(output_formats, str):
+        output_formats = [output_formats]
+    output_formats = list(dict.fromkeys(output_formats))
+    for output_format in output_formats:
+        if output_format not in WRITERS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+    if len(output_formats) == 1:
+        return {output_formats[0]: output_path}
+    if output_path == STDOUT_PATH:
+        raise ValueError("Only one output format can be written to standard output.")
+    stem, extension = os.path.splitext(output_path)
+    if extension[1:].lower() not in WRITERS:
+        stem = output_path
+    return {output_format: f"{stem}.{output_format}" for output_format in output_formats}
+
+class _StandardOutput:
+    """Standard output as a writer's stream; closing it only flushes, so the process keeps its stdout."""
+
+    def write(self, text):
+        return sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def close(self):
+        self.flush()
+
+def open_writer(path, output_format):
+    """Creates (or truncates) path, or uses standard output for "-", and returns a streaming writer for output_format."""
+    if output_format not in WRITERS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if path == STDOUT_PATH:
+        return WRITERS[output_format](_StandardOutput())
+    return WRITERS[output_format](open(path, "w", encoding="utf-8"))
+
+def open_writers(paths):
+    """Opens a writer for every {format: path} entry and returns them as one FanOutWriter."""
+    writers = []
+    try:
+        for output_format, path in paths.items():
+            writers.append(open_writer(path, output_format))
+    except Exception:
+        FanOutWriter(writers).close()
+        raise
+    return FanOutWriter(writers)
+
 def to_srt(transcribed_chunks):
-    srt_content = []
-    for i, chunk in enumerate(transcribed_chunks):
-        if not all(k in chunk for k in ("start_time", "end_time", "text")):
-            raise KeyError("Each chunk must contain 'start_time', 'end_time', and 'text' keys.")
-        start_time = _format_time(chunk["start_time"])
-        end_time = _format_time(chunk["end_time"])
-        srt_content.append(f"{i + 1}")
-        srt_content.append(f"{start_time} --> {end_time}")
-        srt_content.append(chunk["text"])
-        srt_content.append("")  # Empty line for separation
-    return "\n".join(srt_content)
+    return format_transcription(transcribed_chunks, "srt")
 
 def to_vtt(transcribed_chunks):
-    vtt_content = ["WEBVTT", ""]
-    for chunk in transcribed_chunks:
-        if not all(k in chunk for k in ("start_time", "end_time", "text")):
-            raise KeyError("Each chunk must contain 'start_time', 'end_time', and 'text' keys.")
-        start_time = _format_time(chunk["start_time"]).replace(',', '.')
-        end_time = _format_time(chunk["end_time"]).replace(',', '.')
-        vtt_content.append(f"{start_time} --> {end_time}")
-        vtt_content.append(chunk["text"])
-        vtt_content.append("")  # Empty line for separation
-    return "\n".join(vtt_content)
+    return format_transcription(transcribed_chunks, "vtt")
@@ -0,0 +1,118 @@
+import numpy as np
+
+# Sample rate both transcription engines work at internally
+ENGINE_SAMPLE_RATE = 16000
+# Length of the anti-aliasing filter applied before downsampling; odd, so it is centered
+LOWPASS_TAPS = 63
+# Filter cutoff as a fraction of the target Nyquist frequency, leaving room for the transition band
+ANTI_ALIAS_CUTOFF = 0.9
+
+
+def pcm_to_float32(pcm, sample_width, channels=1):
+    """
+    Converts interleaved little-endian PCM bytes to a mono float32 array in [-1, 1].
+    Multi-channel audio is downmixed by averaging the channels.
+    """
+    if sample_width == 1:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3)
+        # Sign-extend 24-bit samples into the top three bytes of an int32
+        padded = np.zeros((raw.shape[0], 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view("<i4").reshape(-1).astype(np.float32) / 2147483648.0
+    elif sample_width == 4:
+        samples = np.frombuffer(pcm, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def resample(samples, source_rate, target_rate=ENGINE_SAMPLE_RATE):
+    """Resamples a mono float32 array with linear interpolation."""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    target_length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(target_length, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def float32_to_pcm16(samples):
+    """Converts a float32 array in [-1, 1] to 16-bit little-endian PCM bytes."""
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def lowpass_taps(cutoff, taps=LOWPASS_TAPS):
+    """Windowed-sinc low-pass FIR filter; cutoff is in cycles per sample (0.5 is Nyquist)."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+class StreamResampler:
+    """
+    Resamples mono float32 audio that arrives in blocks, so a whole recording
+    can be converted in bounded memory. Downsampling first low-pass filters
+    the signal to avoid aliasing. Filter history and the interpolation
+    position carry over between blocks, so the output is continuous across
+    block boundaries. Call flush() after the last block.
+    """
+
+    def __init__(self, source_rate, target_rate=ENGINE_SAMPLE_RATE):
+        self.step = source_rate / target_rate
+        self._taps = lowpass_taps(0.5 * ANTI_ALIAS_CUTOFF / self.step) if target_rate < source_rate else None
+        self._delay = len(self._taps) // 2 if self._taps is not None else 0
+        # The filter is centered: output i needs input up to i + delay, so the first delay inputs only fill history
+        self._history = np.zeros(self._delay, dtype=np.float32)
+        self._carry = None
+        self._offset = 0.0
+
+    def _filter(self, samples):
+        if self._taps is None:
+            return samples
+        padded = np.concatenate((self._history, samples))
+        if len(padded) < len(self._taps):
+            self._history = padded
+            return np.zeros(0, dtype=np.float32)
+        self._history = padded[len(padded) - (len(self._taps) - 1):]
+        return np.convolve(padded, self._taps, mode="valid").astype(np.float32)
+
+    def _interpolate(self, samples):
+        if self.step == 1.0 or len(samples) == 0:
+            return samples
+        if self._carry is None:
+            known, origin = samples, 0
+        else:
+            # The previous block's last sample sits at position -1
+            known, origin = np.concatenate(([self._carry], samples)), -1
+        last = len(samples) - 1
+        count = int((last - self._offset) // self.step) + 1 if self._offset <= last else 0
+        positions = self._offset + np.arange(count, dtype=np.float64) * self.step
+        resampled = np.interp(positions, np.arange(origin, len(samples)), known).astype(np.float32)
+        self._offset += count * self.step - len(samples)
+        self._carry = samples[-1]
+        return resampled
+
+    def process(self, samples):
+        return self._interpolate(self._filter(samples))
+
+    def flush(self):
+        """Returns the output still held back by the filter delay."""
+        return self.process(np.zeros(self._delay, dtype=np.float32)) if self._delay else np.zeros(0, dtype=np.float32)
+
+
+def convert_pcm_blocks(blocks, sample_width, channels, source_rate, target_rate=ENGINE_SAMPLE_RATE):
+    """
+    Converts a stream of interleaved PCM blocks (each a whole number of frames)
+    to 16-bit mono PCM at target_rate, yielding one output block per input block.
+    """
+    resampler = StreamResampler(source_rate, target_rate)
+    for block in blocks:
+        yield float32_to_pcm16(resampler.process(pcm_to_float32(block, sample_width, channels)))
+    yield float32_to_pcm16(resampler.flush())
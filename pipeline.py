@@ -0,0 +1,181 @@
+import queue
+import threading
+
+# How often blocked stages wake up to check whether the pipeline was stopped
+POLL_INTERVAL = 0.1
+
+_END = object()
+
+
+class _ExtractionFailed:
+    """Marks the point in the chunk stream where reading the audio failed."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class StageQueue(queue.Queue):
+    """Bounded queue between two pipeline stages that records how full it runs."""
+
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self.max_depth = 0
+        self._depth_total = 0
+        self._samples = 0
+
+    def _get(self):
+        # Sampled by the consuming stage: a queue that is usually full means the
+        # consumer is the bottleneck, one that is usually empty means the producer is
+        depth = self._qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_total += depth
+        self._samples += 1
+        return super()._get()
+
+    def wait_for_room(self, timeout):
+        """Waits up to timeout seconds for a free slot; returns whether a put would not block."""
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                self.not_full.wait(timeout)
+            return self._qsize() < self.maxsize
+
+    def stats(self):
+        return {
+            "capacity": self.maxsize,
+            "depth": self.qsize(),
+            "mean_depth": self._depth_total / self._samples if self._samples else 0.0,
+            "max_depth": self.max_depth,
+        }
+
+
+class ChunkPipeline:
+    """
+    Runs chunk transcription as three stages connected by bounded queues:
+
+    - extraction reads (index, start_ms, end_ms, pcm) tuples from `chunks` in a
+      background thread;
+    - recognition calls submit_chunk(index, pcm, start_ms, end_ms) in the calling
+      thread; it returns a Future, so an executor can keep several chunks in flight;
+    - writing waits for each Future in chunk order and calls
+      on_chunk_done(index, chunk) in a background thread.
+
+    A full queue blocks the stage feeding it, so a slow engine holds back
+    decoding instead of letting decoded audio pile up in memory. Chunks reach
+    on_chunk_done strictly in order, so progress only ever advances past a
+    contiguous prefix of finished chunks. A chunk is only submitted once the
+    write queue has room for it, so at most write_queue_size + 1 submitted
+    chunks (the queued ones and the one the writer waits on) are unwritten at
+    a time. If reading or submitting a chunk fails, the chunks before it are
+    still written before the error is raised. run() returns only after the
+    extraction thread has stopped, so the caller may close the reader then.
+    """
+
+    def __init__(self, chunks, submit_chunk, on_chunk_done, extract_queue_size=1, write_queue_size=1):
+        self._chunks = chunks
+        self._submit_chunk = submit_chunk
+        self._on_chunk_done = on_chunk_done
+        self.extracted = StageQueue("extract", max(1, extract_queue_size))
+        self.recognized = StageQueue("write", max(1, write_queue_size))
+        self._stopped = threading.Event()
+        self._writer_error = None
+
+    def queue_depths(self):
+        """Returns the current number of chunks waiting in front of each stage."""
+        return {self.extracted.name: self.extracted.qsize(), self.recognized.name: self.recognized.qsize()}
+
+    def queue_stats(self):
+        """Returns capacity, current, mean and maximum depth of each stage queue."""
+        return {self.extracted.name: self.extracted.stats(), self.recognized.name: self.recognized.stats()}
+
+    def _put(self, stage_queue, item):
+        """Blocks until there is room in stage_queue; returns False if the pipeline was stopped meanwhile."""
+        while not self._stopped.is_set():
+            try:
+                stage_queue.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _wait_for_room(self, stage_queue):
+        """Blocks until stage_queue has a free slot; returns False if the pipeline was stopped meanwhile."""
+        while not self._stopped.is_set():
+            if stage_queue.wait_for_room(POLL_INTERVAL):
+                return True
+        return False
+
+    def _get(self, stage_queue):
+        """Blocks until an item arrives; returns _END if the pipeline was stopped meanwhile."""
+        while not self._stopped.is_set():
+            try:
+                return stage_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _extract(self):
+        try:
+            for chunk in self._chunks:
+                if not self._put(self.extracted, chunk):
+                    return
+        except Exception as e:
+            self._put(self.extracted, _ExtractionFailed(e))
+            return
+        self._put(self.extracted, _END)
+
+    def _write(self):
+        try:
+            while True:
+                item = self._get(self.recognized)
+                if item is _END:
+                    return
+                index, future = item
+                self._on_chunk_done(index, future.result())
+        except BaseException as e:
+            self._writer_error = e
+            self._stopped.set()
+
+    def run(self):
+        extractor = threading.Thread(target=self._extract, name="chunk-extract", daemon=True)
+        writer = threading.Thread(target=self._write, name="chunk-write", daemon=True)
+        extractor.start()
+        writer.start()
+        error = None
+        try:
+            while True:
+                item = self._get(self.extracted)
+                if item is _END:
+                    break
+                if isinstance(item, _ExtractionFailed):
+                    error = item.error
+                    break
+                index, start_ms, end_ms, pcm = item
+                # Submitting only once the future can be queued keeps it from
+                # waiting in this thread as one chunk more than the cap
+                if not self._wait_for_room(self.recognized):
+                    break
+                try:
+                    future = self._submit_chunk(index, pcm, start_ms, end_ms)
+                except Exception as e:
+                    error = e
+                    break
+                if not self._put(self.recognized, (index, future)):
+                    break
+            # Let the writer finish the chunks already submitted
+            self._put(self.recognized, _END)
+            writer.join()
+        except BaseException:
+            self._stopped.set()
+            writer.join()
+            raise
+        finally:
+            # Unblocks the extractor if it is still waiting for queue space, and
+            # waits for it to finish its read before the caller closes the reader
+            self._stopped.set()
+            extractor.join()
+
+        if self._writer_error is not None:
+            raise self._writer_error
+        if error is not None:
+            raise error
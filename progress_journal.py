@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+# Header fields that must match for a journal to be resumed
+HEADER_FIELDS = ["input_hash", "chunk_duration", "engine", "language", "segmentation", "time_range"]
+DEFAULT_FSYNC_EVERY = 10
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ResumeMismatchError(ValueError):
+    """Raised when a progress journal was written for a different input or settings."""
+
+
+def hash_file(path):
+    """Returns the SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def segmentation_settings(segmentation, min_chunk_duration=None, silence_threshold=None, min_silence=None):
+    """Describes how chunk boundaries are placed; VAD boundaries also depend on its thresholds."""
+    if segmentation != "vad":
+        return segmentation
+    return {"mode": segmentation, "min_chunk": min_chunk_duration,
+            "silence_threshold": silence_threshold, "min_silence": min_silence}
+
+
+def make_header(input_hash, chunk_duration, engine, language, segmentation="fixed", time_range=None):
+    """
+    Builds the journal header describing the run a journal belongs to.
+    time_range is [start_ms, end_ms] of the recording, or None for all of it.
+    """
+    return {
+        "type": "header",
+        "version": JOURNAL_VERSION,
+        "input_hash": input_hash,
+        "chunk_duration": chunk_duration,
+        "engine": engine,
+        "language": language,
+        "segmentation": segmentation,
+        "time_range": time_range,
+    }
+
+
+def _read_records(path):
+    """
+    Parses a journal into (header, records, valid_bytes). A torn final line, as
+    left by a crash mid-write, is ignored; valid_bytes is the length of the
+    intact prefix. Returns (None, [], 0) if the file is not a journal.
+    """
+    header = None
+    records = []
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if header is None:
+                if not isinstance(record, dict) or record.get("type") != "header":
+                    return None, [], 0
+                header = record
+            elif record.get("type") == "chunk":
+                records.append(record)
+            valid_bytes += len(line)
+    return header, records, valid_bytes
+
+
+def read_header(path):
+    """Returns the header of a progress journal, or None if the file is not a journal."""
+    return _read_records(path)[0]
+
+
+def _record_to_chunk(record):
+    return {key: value for key, value in record.items() if key not in ("type", "index")}
+
+
+def _latest_records(records):
+    """Keeps the last record per chunk index, in index order; a retried chunk is appended again under its index."""
+    latest = {}
+    for record in records:
+        latest[record["index"]] = record
+    return [latest[index] for index in sorted(latest)]
+
+
+def check_header(header, expected_header, path):
+    """Raises ResumeMismatchError if the journal header differs from the expected one."""
+    mismatched = [
+        field for field in HEADER_FIELDS
+        if field in expected_header and header.get(field) != expected_header[field]
+    ]
+    if mismatched:
+        details = ", ".join(f"{field}: journal has {header.get(field)!r}, run has {expected_header[field]!r}" for field in mismatched)
+        raise ResumeMismatchError(f"Progress file '{path}' belongs to a different transcription ({details}). "
+                                  "Use a new progress file or restore the original input and options.")
+
+
+def load_progress(path, expected_header=None):
+    """
+    Loads a progress file and returns (transcribed_chunks, last_chunk_index),
+    with last_chunk_index -1 if nothing was transcribed yet. Both append-only
+    journals and the older single-JSON progress files are understood. Journals
+    are checked against expected_header; a mismatch raises ResumeMismatchError.
+    """
+    header, records, _ = _read_records(path)
+    if header is None:
+        # Older progress files hold one JSON document rewritten after every chunk
+        with open(path, "r") as f:
+            progress_data = json.load(f)
+        if expected_header is not None:
+            logger.warning(f"Progress file '{path}' uses the old format and cannot be checked against the input; "
+                           "make sure it belongs to this file and --chunk value.")
+        return progress_data.get("transcribed_chunks", []), progress_data.get("last_chunk_index", -1)
+
+    if expected_header is not None:
+        check_header(header, expected_header, path)
+    records = _latest_records(records)
+    last_chunk_index = records[-1]["index"] if records else -1
+    return [_record_to_chunk(record) for record in records], last_chunk_index
+
+
+class ProgressJournal:
+    """
+    Append-only JSON Lines progress journal: a header line followed by one
+    record per finished chunk, so saving progress costs one line instead of
+    rewriting every previous chunk. Records are flushed as they are written
+    and fsynced every fsync_every records (0 leaves syncing to the OS).
+    A chunk appended again under an index it already has replaces the
+    earlier record when the journal is loaded.
+    """
+
+    def __init__(self, path, header, existing_chunks=(), start_index=0, fsync_every=DEFAULT_FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._unsynced = 0
+
+        current_header, records, valid_bytes = _read_records(path) if os.path.exists(path) else (None, [], 0)
+        if current_header is not None and current_header == header and len(_latest_records(records)) == len(existing_chunks):
+            # Continue the existing journal, dropping any torn record at its end
+            self._file = open(path, "r+b")
+            self._file.truncate(valid_bytes)
+            self._file.seek(valid_bytes)
+        else:
+            # New run, old-format file or a journal out of step with the caller: start a fresh journal
+            self._file = open(path, "wb")
+            self._write(header)
+            first_index = start_index - len(existing_chunks)
+            for offset, chunk in enumerate(existing_chunks):
+                self._write({"type": "chunk", "index": first_index + offset, **chunk})
+            self.sync()
+
+    def _write(self, record):
+        self._file.write((json.dumps(record) + "\n").encode("utf-8"))
+
+    def append(self, index, chunk):
+        self._write({"type": "chunk", "index": index, **chunk})
+        self._file.flush()
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.sync()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,50 @@
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 30.0
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the wait before retry n is drawn
+    uniformly from [0, min(max_delay, base_delay * 2**n)], so clients that
+    failed together do not retry together. Instances are plain data and can be
+    sent to worker processes.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, base_delay=DEFAULT_RETRY_BASE_DELAY, max_delay=DEFAULT_RETRY_MAX_DELAY):
+        if retries < 0:
+            raise ValueError(f"Retries must not be negative, got {retries}")
+        if base_delay < 0 or max_delay < 0:
+            raise ValueError("Retry delays must not be negative")
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Seconds to wait after the given failed attempt (0 for the first call)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, *args, retry_on=(Exception,), sleep=time.sleep, **kwargs):
+        """
+        Calls function until it succeeds or the retries are used up, retrying
+        only exceptions of the retry_on types. Returns (result, attempts); the
+        last error is raised with its 'attempts' attribute set.
+        """
+        attempt = 0
+        while True:
+            try:
+                return function(*args, **kwargs), attempt + 1
+            except retry_on as e:
+                if attempt >= self.retries:
+                    e.attempts = attempt + 1
+                    raise
+                wait = self.delay(attempt)
+                logger.debug(f"Attempt {attempt + 1} failed ({e}); retrying in {wait:.2f}s.")
+                sleep(wait)
+                attempt += 1
@@ -0,0 +1,251 @@
+import logging
+from collections import deque
+
+import numpy as np
+
+from chunk_reader import MS_PER_SECOND
+from pcm import pcm_to_float32
+
+logger = logging.getLogger(__name__)
+
+# Length of the analysis frames used for energy measurement
+FRAME_MS = 30
+# Audio read per step while measuring energy; bounds memory regardless of file length
+ANALYSIS_WINDOW_MS = 60 * MS_PER_SECOND
+# Speech kept on either side of a pause so word onsets and tails are not clipped
+SPEECH_PADDING_MS = 200
+
+
+def compute_frame_energy(reader, frame_ms=FRAME_MS):
+    """
+    Returns the level of every frame_ms frame of the reader's audio in dBFS,
+    from its start_ms on. The audio is read window by window, so memory depends
+    on the window size and the number of frames, not on the file length.
+    """
+    frame_length = max(1, reader.sample_rate * frame_ms // MS_PER_SECOND)
+    levels = []
+    # Windows are a whole number of frames long so frames never straddle two reads
+    window_ms = ANALYSIS_WINDOW_MS - ANALYSIS_WINDOW_MS % frame_ms
+    for start_ms in range(reader.start_ms, reader.total_duration_ms, window_ms):
+        end_ms = min(start_ms + window_ms, reader.total_duration_ms)
+        samples = pcm_to_float32(reader.read_window(start_ms, end_ms), reader.sample_width, reader.channels)
+        usable = len(samples) - len(samples) % frame_length
+        if usable == 0:
+            continue
+        frames = samples[:usable].reshape(-1, frame_length)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        levels.append(20 * np.log10(np.maximum(rms, 1e-10)))
+    return np.concatenate(levels) if levels else np.zeros(0)
+
+
+def find_silences(energy_db, threshold_db, min_silence_ms, frame_ms=FRAME_MS):
+    """Returns (start_ms, end_ms) of every run of frames below threshold_db lasting at least min_silence_ms."""
+    silent = np.concatenate(([False], energy_db < threshold_db, [False]))
+    changes = np.flatnonzero(silent[1:] != silent[:-1])
+    starts, ends = changes[::2], changes[1::2]
+    long_enough = (ends - starts) * frame_ms >= min_silence_ms
+    return [(int(start) * frame_ms, int(end) * frame_ms) for start, end in zip(starts[long_enough], ends[long_enough])]
+
+
+def _split_speech(start_ms, end_ms, energy_db, min_chunk_ms, max_chunk_ms, frame_ms):
+    """Splits a speech region longer than max_chunk_ms at its quietest frames."""
+    pieces = []
+    while end_ms - start_ms > max_chunk_ms:
+        first_frame = (start_ms + min(min_chunk_ms, max_chunk_ms)) // frame_ms
+        last_frame = (start_ms + max_chunk_ms) // frame_ms
+        window = energy_db[first_frame:last_frame]
+        if len(window) == 0:
+            cut_ms = start_ms + max_chunk_ms
+        else:
+            cut_ms = (first_frame + int(np.argmin(window))) * frame_ms + frame_ms // 2
+            cut_ms = min(max(cut_ms, start_ms + 1), start_ms + max_chunk_ms)
+        pieces.append((start_ms, cut_ms, True))
+        start_ms = cut_ms
+    pieces.append((start_ms, end_ms, True))
+    return pieces
+
+
+def plan_segments(energy_db, total_duration_ms, min_chunk_ms, max_chunk_ms, threshold_db=-40.0,
+                  min_silence_ms=500, frame_ms=FRAME_MS, padding_ms=SPEECH_PADDING_MS):
+    """
+    Covers [0, total_duration_ms) with contiguous (start_ms, end_ms, is_speech) segments.
+    Pauses of at least min_silence_ms become silent segments; the speech between
+    them is split at its quietest points into pieces of at most max_chunk_ms,
+    never cutting a piece shorter than min_chunk_ms.
+    """
+    segments = []
+    position = 0
+    analysed_ms = len(energy_db) * frame_ms
+    for silence_start, silence_end in find_silences(energy_db, threshold_db, min_silence_ms, frame_ms):
+        # Pad the speech on both sides, except at the very start and end of the audio
+        silence_start = silence_start + padding_ms if silence_start > 0 else 0
+        silence_end = silence_end - padding_ms if silence_end < analysed_ms else total_duration_ms
+        if silence_end <= silence_start:
+            continue
+        if silence_start > position:
+            segments.extend(_split_speech(position, silence_start, energy_db, min_chunk_ms, max_chunk_ms, frame_ms))
+        segments.append((silence_start, silence_end, False))
+        position = silence_end
+    if position < total_duration_ms:
+        segments.extend(_split_speech(position, total_duration_ms, energy_db, min_chunk_ms, max_chunk_ms, frame_ms))
+    return segments
+
+
+class SegmentedChunkReader:
+    """
+    Wraps a seekable reader so that chunks follow a precomputed segment plan
+    instead of fixed windows. Silent segments are yielded with pcm=None so they
+    keep their place in the timeline without their audio being read.
+    """
+
+    def __init__(self, reader, segments):
+        self._reader = reader
+        self.segments = segments
+        self.sample_rate = reader.sample_rate
+        self.sample_width = reader.sample_width
+        self.channels = reader.channels
+        self.num_chunks = len(segments)
+
+    def iter_chunks(self, start_index=0):
+        for i in range(start_index, len(self.segments)):
+            start_ms, end_ms, is_speech = self.segments[i]
+            yield i, start_ms, end_ms, self._reader.read_window(start_ms, end_ms) if is_speech else None
+
+    def close(self):
+        self._reader.close()
+
+
+class StreamSegmenter:
+    """
+    Cuts a PCM stream (a chunk_reader.PcmStreamChunkReader) into chunks at
+    pauses while the audio arrives, for live input that cannot be analysed
+    ahead. The rules follow plan_segments: a pause of at least min_silence_ms
+    ends a speech chunk, padded by padding_ms on both sides, and speech that
+    runs to max_chunk_ms is cut at its quietest frame after min_chunk_ms.
+    Silent stretches become chunks with pcm=None of at most max_chunk_ms.
+    Every chunk is yielded as soon as its end has been read, so chunks trail
+    the stream by at most max_chunk_ms.
+    """
+
+    def __init__(self, reader, min_chunk_ms, max_chunk_ms, threshold_db=-40.0, min_silence_ms=500,
+                 frame_ms=FRAME_MS, padding_ms=SPEECH_PADDING_MS):
+        self._reader = reader
+        self.sample_rate = reader.sample_rate
+        self.sample_width = reader.sample_width
+        self.channels = reader.channels
+        self.num_chunks = None
+        self.start_ms = reader.start_ms
+        self._threshold_db = threshold_db
+        self._frame_ms = frame_ms
+        self._frame_length = max(1, reader.sample_rate * frame_ms // MS_PER_SECOND)
+        self._max_chunk_length = max(self._frame_length, reader.sample_rate * max_chunk_ms // MS_PER_SECOND)
+        self._min_chunk_frames = min(min_chunk_ms, max_chunk_ms) // frame_ms
+        self._min_silence_frames = max(1, -(-min_silence_ms // frame_ms))
+        self._padding_frames = padding_ms // frame_ms
+
+    def _level_db(self, pcm):
+        samples = pcm_to_float32(pcm, self.sample_width, self.channels)
+        rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64))) if len(samples) else 0.0
+        return 20 * np.log10(max(rms, 1e-10))
+
+    def _segments(self):
+        """Yields (start, end, pcm) of consecutive segments, in samples from the stream start; pcm is None for silence."""
+        frame_bytes = self._frame_length * self.sample_width * self.channels
+        position = 0
+        segment_start = 0
+        speech = None
+        levels = []
+        quiet_run = 0
+        # The latest quiet frames, which pad the start of the next speech
+        tail = deque(maxlen=self._padding_frames)
+        while True:
+            pcm = self._reader.read_frames(self._frame_length)
+            if not pcm:
+                break
+            length = len(pcm) // (self.sample_width * self.channels)
+            level = self._level_db(pcm)
+            quiet = level < self._threshold_db
+            if speech is None:
+                if quiet:
+                    if self._padding_frames:
+                        tail.append((pcm, level))
+                    position += length
+                    if position - segment_start >= self._max_chunk_length:
+                        yield segment_start, position, None
+                        segment_start = position
+                        tail.clear()
+                    continue
+                padding = list(tail)
+                tail.clear()
+                speech_start = position - sum(len(frame) for frame, _ in padding) // (self.sample_width * self.channels)
+                if speech_start > segment_start:
+                    yield segment_start, speech_start, None
+                segment_start = speech_start
+                speech = bytearray(b"".join(frame for frame, _ in padding))
+                levels = [frame_level for _, frame_level in padding]
+
+            speech += pcm
+            levels.append(level)
+            position += length
+            quiet_run = quiet_run + 1 if quiet else 0
+            if quiet_run >= self._min_silence_frames:
+                # A pause: the speech keeps padding_ms of it, the rest is silence; a pause
+                # shorter than the padding is kept whole
+                keep = min(len(levels) - quiet_run + self._padding_frames, len(levels))
+                yield segment_start, segment_start + keep * self._frame_length, bytes(speech[:keep * frame_bytes])
+                segment_start += keep * self._frame_length
+                for offset in range(keep, len(levels)):
+                    tail.append((bytes(speech[offset * frame_bytes:(offset + 1) * frame_bytes]), levels[offset]))
+                speech, levels, quiet_run = None, [], 0
+            elif position - segment_start >= self._max_chunk_length:
+                window = levels[self._min_chunk_frames:]
+                cut = self._min_chunk_frames + int(np.argmin(window)) if window else len(levels)
+                cut = max(cut, 1)
+                yield segment_start, segment_start + cut * self._frame_length, bytes(speech[:cut * frame_bytes])
+                segment_start += cut * self._frame_length
+                del speech[:cut * frame_bytes]
+                levels = levels[cut:]
+                quiet_run = min(quiet_run, len(levels))
+
+        if speech:
+            yield segment_start, position, bytes(speech)
+        elif position > segment_start:
+            yield segment_start, position, None
+
+    def iter_chunks(self, start_index=0):
+        """Yields (index, start_ms, end_ms, pcm) as the stream is read; chunks before start_index are discarded."""
+        for index, (start, end, pcm) in enumerate(self._segments()):
+            if index >= start_index:
+                yield (index, self.start_ms + round(start * MS_PER_SECOND / self.sample_rate),
+                       self.start_ms + round(end * MS_PER_SECOND / self.sample_rate), pcm)
+
+    def close(self):
+        self._reader.close()
+
+
+def segment_reader(reader, min_chunk_duration, max_chunk_duration, silence_threshold=-40.0, min_silence=0.5):
+    """
+    Returns a SegmentedChunkReader whose chunks end in pauses. Durations are in
+    seconds and silence_threshold is in dBFS. A reader without random access
+    (read_window), such as a decode pipe or live input, is segmented while it
+    is read instead (see StreamSegmenter).
+    """
+    if not hasattr(reader, "read_window"):
+        logger.info("Cutting the audio stream into chunks at pauses as it arrives.")
+        return StreamSegmenter(reader, int(min_chunk_duration * MS_PER_SECOND), int(max_chunk_duration * MS_PER_SECOND),
+                               threshold_db=silence_threshold, min_silence_ms=int(min_silence * MS_PER_SECOND))
+    energy_db = compute_frame_energy(reader)
+    segments = plan_segments(
+        energy_db,
+        reader.total_duration_ms - reader.start_ms,
+        int(min_chunk_duration * MS_PER_SECOND),
+        int(max_chunk_duration * MS_PER_SECOND),
+        threshold_db=silence_threshold,
+        min_silence_ms=int(min_silence * MS_PER_SECOND),
+    )
+    # The plan starts at 0; move it to where the reader's range starts
+    segments = [(start + reader.start_ms, end + reader.start_ms, is_speech) for start, end, is_speech in segments]
+    silent_ms = sum(end - start for start, end, is_speech in segments if not is_speech)
+    logger.info(f"Segmented audio into {sum(1 for segment in segments if segment[2])} speech chunks; "
+                f"skipping {silent_ms / MS_PER_SECOND:.1f}s of silence.")
+    return SegmentedChunkReader(reader, segments)
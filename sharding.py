@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import re
+
+from audio_converter import probe_duration_ms
+from chunk_reader import MS_PER_SECOND
+from output_formatter import open_writers, output_paths
+from progress_journal import load_progress, read_header
+
+logger = logging.getLogger(__name__)
+
+# "00:01:02,500 --> 00:01:05,000" in SRT, "01:02.500 --> 01:05.000" (hours optional) in VTT
+CUE_TIMING = re.compile(r"((?:\d+:)?\d+:\d+[,.]\d+)\s*-->\s*((?:\d+:)?\d+:\d+[,.]\d+)")
+
+
+def parse_shard(value):
+    """Parses 'INDEX/COUNT' (e.g. '2/4', counting from 1) into (index, count)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be INDEX/COUNT, e.g. 2/4, got '{value}'")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got '{value}'")
+    return index, count
+
+
+def shard_time_range(input_path, shard, chunk_duration, start_time=None, end_time=None):
+    """
+    Returns (start_time, end_time) in seconds of the part of the recording that
+    shard (index, count) transcribes. The chunks of the whole range are split
+    into count contiguous runs of nearly equal length, cut at chunk boundaries,
+    so the shards together produce the chunks of an unsharded run. end_time is
+    None for the last shard of a range that runs to the end of the recording.
+    """
+    index, count = shard
+    range_start_ms = round((start_time or 0) * MS_PER_SECOND)
+    range_end_ms = probe_duration_ms(input_path)
+    if end_time is not None:
+        range_end_ms = min(range_end_ms, round(end_time * MS_PER_SECOND))
+    chunk_ms = chunk_duration * MS_PER_SECOND
+    num_chunks = max(-(-(range_end_ms - range_start_ms) // chunk_ms), 0)
+    first_chunk, end_chunk = num_chunks * (index - 1) // count, num_chunks * index // count
+
+    start_ms = min(range_start_ms + first_chunk * chunk_ms, max(range_end_ms, range_start_ms))
+    end_ms = max(min(range_start_ms + end_chunk * chunk_ms, range_end_ms), start_ms)
+    if end_chunk > first_chunk:
+        logger.info(f"Shard {index}/{count}: chunks {first_chunk} to {end_chunk - 1} of {num_chunks} "
+                    f"({start_ms / MS_PER_SECOND:g}s to {end_ms / MS_PER_SECOND:g}s).")
+    else:
+        logger.warning(f"Shard {index}/{count} has no chunks; the range only has {num_chunks}.")
+    if index == count and end_time is None:
+        return start_ms / MS_PER_SECOND, None
+    return start_ms / MS_PER_SECOND, end_ms / MS_PER_SECOND
+
+
+def _parse_timestamp(text):
+    """Converts an SRT or VTT timestamp to seconds."""
+    parts = text.replace(",", ".").split(":")
+    return sum(float(part) * 60 ** power for power, part in enumerate(reversed(parts)))
+
+
+def _cue_chunks(path):
+    """Reads the cues of an SRT or VTT file as chunks; cue numbers and the VTT header are dropped."""
+    with open(path, "r", encoding="utf-8") as f:
+        blocks = re.split(r"\n\s*\n", f.read().replace("\r\n", "\n"))
+    chunks = []
+    for block in blocks:
+        lines = block.strip("\n").split("\n")
+        for position, line in enumerate(lines):
+            timing = CUE_TIMING.search(line)
+            if timing:
+                chunks.append({"text": "\n".join(lines[position + 1:]), "start_time": _parse_timestamp(timing.group(1)),
+                               "end_time": _parse_timestamp(timing.group(2)), "status": "ok"})
+                break
+    return chunks
+
+
+def _segment_chunk(segment):
+    """Turns a segment of JSON/JSONL output back into a chunk, keeping word timings if it has them."""
+    segment = dict(segment)
+    status = segment.pop("status", "ok")
+    return {"text": segment["text"], "start_time": segment["start"], "end_time": segment["end"],
+            "status": status, "segments": [segment]}
+
+
+def _journal_chunks(path, header):
+    chunks, _ = load_progress(path)
+    time_range = header.get("time_range")
+    if time_range and time_range[1] is not None:
+        reached_ms = round(chunks[-1]["end_time"] * MS_PER_SECOND) if chunks else time_range[0]
+        # Decoded ranges can come up a few milliseconds short of the requested end
+        if time_range[1] - reached_ms >= MS_PER_SECOND:
+            logger.warning(f"Progress file '{path}' stops at {reached_ms / MS_PER_SECOND:g}s of its range ending at "
+                           f"{time_range[1] / MS_PER_SECOND:g}s; that shard has not finished.")
+    return chunks
+
+
+def read_shard(path):
+    """
+    Returns the chunks recorded in one shard's output: a progress journal, JSON
+    or JSONL segment output, or an SRT or VTT file. Plain text carries no
+    timings, so it cannot be merged and raises ValueError.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Shard output not found: '{path}'")
+    extension = os.path.splitext(path)[1][1:].lower()
+    if extension in ("srt", "vtt"):
+        return _cue_chunks(path)
+    header = read_header(path)
+    if header is not None:
+        return _journal_chunks(path, header)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if extension == "json":
+                return [_segment_chunk(segment) for segment in json.load(f)["segments"]]
+            if extension == "jsonl":
+                return [_segment_chunk(json.loads(line)) for line in f if line.strip()]
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"Could not read shard output '{path}': {e}")
+    raise ValueError(f"Cannot merge '{path}': use progress files or srt, vtt, json or jsonl output, "
+                     "since plain text has no timings.")
+
+
+def _check_same_input(paths):
+    """Raises ValueError if progress journals among paths were written for different input files."""
+    hashes = {}
+    for path in paths:
+        if os.path.splitext(path)[1].lower() in (".srt", ".vtt", ".json"):
+            continue
+        header = read_header(path) if os.path.exists(path) else None
+        if header is not None and header.get("input_hash"):
+            hashes.setdefault(header["input_hash"], path)
+    if len(hashes) > 1:
+        raise ValueError(f"Progress files belong to different inputs: {', '.join(repr(path) for path in hashes.values())}.")
+
+
+def merge_shards(shard_paths, output_path, output_format="txt"):
+    """
+    Merges the outputs of several shards of one recording into a single
+    transcript ordered by time, written in every requested format (see
+    output_formatter.output_paths). The shards keep the recording's timeline,
+    so writing their chunks afresh renumbers the SRT cues and leaves one VTT
+    header; a chunk found in more than one shard is kept once. Returns the
+    merged chunks.
+    """
+    _check_same_input(shard_paths)
+    merged = {}
+    for path in shard_paths:
+        chunks = read_shard(path)
+        logger.info(f"Read {len(chunks)} chunks from '{path}'.")
+        for chunk in chunks:
+            merged.setdefault((chunk["start_time"], chunk["end_time"]), chunk)
+    chunks = [merged[key] for key in sorted(merged)]
+
+    paths = output_paths(output_path, output_format)
+    with open_writers(paths) as writer:
+        writer.write_chunks(chunks)
+    saved = ", ".join(f"'{path}'" for path in paths.values())
+    logger.info(f"Merged {len(shard_paths)} shards into {saved}.")
+    return chunks
@@ -0,0 +1,25 @@
+import wave
+import pytest
+
+@pytest.fixture
+def write_wav(tmp_path):
+    """
+    Returns write_wav(filename, seconds=1, sample_rate=16000, channels=1, frames=None),
+    which writes a 16-bit WAV to tmp_path / filename (an absolute filename is
+    used as it is) and returns its path. frames are raw PCM bytes or an array
+    of interleaved samples; without them `seconds` of silence are written.
+    """
+    def _write_wav(filename, seconds=1, sample_rate=16000, channels=1, frames=None):
+        file_path = tmp_path / filename
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if frames is None:
+            frames = b"\x00\x00" * (round(seconds * sample_rate) * channels)
+        elif not isinstance(frames, bytes):
+            frames = frames.astype("<i2").tobytes()
+        with wave.open(str(file_path), "wb") as wav_file:
+            wav_file.setnchannels(channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(frames)
+        return str(file_path)
+    return _write_wav
@@ -1,7 +1,13 @@
 import pytest
+import io
 import os
+import struct
+import subprocess
+import sys
+import wave
+import numpy as np
 from pydub import AudioSegment
-from audio_converter import convert_to_wav, SUPPORTED_FORMATS
+from audio_converter import convert_to_wav, open_live_stream, open_pcm_stream, SUPPORTED_FORMATS
 from unittest.mock import MagicMock
 
 @pytest.fixture
@@ -26,26 +32,81 @@ def create_dummy_audio_file(tmp_path):
         return str(file_path)
     return _create_dummy_audio_file
 
-def test_convert_to_wav_already_wav(create_dummy_audio_file):
-    wav_path = create_dummy_audio_file("test.wav", "wav")
-    converted_path = convert_to_wav(wav_path)
-    if isinstance(converted_path, tuple):
-        converted_path = converted_path[0]
-    assert converted_path == wav_path
-    assert os.path.exists(converted_path)
+def _tone(sample_rate, seconds=1.0, frequency=440):
+    return (0.5 * np.sin(2 * np.pi * frequency * np.arange(int(sample_rate * seconds)) / sample_rate) * 32767)
+
+def test_convert_to_wav_already_wav(write_wav):
+    wav_path = write_wav("test.wav", frames=_tone(16000))
+    assert convert_to_wav(wav_path) == wav_path
+
+def test_convert_to_wav_resamples_and_downmixes_wav(write_wav):
+    stereo = np.repeat(_tone(48000, seconds=2), 2)
+    wav_path = write_wav("stereo.wav", sample_rate=48000, channels=2, frames=stereo)
+
+    converted_path, cleanup_func = convert_to_wav(wav_path)
+
+    with wave.open(converted_path, "rb") as converted:
+        assert (converted.getframerate(), converted.getnchannels(), converted.getsampwidth()) == (16000, 1, 2)
+        samples = np.frombuffer(converted.readframes(converted.getnframes()), dtype="<i2")
+    assert len(samples) == 32000
+    # The tone survives the conversion at the same level
+    np.testing.assert_allclose(samples[100:-100], _tone(16000, seconds=2)[100:-100], atol=50)
+    cleanup_func()
+    assert not os.path.exists(converted_path)
+
+def test_convert_to_wav_resamples_extensible_wav(tmp_path):
+    pcm = _tone(8000).astype("<i2").tobytes()
+    fmt = struct.pack("<HHIIHHHHI", 0xFFFE, 1, 8000, 16000, 2, 16, 22, 16, 0x4) + bytes.fromhex("0100000000001000800000aa00389b71")
+    wav_path = tmp_path / "extensible.wav"
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(pcm)) + pcm
+    wav_path.write_bytes(b"RIFF" + struct.pack("<I", len(body)) + body)
+
+    converted_path, cleanup_func = convert_to_wav(str(wav_path))
+
+    with wave.open(converted_path, "rb") as converted:
+        assert (converted.getframerate(), converted.getnchannels()) == (16000, 1)
+        assert abs(converted.getnframes() - 16000) <= 1
+    cleanup_func()
+
+def test_convert_to_wav_converts_only_time_range_of_wav(write_wav):
+    # Every sample in second N of the 8 kHz stereo input has the value 1000 * N
+    seconds = np.repeat(np.arange(6) * 1000, 8000 * 2)
+    wav_path = write_wav("stereo.wav", sample_rate=8000, channels=2, frames=seconds)
+
+    converted_path, cleanup_func = convert_to_wav(wav_path, start_ms=3000, end_ms=5000)
+
+    with wave.open(converted_path, "rb") as converted:
+        samples = np.frombuffer(converted.readframes(converted.getnframes()), dtype="<i2")
+    assert abs(len(samples) - 32000) <= 1
+    assert abs(int(samples[100]) - 3000) <= 2 and abs(int(samples[-100]) - 4000) <= 2
+    cleanup_func()
 
 def test_convert_to_wav_mp3_to_wav(create_dummy_audio_file, mocker, tmp_path):
     mp3_path = create_dummy_audio_file("test.mp3", "mp3")
-    mock_audio_segment = mocker.patch('pydub.AudioSegment.from_file')
-    mock_audio_segment.return_value.export = MagicMock(return_value=None)
+    commands = []
+    real_popen = subprocess.Popen
+
+    def fake_ffmpeg(command, **kwargs):
+        # Stands in for ffmpeg, writing a second of 16 kHz PCM
+        commands.append(command)
+        return real_popen([sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'\\1\\0' * 16000)"], **kwargs)
+
+    mocker.patch('subprocess.Popen', side_effect=fake_ffmpeg)
+    mock_from_file = mocker.patch('pydub.AudioSegment.from_file')
 
     converted_path, cleanup_func = convert_to_wav(mp3_path)
     assert isinstance(converted_path, str)
     assert converted_path.endswith(".wav")
     assert os.path.exists(converted_path)
     assert callable(cleanup_func)
-    mock_audio_segment.assert_called_once_with(mp3_path, format="mp3")
-    mock_audio_segment.return_value.export.assert_called_once_with(converted_path, format="wav")
+    # The whole file goes through the same streaming decoder as a time range
+    mock_from_file.assert_not_called()
+    assert commands[0][commands[0].index("-i") + 1] == mp3_path
+    assert "-ss" not in commands[0] and "-t" not in commands[0]
+    with wave.open(converted_path, "rb") as converted:
+        assert (converted.getframerate(), converted.getnchannels()) == (16000, 1)
+        assert abs(converted.getnframes() - 16000) <= 1
+    cleanup_func()
 
 def test_convert_to_wav_unsupported_format(create_dummy_audio_file):
     unsupported_path = create_dummy_audio_file("test.xyz", "xyz")
@@ -57,14 +118,141 @@ def test_convert_to_wav_file_not_found(mocker):
     with pytest.raises(FileNotFoundError, match="Input audio file not found"):
         convert_to_wav("non_existent.mp3")
 
-def test_convert_to_wav_pydub_error(mocker):
-    mocker.patch('pydub.AudioSegment.from_file', side_effect=Exception("Pydub internal error"))
+def test_convert_to_wav_missing_ffmpeg(create_dummy_audio_file, mocker):
+    mp3_path = create_dummy_audio_file("test.mp3", "mp3")
+    mocker.patch('subprocess.Popen', side_effect=FileNotFoundError("ffmpeg"))
     with pytest.raises(ValueError, match="Failed to convert audio file"):
-        convert_to_wav("test.mp3")
+        convert_to_wav(mp3_path)
 
 def test_convert_to_wav_empty_file(create_dummy_audio_file, mocker):
     empty_mp3_path = create_dummy_audio_file("empty.mp3", "mp3", content="")
-    mocker.patch('pydub.AudioSegment.from_file', side_effect=Exception("Invalid audio file"))
+    real_popen = subprocess.Popen
+    mocker.patch('subprocess.Popen', side_effect=lambda command, **kwargs: real_popen(
+        [sys.executable, "-c", "import sys; sys.stderr.write('Invalid data found'); sys.exit(1)"], **kwargs))
 
     with pytest.raises(ValueError, match="Failed to convert audio file"):
-        convert_to_wav(empty_mp3_path)
\ No newline at end of file
+        convert_to_wav(empty_mp3_path)
+def test_open_pcm_stream_starts_ffmpeg_pipe(create_dummy_audio_file, mocker):
+    m4a_path = create_dummy_audio_file("test.m4a", "m4a")
+    mock_popen = mocker.patch('subprocess.Popen')
+
+    reader = open_pcm_stream(m4a_path, chunk_duration=30)
+
+    command = mock_popen.call_args[0][0]
+    assert command[command.index("-i") + 1] == m4a_path
+    assert command[command.index("-f") + 1] == "s16le"
+    assert command[command.index("-ar") + 1] == "16000"
+    assert command[command.index("-ac") + 1] == "1"
+    assert command[-1] == "-"
+    assert reader.sample_rate == 16000
+    assert reader.chunk_duration_ms == 30000
+    assert reader.num_chunks is None
+
+def test_open_pcm_stream_seeks_to_first_chunk(create_dummy_audio_file, mocker):
+    m4a_path = create_dummy_audio_file("test.m4a", "m4a")
+    mock_popen = mocker.patch('subprocess.Popen')
+
+    reader = open_pcm_stream(m4a_path, chunk_duration=60, start_ms=1000, end_ms=30000000, first_index=350)
+
+    command = mock_popen.call_args[0][0]
+    # -ss before -i seeks in the input instead of decoding the skipped audio
+    assert command.index("-ss") < command.index("-i")
+    assert command[command.index("-ss") + 1] == "21001.000"
+    assert command[command.index("-t") + 1] == "8999.000"
+    assert reader.start_ms == 1000
+
+def test_open_pcm_stream_unsupported_format(create_dummy_audio_file):
+    unsupported_path = create_dummy_audio_file("test.xyz", "xyz")
+    with pytest.raises(ValueError, match="Unsupported audio format: 'xyz'"):
+        open_pcm_stream(unsupported_path)
+
+def test_open_pcm_stream_file_not_found():
+    with pytest.raises(FileNotFoundError, match="Input audio file not found"):
+        open_pcm_stream("non_existent.mp3")
+
+def test_open_pcm_stream_missing_ffmpeg(create_dummy_audio_file, mocker):
+    mp3_path = create_dummy_audio_file("test.mp3", "mp3")
+    mocker.patch('subprocess.Popen', side_effect=FileNotFoundError("ffmpeg"))
+    with pytest.raises(ValueError, match="Failed to start ffmpeg"):
+        open_pcm_stream(mp3_path)
+
+def test_convert_to_wav_decodes_only_time_range(create_dummy_audio_file, mocker, tmp_path):
+    m4a_path = create_dummy_audio_file("test.m4a", "m4a")
+    commands = []
+    real_popen = subprocess.Popen
+
+    def fake_ffmpeg(command, **kwargs):
+        # Stands in for ffmpeg, writing half a second of 16 kHz PCM
+        commands.append(command)
+        return real_popen([sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'\\1\\0' * 8000)"], **kwargs)
+
+    mocker.patch('subprocess.Popen', side_effect=fake_ffmpeg)
+    mock_from_file = mocker.patch('pydub.AudioSegment.from_file')
+
+    wav_path, cleanup = convert_to_wav(m4a_path, start_ms=5000, end_ms=5500)
+
+    mock_from_file.assert_not_called()
+    assert commands[0][commands[0].index("-ss") + 1] == "5.000"
+    assert commands[0][commands[0].index("-t") + 1] == "0.500"
+    assert commands[0].index("-ss") < commands[0].index("-i")
+    with wave.open(wav_path, "rb") as wav_file:
+        assert (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getnframes()) == (16000, 1, 8000)
+    cleanup()
+    assert not os.path.exists(wav_path)
+
+def test_convert_to_wav_range_decoder_failure(create_dummy_audio_file, mocker):
+    m4a_path = create_dummy_audio_file("test.m4a", "m4a")
+    real_popen = subprocess.Popen
+    mocker.patch('subprocess.Popen', side_effect=lambda command, **kwargs: real_popen(
+        [sys.executable, "-c", "import sys; sys.stderr.write('moov atom not found'); sys.exit(1)"], **kwargs))
+    with pytest.raises(ValueError, match="moov atom not found"):
+        convert_to_wav(m4a_path, start_ms=5000)
+
+def test_convert_to_wav_range_drains_decoder_warnings(create_dummy_audio_file, mocker):
+    m4a_path = create_dummy_audio_file("test.m4a", "m4a")
+    script = ("import sys\n"
+              "for i in range(20000): sys.stderr.write(f'frame {i} warning\\n')\n"
+              "sys.stderr.flush(); sys.stdout.buffer.write(b'\\0' * 32000)")
+    real_popen = subprocess.Popen
+    mocker.patch('subprocess.Popen', side_effect=lambda command, **kwargs: real_popen([sys.executable, "-c", script], **kwargs))
+
+    wav_path, cleanup = convert_to_wav(m4a_path, start_ms=5000)
+
+    with wave.open(wav_path, "rb") as wav_file:
+        assert wav_file.getnframes() == 16000
+    cleanup()
+
+def test_open_live_stream_reads_raw_pcm_from_stdin(mocker):
+    pcm = (1).to_bytes(2, 'little') * 8000 * 3
+    mocker.patch('sys.stdin', MagicMock(buffer=io.BytesIO(pcm)))
+    mock_popen = mocker.patch('subprocess.Popen')
+
+    reader = open_live_stream("-", chunk_duration=2, input_format="s16le", sample_rate=8000, channels=2)
+
+    mock_popen.assert_not_called()
+    assert (reader.sample_rate, reader.channels) == (8000, 2)
+    assert [(i, start, end) for i, start, end, _ in reader.iter_chunks()] == [(0, 0, 1500)]
+
+def test_open_live_stream_decodes_stdin_with_ffmpeg(mocker):
+    mock_popen = mocker.patch('subprocess.Popen')
+
+    reader = open_live_stream("-", chunk_duration=5, input_format="mp3")
+
+    command = mock_popen.call_args[0][0]
+    assert command[command.index("-i") + 1] == "pipe:0"
+    # The input format comes before -i; the output is engine-format PCM
+    assert command[command.index("-f") + 1] == "mp3"
+    assert command[command.index("-i") + 2:command.index("-i") + 4] == ["-f", "s16le"]
+    assert "nobuffer" in command
+    assert "stdin" not in mock_popen.call_args[1]
+    assert (reader.sample_rate, reader.channels, reader.chunk_duration_ms) == (16000, 1, 5000)
+
+def test_open_live_stream_reads_named_pipe(tmp_path, mocker):
+    fifo_path = str(tmp_path / "live.fifo")
+    mock_popen = mocker.patch('subprocess.Popen')
+
+    open_live_stream(fifo_path)
+
+    command = mock_popen.call_args[0][0]
+    assert command[command.index("-i") + 1] == fifo_path
+    assert command.count("-f") == 1
@@ -0,0 +1,106 @@
+import pytest
+import json
+import os
+import threading
+from unittest.mock import patch
+from batch import collect_inputs, read_manifest, run_batch
+from transcriber import EngineOptions
+
+@pytest.fixture
+def create_wav_file(write_wav):
+    def _create_wav_file(filename, duration_ms=2000, sample_rate=8000):
+        return write_wav(filename, seconds=duration_ms / 1000, sample_rate=sample_rate)
+    return _create_wav_file
+
+def test_collect_inputs_expands_directories_globs_and_manifest(create_wav_file, tmp_path):
+    a = create_wav_file("calls/a.wav")
+    b = create_wav_file("calls/b.wav")
+    (tmp_path / "calls" / "notes.txt").write_text("not audio")
+    c = create_wav_file("more/c.wav")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"# nightly batch\n\n{c}\n{a}\n")
+
+    inputs = collect_inputs([str(tmp_path / "calls"), str(tmp_path / "more" / "*.wav")], str(manifest))
+
+    assert inputs == [a, b, c]
+
+def test_collect_inputs_keeps_missing_paths(tmp_path):
+    missing = str(tmp_path / "missing.wav")
+    assert collect_inputs([missing]) == [missing]
+
+def test_read_manifest_skips_comments_and_blank_lines(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("one.wav\n  # comment\n\n  two.mp3  \n")
+    assert read_manifest(str(manifest)) == ["one.wav", "two.mp3"]
+
+@patch('google_engine.recognize', return_value="hello")
+def test_run_batch_isolates_failures_and_writes_summary(mock_recognize, create_wav_file, tmp_path):
+    good = create_wav_file("good.wav")
+    bad = tmp_path / "bad.wav"
+    bad.write_bytes(b"not a wav file")
+    also_good = create_wav_file("sub/good.wav")
+    output_dir = tmp_path / "out"
+
+    results = run_batch([good, str(bad), also_good], str(output_dir), chunk_duration=1, language="en-US")
+
+    assert [result["status"] for result in results] == ["ok", "failed", "ok"]
+    assert "Error loading WAV file" in results[1]["error"]
+    assert (output_dir / "good.txt").read_text() == "hello hello"
+    assert (output_dir / "good_1.txt").read_text() == "hello hello"
+    with open(output_dir / "batch_summary.json") as f:
+        summary = json.load(f)
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (3, 2, 1)
+    assert summary["files"][0]["audio_seconds"] == 2.0
+
+@patch('batch.transcribe_audio_in_chunks', return_value=[])
+@patch('batch.create_executor')
+def test_run_batch_shares_one_worker_pool(mock_create_executor, mock_transcribe, create_wav_file, tmp_path):
+    executor = mock_create_executor.return_value[0]
+    mock_create_executor.return_value = (executor, 4)
+    inputs = [create_wav_file(f"{name}.wav") for name in ("a", "b", "c")]
+
+    engine_options = EngineOptions(workers=2, model_size="base", compute_type="int8")
+    run_batch(inputs, str(tmp_path / "out"), engine="faster-whisper", engine_options=engine_options)
+
+    mock_create_executor.assert_called_once_with("faster-whisper", 1, 2, 0, {"model_size": "base", "compute_type": "int8", "cpu_threads": 0})
+    assert all(call.kwargs["engine_options"] is engine_options for call in mock_transcribe.call_args_list)
+    assert [call.kwargs["pool"] for call in mock_transcribe.call_args_list] == [(executor, 4)] * 3
+    executor.shutdown.assert_called_once()
+
+@patch('batch.transcribe_audio_in_chunks')
+@patch('batch.convert_to_wav')
+def test_run_batch_decodes_next_file_while_transcribing(mock_convert_to_wav, mock_transcribe, tmp_path):
+    second_decoded = threading.Event()
+    cleaned_up = []
+
+    def convert(path, temp_dir=None):
+        if path == "second.mp3":
+            second_decoded.set()
+        return f"{path}.wav", lambda: cleaned_up.append(path)
+    mock_convert_to_wav.side_effect = convert
+
+    def transcribe(wav_path, **kwargs):
+        if wav_path == "first.mp3.wav":
+            # The second file is converted in the background before the first finishes
+            assert second_decoded.wait(timeout=5)
+        return [{"text": wav_path, "start_time": 0.0, "end_time": 1.0}]
+    mock_transcribe.side_effect = transcribe
+
+    results = run_batch(["first.mp3", "second.mp3"], str(tmp_path / "out"))
+
+    assert [result["status"] for result in results] == ["ok", "ok"]
+    assert cleaned_up == ["first.mp3", "second.mp3"]
+
+@patch('google_engine.recognize', return_value="hello")
+def test_run_batch_writes_every_output_format(mock_recognize, create_wav_file, tmp_path):
+    inputs = [create_wav_file("a/talk.wav"), create_wav_file("b/talk.wav")]
+    output_dir = tmp_path / "out"
+
+    results = run_batch(inputs, str(output_dir), chunk_duration=1, language="en-US", output_format=["txt", "jsonl"])
+
+    assert results[1]["outputs"] == {"txt": str(output_dir / "talk_1.txt"), "jsonl": str(output_dir / "talk_1.jsonl")}
+    assert (output_dir / "talk.txt").read_text() == "hello hello"
+    records = [json.loads(line) for line in (output_dir / "talk_1.jsonl").read_text().splitlines()]
+    assert [(record["start"], record["end"], record["text"]) for record in records] == [(0.0, 1.0, "hello"), (1.0, 2.0, "hello")]
+    # Each file was transcribed once for all formats
+    assert mock_recognize.call_count == 4
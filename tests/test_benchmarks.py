@@ -0,0 +1,83 @@
+import json
+import wave
+import pytest
+import speech_recognition as sr
+from benchmarks.fake_engine import FakeEngine
+from benchmarks.run_benchmarks import compare, main as run_benchmarks
+from benchmarks.synthetic_audio import make_wav
+from transcriber import EngineOptions, transcribe_audio_in_chunks
+
+def test_make_wav_writes_requested_length(tmp_path):
+    path = make_wav(str(tmp_path / "synthetic.wav"), 12.5, sample_rate=8000, channels=2)
+    with wave.open(path, "rb") as wav_file:
+        assert wav_file.getnchannels() == 2
+        assert wav_file.getnframes() == 100000
+
+def test_fake_engine_is_deterministic_with_error_injection(tmp_path):
+    wav_path = make_wav(str(tmp_path / "synthetic.wav"), 20, sample_rate=8000, channels=1)
+
+    def run():
+        fake = FakeEngine(error_rate=0.5, seed=3)
+        with fake.install("google"):
+            chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                                engine_options=EngineOptions(concurrency=4))
+        return chunks, fake
+
+    first, fake = run()
+    second, _ = run()
+    assert [chunk["text"] for chunk in first] == [chunk["text"] for chunk in second]
+    assert fake.calls == 20
+    assert 0 < fake.errors < 20
+    assert sum(1 for chunk in first if chunk["status"] == "failed") == fake.errors
+
+def test_fake_engine_latency_is_counted():
+    fake = FakeEngine(latency=0.05, unrecognized_rate=1.0)
+    with pytest.raises(sr.UnknownValueError):
+        fake.recognize(b"\x00\x00" * 8000, 8000)
+    assert fake.engine_seconds == pytest.approx(0.05)
+
+def test_run_benchmarks_writes_comparable_json(tmp_path):
+    output = str(tmp_path / "results.json")
+    results = run_benchmarks(["--durations", "3", "--formats", "wav", "--chunk", "1", "--output", output])
+
+    with open(output) as f:
+        saved = json.load(f)
+    assert saved == json.loads(json.dumps(results))
+    stages = saved["cases"][0]["stages"]
+    assert stages["transcribe_audio_in_chunks"]["chunks"] == 3
+    assert stages["transcribe_audio_in_chunks"]["audio_seconds_per_wall_second"] > 0
+    assert stages["transcribe_audio_in_chunks"]["peak_rss_mb"] > 0
+    assert set(stages["format_transcription"]) == {"txt", "srt", "vtt"}
+    assert len(compare(saved, saved)) == 5
+
+def test_google_requests_benchmark_measures_each_path(tmp_path):
+    from benchmarks.google_requests import main as run_google_benchmark
+    output = str(tmp_path / "google.json")
+    results = run_google_benchmark(["--durations", "1", "--requests", "5", "--output", output])
+
+    with open(output) as f:
+        assert json.load(f) == json.loads(json.dumps(results))
+    paths = results["cases"][0]["paths"]
+    # Only the pooled paths keep their connection between requests
+    assert paths["recognize_google"]["connections"] == 5
+    assert paths["flac_keep_alive"]["connections"] == 0
+    assert paths["keep_alive"]["connections"] == 0
+    for stats in paths.values():
+        assert stats["median_ms"] > 0
+    # One second of 16 kHz audio compresses below its 32000 bytes of PCM, which audio/l16 posts as they are
+    assert 0 < paths["recognize_google"]["request_bytes"] == paths["flac_keep_alive"]["request_bytes"] < 32000
+    assert paths["keep_alive"]["request_bytes"] == 32000
+    encodings = results["cases"][0]["encodings"]
+    assert encodings["l16"]["bytes"] == 32000
+    assert encodings["flac"]["bytes"] == paths["recognize_google"]["request_bytes"]
+    # Running the flac tool costs more than handing over the samples
+    assert encodings["l16"]["median_ms"] < encodings["flac"]["median_ms"]
+
+def test_google_requests_benchmark_fails_when_slower_than_baseline():
+    from benchmarks.google_requests import find_regressions
+    results = {"cases": [{"chunk_seconds": 5, "paths": {"recognize_google": {"median_ms": 11.5},
+                                                        "keep_alive": {"median_ms": 19.4}}},
+                         {"chunk_seconds": 60, "paths": {"recognize_google": {"median_ms": 71.9},
+                                                         "keep_alive": {"median_ms": 75.0}}}]}
+    assert find_regressions(results) == ["5s chunk: keep_alive 19.4 ms is slower than recognize_google 11.5 ms"]
+    assert len(find_regressions(results, max_slowdown=0.0)) == 2
@@ -0,0 +1,160 @@
+import pytest
+import io
+import struct
+import subprocess
+import sys
+import time
+from chunk_reader import WavChunkReader, PcmStreamChunkReader
+
+@pytest.fixture
+def create_counting_wav_file(write_wav):
+    def _create_counting_wav_file(filename, seconds, sample_rate=1000):
+        # Every sample in second N has the value N, so chunks can be identified by content
+        frames = b"".join(second.to_bytes(2, 'little') * sample_rate for second in range(seconds))
+        return write_wav(filename, sample_rate=sample_rate, frames=frames)
+    return _create_counting_wav_file
+
+def test_wav_chunk_reader_header_info(create_counting_wav_file):
+    wav_path = create_counting_wav_file("count.wav", seconds=5)
+    with WavChunkReader(wav_path, chunk_duration=2) as reader:
+        assert reader.sample_rate == 1000
+        assert reader.sample_width == 2
+        assert reader.channels == 1
+        assert reader.total_duration_ms == 5000
+        assert reader.num_chunks == 3
+        assert reader.chunk_bounds(2) == (4000, 5000)
+
+def test_wav_chunk_reader_read_chunk_seeks_to_offset(create_counting_wav_file):
+    wav_path = create_counting_wav_file("count.wav", seconds=5)
+    with WavChunkReader(wav_path, chunk_duration=1) as reader:
+        pcm = reader.read_chunk(3)
+    assert len(pcm) == 2000
+    assert pcm == (3).to_bytes(2, 'little') * 1000
+
+def test_wav_chunk_reader_iter_chunks_from_start_index(create_counting_wav_file):
+    wav_path = create_counting_wav_file("count.wav", seconds=5)
+    with WavChunkReader(wav_path, chunk_duration=2) as reader:
+        chunks = list(reader.iter_chunks(start_index=1))
+    assert [(i, start, end) for i, start, end, _ in chunks] == [(1, 2000, 4000), (2, 4000, 5000)]
+    assert chunks[0][3][:2] == (2).to_bytes(2, 'little')
+    assert len(chunks[1][3]) == 2000
+
+def test_wav_chunk_reader_file_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError, match="WAV file not found"):
+        WavChunkReader(str(tmp_path / "missing.wav"))
+
+def test_wav_chunk_reader_invalid_file(tmp_path):
+    invalid_wav = tmp_path / "invalid.wav"
+    invalid_wav.write_bytes(b"not a wav file")
+    with pytest.raises(ValueError, match="Error loading WAV file"):
+        WavChunkReader(str(invalid_wav))
+
+def _write_extensible_wav(path, frames, sample_rate, channels=1, sub_format=1):
+    # WAVE_FORMAT_EXTENSIBLE header with a LIST chunk before the data, as DAWs write them
+    fmt = struct.pack("<HHIIHHHHI", 0xFFFE, channels, sample_rate, sample_rate * 2 * channels, 2 * channels, 16,
+                      22, 16, 0x4) + struct.pack("<H", sub_format) + bytes.fromhex("000000001000800000aa00389b71")
+    extra = b"LIST" + struct.pack("<I", 5) + b"INFO\x00\x00"
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra + b"data" + struct.pack("<I", len(frames)) + frames
+    path.write_bytes(b"RIFF" + struct.pack("<I", len(body)) + body)
+    return str(path)
+
+def test_wav_chunk_reader_reads_extensible_pcm(tmp_path):
+    frames = b"".join(second.to_bytes(2, 'little') * 1000 for second in range(3))
+    wav_path = _write_extensible_wav(tmp_path / "extensible.wav", frames, 1000)
+    with WavChunkReader(wav_path, chunk_duration=1) as reader:
+        assert (reader.sample_rate, reader.sample_width, reader.channels) == (1000, 2, 1)
+        assert reader.total_duration_ms == 3000
+        assert reader.read_chunk(2) == (2).to_bytes(2, 'little') * 1000
+
+def test_wav_chunk_reader_rejects_extensible_non_pcm(tmp_path):
+    wav_path = _write_extensible_wav(tmp_path / "float.wav", b"\x00" * 400, 1000, sub_format=3)
+    with pytest.raises(ValueError, match="unknown format: 3"):
+        WavChunkReader(wav_path)
+
+def test_pcm_stream_chunk_reader_yields_chunks_as_they_arrive():
+    pcm = b"".join(second.to_bytes(2, 'little') * 1000 for second in range(3))
+    reader = PcmStreamChunkReader(io.BytesIO(pcm + b"\x00\x00" * 500), sample_rate=1000, chunk_duration=1)
+    chunks = list(reader.iter_chunks())
+    assert reader.num_chunks is None
+    assert [(i, start, end) for i, start, end, _ in chunks] == [(0, 0, 1000), (1, 1000, 2000), (2, 2000, 3000), (3, 3000, 3500)]
+    assert chunks[1][3] == (1).to_bytes(2, 'little') * 1000
+
+def test_pcm_stream_chunk_reader_skips_to_start_index():
+    pcm = b"".join(second.to_bytes(2, 'little') * 1000 for second in range(3))
+    reader = PcmStreamChunkReader(io.BytesIO(pcm), sample_rate=1000, chunk_duration=1)
+    chunks = list(reader.iter_chunks(start_index=2))
+    assert len(chunks) == 1
+    assert chunks[0][:3] == (2, 2000, 3000)
+    assert chunks[0][3][:2] == (2).to_bytes(2, 'little')
+
+def test_pcm_stream_chunk_reader_reports_decoder_failure():
+    process = subprocess.Popen(
+        [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'\\0' * 4000); sys.stderr.write('bad input'); sys.exit(3)"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with PcmStreamChunkReader(process.stdout, sample_rate=1000, chunk_duration=1, process=process) as reader:
+        chunks = reader.iter_chunks()
+        assert next(chunks)[0] == 0
+        assert next(chunks)[0] == 1
+        with pytest.raises(ValueError, match="exited with status 3: bad input"):
+            next(chunks)
+
+def test_pcm_stream_chunk_reader_drains_chatty_decoder():
+    # Far more stderr than a pipe buffer holds, written before any audio
+    script = ("import sys\n"
+              "for i in range(20000): sys.stderr.write(f'frame {i} warning\\n')\n"
+              "sys.stderr.flush(); sys.stdout.buffer.write(b'\\0' * 2000); sys.exit(1)")
+    process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with PcmStreamChunkReader(process.stdout, sample_rate=1000, chunk_duration=1, process=process) as reader:
+        chunks = reader.iter_chunks()
+        assert next(chunks)[0] == 0
+        with pytest.raises(ValueError) as error:
+            next(chunks)
+    message = str(error.value)
+    assert message.endswith("frame 19999 warning")
+    assert "frame 0 warning" not in message
+
+def test_wav_chunk_reader_limits_chunks_to_time_range(create_counting_wav_file):
+    wav_path = create_counting_wav_file("count.wav", seconds=10)
+    with WavChunkReader(wav_path, chunk_duration=2, start_ms=3000, end_ms=8500) as reader:
+        assert reader.num_chunks == 3
+        assert [reader.chunk_bounds(i) for i in range(3)] == [(3000, 5000), (5000, 7000), (7000, 8500)]
+        assert reader.read_chunk(2) == (7).to_bytes(2, 'little') * 1000 + (8).to_bytes(2, 'little') * 500
+
+def test_wav_chunk_reader_maps_times_of_partly_decoded_file(create_counting_wav_file):
+    # A WAV decoded from 6s into the recording holds seconds 6-9 as its first frames
+    wav_path = create_counting_wav_file("count.wav", seconds=4)
+    with WavChunkReader(wav_path, chunk_duration=2, start_ms=2000, offset_ms=6000) as reader:
+        assert reader.total_duration_ms == 10000
+        assert reader.num_chunks == 4
+        assert [(i, start, end) for i, start, end, _ in reader.iter_chunks(start_index=2)] == [(2, 6000, 8000), (3, 8000, 10000)]
+        assert reader.read_window(7000, 8000) == (1).to_bytes(2, 'little') * 1000
+
+def test_pcm_stream_chunk_reader_numbers_chunks_from_first_index():
+    pcm = b"".join(second.to_bytes(2, 'little') * 1000 for second in range(2))
+    reader = PcmStreamChunkReader(io.BytesIO(pcm), sample_rate=1000, chunk_duration=1, start_ms=500, first_index=3)
+    assert [(i, start, end) for i, start, end, _ in reader.iter_chunks(start_index=3)] == [(3, 3500, 4500), (4, 4500, 5500)]
+
+def test_pcm_stream_chunk_reader_read_frames():
+    reader = PcmStreamChunkReader(io.BytesIO(b"\x01\x00" * 5 + b"\x02"), sample_rate=1000)
+    assert reader.read_frames(3) == b"\x01\x00" * 3
+    # The odd trailing byte is not a whole frame
+    assert reader.read_frames(3) == b"\x01\x00" * 2
+    assert reader.read_frames(3) == b""
+
+def test_pcm_stream_chunk_reader_measures_wait_for_stream():
+    class SlowStream(io.BytesIO):
+        def read(self, size=-1):
+            time.sleep(0.05)
+            return super().read(size)
+
+    reader = PcmStreamChunkReader(SlowStream(b"\x00\x00" * 2000), sample_rate=1000, chunk_duration=1)
+    assert len(list(reader.iter_chunks())) == 2
+    # Two chunks and the read that finds the end of the stream
+    assert reader.wait_seconds >= 0.15
+
+def test_pcm_stream_chunk_reader_peek_frames_keeps_audio_for_chunks():
+    pcm = b"".join(second.to_bytes(2, 'little') * 1000 for second in range(3))
+    reader = PcmStreamChunkReader(io.BytesIO(pcm), sample_rate=1000, chunk_duration=2)
+    assert reader.peek_frames(1500) == pcm[:3000]
+    assert reader.peek_frames(500) == pcm[:1000]
+    assert [chunk[3] for chunk in reader.iter_chunks()] == [pcm[:4000], pcm[4000:]]
@@ -0,0 +1,134 @@
+import pytest
+import os
+import shutil
+import wave
+from unittest.mock import patch
+import audio_converter
+from conversion_cache import ConversionCache
+
+def _store(cache, write_wav, name, start_ms=0, end_ms=None, seconds=1, input_hash="abc"):
+    return cache.store(write_wav(name, seconds), input_hash, 16000, start_ms, end_ms)
+
+def test_lookup_finds_entry_covering_the_range(write_wav, tmp_path):
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        assert cache.lookup("abc", 16000) is None
+        path = _store(cache, write_wav, "from_60s.wav", start_ms=60000)
+
+        assert os.path.dirname(path) == str(tmp_path / "cache")
+        assert not os.path.exists(tmp_path / "from_60s.wav")
+        # A resume further along reads the same file, which begins 60s into the recording
+        assert cache.lookup("abc", 16000, 120000) == (path, 60000)
+        assert cache.lookup("abc", 16000, 60000, 90000) == (path, 60000)
+        assert cache.lookup("abc", 16000, 0) is None
+        assert cache.lookup("abc", 8000, 120000) is None
+        assert cache.lookup("def", 16000, 120000) is None
+        assert (cache.hits, cache.misses) == (2, 4)
+
+def test_lookup_bounded_entry_does_not_cover_open_end(write_wav, tmp_path):
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        path = _store(cache, write_wav, "part.wav", start_ms=0, end_ms=60000)
+        assert cache.lookup("abc", 16000, 0, 60000) == (path, 0)
+        assert cache.lookup("abc", 16000, 0, 90000) is None
+        assert cache.lookup("abc", 16000, 30000) is None
+
+def test_store_drops_entries_the_new_one_covers(write_wav, tmp_path):
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        later = _store(cache, write_wav, "later.wav", start_ms=60000)
+        whole = _store(cache, write_wav, "whole.wav", start_ms=0)
+        assert not os.path.exists(later)
+        assert cache.lookup("abc", 16000, 60000) == (whole, 0)
+        assert cache.size_bytes == os.path.getsize(whole)
+
+def test_cache_evicts_least_recently_used(write_wav, tmp_path):
+    entry_size = os.path.getsize(write_wav("probe.wav", 1))
+    with ConversionCache(str(tmp_path / "cache"), max_size_bytes=entry_size * 3) as cache:
+        paths = [_store(cache, write_wav, f"{i}.wav", input_hash=f"input{i}") for i in range(3)]
+        # Touch input0 so input1 becomes the least recently used entry
+        assert cache.lookup("input0", 16000) is not None
+        _store(cache, write_wav, "3.wav", input_hash="input3")
+
+        assert cache.lookup("input1", 16000) is None
+        assert not os.path.exists(paths[1])
+        assert cache.lookup("input0", 16000) is not None
+        assert cache.lookup("input3", 16000) is not None
+        assert cache.size_bytes <= entry_size * 3
+
+def test_eviction_skips_entries_in_use(write_wav, tmp_path):
+    entry_size = os.path.getsize(write_wav("probe.wav", 1))
+    # Inputs of slightly different lengths, so each gets its own entry
+    inputs = [write_wav(f"talk{i}.wav", 1 + i / 1000, sample_rate=8000) for i in range(4)]
+    with ConversionCache(str(tmp_path / "cache"), max_size_bytes=entry_size * 2.5) as cache:
+        # The current file is being transcribed while the next ones are prefetched
+        current, _, release = cache.convert(inputs[0])
+        for input_path in inputs[1:3]:
+            cache.convert(input_path)[2]()
+        assert os.path.exists(current)
+
+        release()
+        cache.convert(inputs[3])
+        assert not os.path.exists(current)
+
+def test_store_skips_file_larger_than_cache(write_wav, tmp_path):
+    with ConversionCache(str(tmp_path / "cache"), max_size_bytes=1000) as cache:
+        assert _store(cache, write_wav, "big.wav") is None
+        assert os.path.exists(tmp_path / "big.wav")
+        assert cache.size_bytes == 0
+
+def test_cache_persists_between_instances_and_forgets_deleted_files(write_wav, tmp_path):
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        path = _store(cache, write_wav, "a.wav")
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        assert cache.lookup("abc", 16000) == (path, 0)
+        os.remove(path)
+        assert cache.lookup("abc", 16000) is None
+        assert cache.size_bytes == 0
+
+def test_convert_reuses_conversion_of_identical_input(write_wav, tmp_path):
+    first = write_wav("talk.wav", 2, sample_rate=44100, channels=2)
+    duplicate = str(tmp_path / "copy of talk.wav")
+    shutil.copy(first, duplicate)
+
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        with patch("conversion_cache.convert_to_wav", wraps=audio_converter.convert_to_wav) as mock_convert:
+            wav_path, offset_ms, cleanup = cache.convert(first)
+            cleanup()
+            assert cache.convert(duplicate)[:2] == (wav_path, 0)
+        mock_convert.assert_called_once()
+
+    assert os.path.exists(wav_path)
+    with wave.open(wav_path, "rb") as wav_file:
+        assert (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getnframes()) == (16000, 1, 32000)
+
+def test_convert_uses_engine_format_wav_in_place(write_wav, tmp_path):
+    wav_path = write_wav("talk.wav", 1)
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        with patch("conversion_cache.hash_file") as mock_hash_file:
+            assert cache.convert(wav_path)[:2] == (wav_path, 0)
+        mock_hash_file.assert_not_called()
+        assert cache.size_bytes == 0
+
+def test_convert_resamples_only_the_range_of_wav(write_wav, tmp_path):
+    wav_path = write_wav("talk.wav", 4, sample_rate=8000)
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        converted_path, offset_ms, _ = cache.convert(wav_path, start_ms=3000)
+        # Another shard further along reads the same entry
+        assert cache.convert(wav_path, start_ms=3500)[:2] == (converted_path, 3000)
+
+    assert offset_ms == 3000
+    with wave.open(converted_path, "rb") as wav_file:
+        assert abs(wav_file.getnframes() - 16000) <= 1
+
+def test_convert_decodes_compressed_range_once(write_wav, tmp_path):
+    mp3_path = tmp_path / "talk.mp3"
+    mp3_path.write_bytes(b"compressed audio")
+
+    def fake_convert(input_path, sample_rate, start_ms=0, end_ms=None, temp_dir=None):
+        return write_wav(os.path.join(temp_dir, "decoded.wav"), 1), lambda: None
+
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        with patch("conversion_cache.convert_to_wav", side_effect=fake_convert) as mock_convert:
+            wav_path, offset_ms, _ = cache.convert(str(mp3_path), start_ms=120000)
+            # Resuming later reads the cached range instead of decoding again
+            assert cache.convert(str(mp3_path), start_ms=180000)[:2] == (wav_path, 120000)
+        mock_convert.assert_called_once_with(str(mp3_path), 16000, start_ms=120000, end_ms=None, temp_dir=str(tmp_path / "cache"))
+        assert offset_ms == 120000
@@ -0,0 +1,123 @@
+import pytest
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import speech_recognition as sr
+from engines import EngineRejectedError, EngineRequestError
+from google_engine import ConnectionPool, RequestRejected, recognize, transcribe
+
+RESPONSE = json.dumps({"result": [{"alternative": [{"transcript": "kept alive"}], "final": True}], "result_index": 0}).encode()
+
+@pytest.fixture
+def keep_alive_server():
+    """HTTP/1.1 stand-in for the Google endpoint that records the client port and body of every request."""
+    class Server:
+        ports = []
+        requests = []
+        status = 200
+        latency = 0.0
+        # Drop the connection after answering without announcing it, as servers do with idle connections
+        drop_after_response = False
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            Server.ports.append(self.client_address[1])
+            Server.requests.append((self.headers["Content-Type"], body))
+            time.sleep(Server.latency)
+            self.send_response(Server.status)
+            self.send_header("Content-Length", str(len(RESPONSE)))
+            self.end_headers()
+            self.wfile.write(RESPONSE)
+            self.close_connection = Server.drop_after_response
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    # A client that timed out is gone by the time the handler answers
+    httpd.handle_error = lambda request, client_address: None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    Server.url = f"http://127.0.0.1:{httpd.server_address[1]}/speech-api/v2/recognize"
+    yield Server
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_connection_pool_reuses_connections(keep_alive_server):
+    with ConnectionPool(pool_size=1) as session:
+        texts = [recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url, session=session) for _ in range(4)]
+    assert texts == ["kept alive"] * 4
+    assert session.connections_opened == 1
+    assert len(set(keep_alive_server.ports)) == 1
+
+def test_connection_pool_of_zero_opens_a_connection_per_request(keep_alive_server):
+    with ConnectionPool(pool_size=0) as session:
+        for _ in range(3):
+            recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url, session=session)
+    assert session.connections_opened == 3
+    assert len(set(keep_alive_server.ports)) == 3
+
+def test_connection_pool_replaces_connection_closed_by_server(keep_alive_server):
+    keep_alive_server.drop_after_response = True
+    with ConnectionPool(pool_size=1) as session:
+        for _ in range(3):
+            assert recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url, session=session) == "kept alive"
+    assert len(keep_alive_server.ports) == 3
+
+def test_connection_pool_keeps_concurrent_requests_apart(keep_alive_server):
+    keep_alive_server.latency = 0.1
+    with ConnectionPool(pool_size=3) as session:
+        threads = [threading.Thread(target=recognize, args=(b"pcm", 16000, "en-US"),
+                                    kwargs={"endpoint": keep_alive_server.url, "session": session}) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert session.connections_opened == 3
+        # The three connections stay open for the next requests
+        recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url, session=session)
+        assert session.connections_opened == 3
+
+def test_recognize_session_reports_http_errors(keep_alive_server):
+    keep_alive_server.status = 429
+    with ConnectionPool() as session, pytest.raises(sr.RequestError, match="recognition request failed: Too Many Requests"):
+        recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url, session=session)
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_transcribe_reports_transient_http_errors_as_retryable(keep_alive_server, status):
+    keep_alive_server.status = status
+    with ConnectionPool() as session, pytest.raises(EngineRequestError):
+        transcribe(b"\x00\x00" * 1600, (16000, 2, 1), "en-US", endpoint=keep_alive_server.url, session=session)
+
+@pytest.mark.parametrize("status", [400, 403, 404])
+def test_transcribe_reports_client_errors_as_rejected(keep_alive_server, status):
+    keep_alive_server.status = status
+    with ConnectionPool() as session, pytest.raises(EngineRejectedError, match=f"HTTP {status}"):
+        transcribe(b"\x00\x00" * 1600, (16000, 2, 1), "en-US", endpoint=keep_alive_server.url, session=session)
+
+def test_recognize_without_session_rejects_client_errors(keep_alive_server):
+    keep_alive_server.status = 403
+    with pytest.raises(RequestRejected, match="HTTP 403"):
+        recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url)
+
+def test_recognize_session_read_timeout(keep_alive_server):
+    keep_alive_server.latency = 0.5
+    with ConnectionPool(read_timeout=0.1) as session, pytest.raises(sr.RequestError, match="recognition connection failed"):
+        recognize(b"pcm", 16000, "en-US", endpoint=keep_alive_server.url, session=session)
+
+def test_transcribe_audio_in_chunks_shares_google_connections(keep_alive_server, write_wav):
+    from transcriber import EngineOptions, transcribe_audio_in_chunks
+    wav_path = write_wav("test.wav", frames=b"\x01\x00" * 16000 * 4)
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                        engine_options=EngineOptions(google_endpoint=keep_alive_server.url))
+
+    assert [chunk["text"] for chunk in chunks] == ["kept alive"] * 4
+    assert len(set(keep_alive_server.ports)) == 1
+    # Every chunk is posted as its raw PCM, with no encoder in between
+    assert keep_alive_server.requests == [("audio/l16; rate=16000", b"\x01\x00" * 16000)] * 4
@@ -1,4 +1,5 @@
 import pytest
+import io
 import os
 import sys
 import json
@@ -6,18 +7,55 @@ from unittest.mock import patch, mock_open, MagicMock
 import main
 import logging
 from cli import parse_arguments
+from progress_journal import ProgressJournal, ResumeMismatchError, make_header
+from transcriber import SegmentationOptions
+from metrics import Metrics
 
 @pytest.fixture
-def mock_args():
+def mock_args(tmp_path):
     class MockArgs:
-        input_audio = "dummy_input.mp3"
-        output_text = "dummy_output.txt"
+        input_audio = str(tmp_path / "dummy_input.mp3")
+        output_text = str(tmp_path / "dummy_output.txt")
         chunk = 60
         language = "en-US"
         output_format = "txt"
         resume = None
         engine = "google"
         temp_dir = None
+        pipe_decode = False
+        concurrency = 1
+        rate_limit = None
+        workers = 1
+        cpu_threads = 0
+        segmentation = "fixed"
+        min_chunk = 5
+        silence_threshold = -40.0
+        min_silence = 0.5
+        cache = None
+        cache_size = 512
+        fsync_every = 10
+        model_size = None
+        compute_type = None
+        device = None
+        tuning_profile = None
+        metrics = None
+        word_timestamps = False
+        retries = 0
+        retry_delay = 1.0
+        retry_max_delay = 30.0
+        retry_failed = False
+        start_time = None
+        end_time = None
+        shard = None
+        conversion_cache_size = 2048
+        input_format = None
+        input_rate = 16000
+        input_channels = 1
+        language_detection_seconds = 30
+        google_endpoint = None
+        google_pool_size = None
+        google_connect_timeout = None
+        google_read_timeout = None
     return MockArgs()
 
 @pytest.fixture
@@ -64,6 +102,9 @@ def test_main_successful_transcription(mock_getsize, mock_exists, mock_convert_t
     mock_transcribe_audio_in_chunks.assert_called_once()
     assert mock_transcribe_audio_in_chunks.call_args[1]["chunk_duration"] == mock_args.chunk
     assert mock_transcribe_audio_in_chunks.call_args[1]["language"] == mock_args.language
+    kwargs = mock_transcribe_audio_in_chunks.call_args[1]
+    assert (kwargs["engine_options"].concurrency, kwargs["segmentation"].mode, kwargs["retry_policy"].retries) == (1, "fixed", 0)
+    assert kwargs["output"].fsync_every == mock_args.fsync_every
     assert f"Transcription completed. Output saved to '{mock_args.output_text}'." in caplog.text
 
 @patch('main.convert_to_wav', side_effect=ValueError("Unsupported format"))
@@ -107,7 +148,6 @@ def test_main_large_file_warning(mock_getsize, mock_exists, mock_transcribe_audi
     mock_load_or_initialize_chunks.return_value = ([], 0)
     mock_convert_and_prepare_audio.return_value = (str(tmp_path / "converted.wav"), str(tmp_path / "converted.wav"), lambda: None)
     mock_transcribe_audio_in_chunks.return_value = [{"text": "hello world", "start_time": 0, "end_time": 1}]
-    mock_save_transcription_output.return_value = None
 
     main.main(mock_args)
 
@@ -121,6 +161,8 @@ def test_main_resume_json_error(mock_json_load, mock_getsize, mock_exists, mock_
                               mock_args, caplog, tmp_path):
     caplog.set_level(logging.WARNING)
     mock_args.resume = str(tmp_path / "corrupt.json")
+    mock_args.input_audio = str(tmp_path / "input.mp3")
+    (tmp_path / "input.mp3").write_text("dummy content")
     mock_parse_arguments.return_value = mock_args
 
     with patch('main._convert_and_prepare_audio') as mock_convert:
@@ -140,6 +182,8 @@ def test_main_resume_file_not_found(mock_getsize, mock_exists, mock_parse_argume
                                   mock_args, caplog, tmp_path):
     caplog.set_level(logging.WARNING)
     mock_args.resume = "non_existent_progress.json"
+    with open(mock_args.input_audio, "w") as f:
+        f.write("dummy content")
     mock_parse_arguments.return_value = mock_args
     # Make input file exist but resume file not exist
     mock_exists.side_effect = lambda x: x != "non_existent_progress.json"
@@ -198,4 +242,349 @@ def test_main_resume_successful(mock_json_load, mock_getsize, mock_exists, mock_
                 main.main(mock_args)
 
     assert f"Resuming transcription from chunk 2 using progress file '{progress_file}'" in caplog.text
-    assert mock_transcribe.call_args[1]["start_chunk_index"] == 2
\ No newline at end of file
+    assert mock_transcribe.call_args[1]["start_chunk_index"] == 2
+@patch('main.open_pcm_stream')
+@patch('main.convert_to_wav')
+@patch('main.transcribe_audio_in_chunks')
+@patch('main._save_transcription_output')
+def test_process_audio_pipe_decode_skips_temp_wav(mock_save, mock_transcribe, mock_convert_to_wav, mock_open_pcm_stream):
+    mock_transcribe.return_value = [{"text": "piped", "start_time": 0, "end_time": 1}]
+
+    main.process_audio("podcast.m4a", "out.txt", 60, "en-US", "txt", None, "google", None, pipe_decode=True)
+
+    mock_convert_to_wav.assert_not_called()
+    mock_open_pcm_stream.assert_called_once_with("podcast.m4a", 60, start_ms=0, end_ms=None, first_index=0)
+    assert mock_transcribe.call_args[1]["reader"] is mock_open_pcm_stream.return_value
+
+@patch('main.open_pcm_stream')
+@patch('main._save_transcription_output', side_effect=OSError("output directory missing"))
+def test_process_audio_closes_pipe_when_setup_fails(mock_save, mock_open_pcm_stream):
+    mock_open_pcm_stream.return_value.wait_seconds = 1.5
+    metrics = Metrics("google")
+
+    with pytest.raises(OSError, match="output directory missing"):
+        main.process_audio("podcast.m4a", "out.txt", 60, "en-US", "txt", None, "google", None, pipe_decode=True,
+                           metrics=metrics)
+
+    mock_open_pcm_stream.return_value.close.assert_called_once()
+    # Time spent waiting for the decoder counts as conversion
+    assert metrics.summary()["stages"]["conversion"]["count"] == 1
+    assert metrics.summary()["stages"]["conversion"]["sum"] >= 1.5
+
+@patch('main.open_pcm_stream')
+@patch('main.convert_to_wav', return_value="input.wav")
+@patch('main.transcribe_audio_in_chunks')
+@patch('main._save_transcription_output')
+def test_process_audio_pipe_decode_reads_wav_directly(mock_save, mock_transcribe, mock_convert_to_wav, mock_open_pcm_stream):
+    mock_transcribe.return_value = []
+
+    main.process_audio("input.wav", "out.txt", 60, "en-US", "txt", None, "google", None, pipe_decode=True)
+
+    mock_open_pcm_stream.assert_not_called()
+    assert mock_transcribe.call_args[1]["reader"] is None
+
+def test_parse_arguments_single_file():
+    args = parse_arguments(["input.mp3", "output.txt", "--engine", "faster-whisper"])
+    assert args.command == "transcribe"
+    assert args.input_audio == "input.mp3"
+    assert args.engine == "faster-whisper"
+
+def test_parse_arguments_batch():
+    args = parse_arguments(["batch", "calls/*.wav", "extra.mp3", "--output-dir", "out", "--workers", "4"])
+    assert args.command == "batch"
+    assert args.inputs == ["calls/*.wav", "extra.mp3"]
+    assert args.output_dir == "out"
+    assert args.workers == 4
+    assert args.manifest is None
+
+def test_parse_arguments_batch_requires_inputs():
+    with pytest.raises(SystemExit):
+        parse_arguments(["batch", "--output-dir", "out"])
+
+@patch('main.run_batch')
+def test_main_batch_command(mock_run_batch, tmp_path):
+    audio = tmp_path / "call.wav"
+    audio.write_text("dummy")
+    args = parse_arguments(["batch", str(tmp_path), "--output-dir", str(tmp_path / "out")])
+
+    main.main(args)
+
+    assert mock_run_batch.call_args[0] == ([str(audio)], str(tmp_path / "out"))
+    assert mock_run_batch.call_args[1]["engine"] == "google"
+
+def test_main_batch_command_no_inputs(tmp_path, caplog):
+    args = parse_arguments(["batch", str(tmp_path / "*.wav"), "--output-dir", str(tmp_path / "out")])
+    with pytest.raises(ValueError, match="No input files matched"):
+        main.main(args)
+
+def test_handle_resume_refuses_journal_for_other_input(tmp_path):
+    progress_file = str(tmp_path / "progress.jsonl")
+    with ProgressJournal(progress_file, make_header("original", 60, "google", "en-US")) as journal:
+        journal.append(0, {"text": "first", "start_time": 0.0, "end_time": 60.0, "status": "ok"})
+
+    with pytest.raises(ResumeMismatchError, match="input_hash"):
+        main.handle_resume(progress_file, make_header("edited", 60, "google", "en-US"))
+    assert main.handle_resume(progress_file, make_header("original", 60, "google", "en-US"))[1] == 1
+
+@patch('main.run_tuning')
+def test_main_tune_command_saves_fastest_configuration(mock_run_tuning, tmp_path):
+    profile = str(tmp_path / "whisper_profile.json")
+    mock_run_tuning.return_value = [
+        {"model_size": "small", "compute_type": "int8", "device": "cpu", "cpu_threads": 1, "rtf": 0.4},
+        {"model_size": "small", "compute_type": "int8", "device": "cpu", "cpu_threads": 4, "rtf": 0.2},
+    ]
+    args = parse_arguments(["tune", "--duration", "1", "--threads", "1", "4", "--profile", profile])
+
+    main.main(args)
+
+    assert mock_run_tuning.call_args[0][1:4] == (["small"], ["int8", "int8_float32", "int16", "float32"], [1, 4])
+    with open(profile) as f:
+        saved = list(json.load(f)["hosts"].values())
+    assert saved[0]["cpu_threads"] == 4
+
+@patch('main._convert_and_prepare_audio')
+@patch('main.transcribe_audio_in_chunks')
+def test_main_writes_metrics(mock_transcribe_audio_in_chunks, mock_convert_and_prepare_audio, mock_args, tmp_path):
+    mock_convert_and_prepare_audio.return_value = (str(tmp_path / "converted.wav"), None, lambda: None)
+    mock_transcribe_audio_in_chunks.return_value = [{"text": "hello", "start_time": 0, "end_time": 1, "status": "ok"}]
+    with open(mock_args.input_audio, "w") as f:
+        f.write("dummy content")
+    mock_args.metrics = str(tmp_path / "metrics.json")
+
+    main.main(mock_args)
+
+    assert mock_transcribe_audio_in_chunks.call_args[1]["output"].metrics is not None
+    with open(mock_args.metrics) as f:
+        summary = json.load(f)
+    assert summary["engine"] == "google"
+    # Per-chunk stages are recorded by transcribe_audio_in_chunks, mocked here
+    assert set(summary["stages"]) == {"conversion"}
+
+@patch('main._convert_and_prepare_audio')
+@patch('main.transcribe_audio_in_chunks')
+def test_process_audio_streams_chunks_to_output(mock_transcribe, mock_convert_and_prepare_audio, tmp_path):
+    mock_convert_and_prepare_audio.return_value = (str(tmp_path / "converted.wav"), None, lambda: None)
+    output_path = tmp_path / "out.srt"
+    seen_while_running = []
+
+    def transcribe(*args, output, **kwargs):
+        for i in range(2):
+            output.on_chunk({"text": f"chunk {i}", "start_time": i, "end_time": i + 1, "status": "ok"})
+            seen_while_running.append(output_path.read_text())
+        return []
+
+    mock_transcribe.side_effect = transcribe
+    main.process_audio("input.wav", str(output_path), 60, "en-US", "srt", None, "google", None)
+
+    assert seen_while_running[0] == "1\n00:00:00,000 --> 00:00:01,000\nchunk 0\n"
+    assert output_path.read_text() == (
+        "1\n00:00:00,000 --> 00:00:01,000\nchunk 0\n\n"
+        "2\n00:00:01,000 --> 00:00:02,000\nchunk 1\n"
+    )
+
+@patch('main._convert_and_prepare_audio')
+@patch('main.transcribe_audio_in_chunks', side_effect=Exception("API Error"))
+def test_process_audio_keeps_restored_chunks_when_transcription_fails(mock_transcribe, mock_convert_and_prepare_audio, tmp_path):
+    mock_convert_and_prepare_audio.return_value = (str(tmp_path / "converted.wav"), None, lambda: None)
+    output_path = tmp_path / "out.txt"
+    restored = ([{"text": "restored", "start_time": 0, "end_time": 1, "status": "ok"}], 1)
+
+    with patch('main._load_or_initialize_chunks', return_value=restored):
+        with pytest.raises(Exception, match="API Error"):
+            main.process_audio("input.wav", str(output_path), 60, "en-US", "txt", None, "google", None)
+
+    assert output_path.read_text() == "restored"
+
+def test_parse_arguments_multiple_output_formats():
+    args = parse_arguments(["input.mp3", "talk.txt", "--output-format", "txt", "srt", "json", "--word-timestamps"])
+    assert args.output_format == ["txt", "srt", "json"]
+    assert args.word_timestamps
+    assert parse_arguments(["input.mp3", "talk.txt"]).output_format == ["txt"]
+
+def test_parse_arguments_retry_failed_needs_resume(capsys):
+    with pytest.raises(SystemExit):
+        parse_arguments(["input.mp3", "out.txt", "--retry-failed"])
+    assert "--retry-failed needs the progress file" in capsys.readouterr().err
+    args = parse_arguments(["input.mp3", "out.txt", "--retry-failed", "--resume", "progress.jsonl", "--retries", "5"])
+    assert args.retry_failed and args.retries == 5
+
+def test_parse_arguments_auto_language_needs_detecting_engine(capsys):
+    assert parse_arguments(["talk.m4a", "out.txt", "--language", "auto", "--engine", "faster-whisper"]).language == "auto"
+    with pytest.raises(SystemExit):
+        parse_arguments(["talk.m4a", "out.txt", "--language", "auto"])
+    assert "--language auto needs an engine that detects the language" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        parse_arguments(["batch", "talk.m4a", "--output-dir", "out", "--language", "auto", "--engine", "google"])
+    assert "give a language code for --engine google" in capsys.readouterr().err
+
+def test_parse_arguments_time_range(capsys):
+    args = parse_arguments(["talk.m4a", "out.txt", "--start-time", "3600", "--end-time", "7200"])
+    assert (args.start_time, args.end_time) == (3600, 7200)
+    with pytest.raises(SystemExit):
+        parse_arguments(["talk.m4a", "out.txt", "--start-time", "60", "--end-time", "30"])
+    assert "--end-time must be after --start-time" in capsys.readouterr().err
+
+@patch('main.convert_to_wav', return_value=("range.wav", lambda: None))
+@patch('main.transcribe_audio_in_chunks', return_value=[])
+@patch('main._save_transcription_output')
+def test_process_audio_resume_decodes_from_next_chunk(mock_save, mock_transcribe, mock_convert_to_wav, tmp_path):
+    input_path = tmp_path / "talk.m4a"
+    input_path.write_bytes(b"compressed audio")
+    progress_file = str(tmp_path / "progress.jsonl")
+    header = make_header(main.hash_file(str(input_path)), 60, "google", "en-US", time_range=[600000, None])
+    with ProgressJournal(progress_file, header) as journal:
+        for index in range(3):
+            journal.append(index, {"text": "done", "start_time": 600 + index * 60, "end_time": 660 + index * 60, "status": "ok"})
+
+    main.process_audio(str(input_path), "out.txt", 60, "en-US", "txt", progress_file, "google", None, start_time=600)
+
+    # Chunks 0-2 are in the journal, so decoding starts where chunk 3 does
+    mock_convert_to_wav.assert_called_once_with(str(input_path), start_ms=780000, end_ms=None, temp_dir=None)
+    kwargs = mock_transcribe.call_args[1]
+    assert (kwargs["start_chunk_index"], kwargs["start_ms"], kwargs["wav_offset_ms"]) == (3, 600000, 780000)
+
+@patch('main.convert_to_wav', return_value=("range.wav", lambda: None))
+@patch('main.transcribe_audio_in_chunks', return_value=[])
+@patch('main._save_transcription_output')
+def test_process_audio_vad_decodes_whole_range(mock_save, mock_transcribe, mock_convert_to_wav):
+    with patch('main._load_or_initialize_chunks', return_value=([{"text": "done"}], 1)):
+        main.process_audio("talk.m4a", "out.txt", 60, "en-US", "txt", None, "google", None,
+                           start_time=10, end_time=70.5, segmentation=SegmentationOptions("vad"))
+
+    # VAD plans its segments over the whole range, so it is decoded from its start
+    mock_convert_to_wav.assert_called_once_with("talk.m4a", start_ms=10000, end_ms=70500, temp_dir=None)
+    assert mock_transcribe.call_args[1]["wav_offset_ms"] == 10000
+
+@patch('main.transcribe_audio_in_chunks', return_value=[])
+@patch('main._save_transcription_output')
+def test_process_audio_converts_only_range_of_wav(mock_save, mock_transcribe, tmp_path):
+    with patch('main.convert_to_wav', return_value=("range.wav", lambda: None)) as mock_convert_to_wav:
+        main.process_audio("talk.wav", "out.txt", 60, "en-US", "txt", None, "google", None, start_time=30)
+    mock_convert_to_wav.assert_called_once_with("talk.wav", start_ms=30000, end_ms=None, temp_dir=None)
+    assert mock_transcribe.call_args[1]["wav_offset_ms"] == 30000
+
+    # An engine-format WAV is read in place, from the start of the file
+    with patch('main.convert_to_wav', return_value="talk.wav"):
+        main.process_audio("talk.wav", "out.txt", 60, "en-US", "txt", None, "google", None, start_time=30)
+    assert mock_transcribe.call_args[1]["wav_offset_ms"] == 0
+
+@patch('main.open_pcm_stream')
+@patch('main.transcribe_audio_in_chunks', return_value=[])
+@patch('main._save_transcription_output')
+def test_process_audio_pipe_decode_seeks_to_resume_chunk(mock_save, mock_transcribe, mock_open_pcm_stream):
+    with patch('main._load_or_initialize_chunks', return_value=([{"text": "done"}] * 350, 350)):
+        main.process_audio("talk.m4a", "out.txt", 60, "en-US", "txt", None, "google", None, pipe_decode=True)
+
+    mock_open_pcm_stream.assert_called_once_with("talk.m4a", 60, start_ms=0, end_ms=None, first_index=350)
+
+def test_parse_arguments_shard_and_merge(capsys):
+    assert parse_arguments(["talk.m4a", "out.srt", "--shard", "2/4"]).shard == (2, 4)
+    with pytest.raises(SystemExit):
+        parse_arguments(["talk.m4a", "out.srt", "--shard", "5/4"])
+    assert "between 1 and 4" in capsys.readouterr().err
+    args = parse_arguments(["merge", "talk.srt", "part1.jsonl", "part2.jsonl", "--output-format", "srt", "vtt"])
+    assert (args.command, args.output_text, args.shards, args.output_format) == \
+        ("merge", "talk.srt", ["part1.jsonl", "part2.jsonl"], ["srt", "vtt"])
+
+@patch('main.process_audio')
+@patch('main.shard_time_range', return_value=(3600.0, 7200.0))
+def test_main_shard_transcribes_its_time_range(mock_shard_time_range, mock_process_audio, mock_args, tmp_path):
+    mock_args.input_audio = str(tmp_path / "talk.m4a")
+    (tmp_path / "talk.m4a").write_bytes(b"compressed audio")
+    mock_args.shard = (2, 6)
+
+    main.main(mock_args)
+
+    mock_shard_time_range.assert_called_once_with(mock_args.input_audio, (2, 6), 60, None, None)
+    kwargs = mock_process_audio.call_args[1]
+    assert (kwargs["start_time"], kwargs["end_time"]) == (3600.0, 7200.0)
+
+@patch('main.merge_shards')
+def test_main_merge_command(mock_merge_shards):
+    main.main(parse_arguments(["merge", "talk.srt", "part1.jsonl", "part2.jsonl", "--output-format", "srt"]))
+    mock_merge_shards.assert_called_once_with(["part1.jsonl", "part2.jsonl"], "talk.srt", ["srt"])
+
+@patch('main.transcribe_audio_in_chunks', return_value=[])
+def test_process_audio_reuses_cached_conversion(mock_transcribe, write_wav, tmp_path):
+    from conversion_cache import ConversionCache
+    input_path = write_wav("talk.wav", sample_rate=44100, channels=2, frames=b"\x01\x00" * 2 * 44100)
+
+    with ConversionCache(str(tmp_path / "cache")) as conversion_cache:
+        with patch('conversion_cache.convert_to_wav', wraps=main.convert_to_wav) as mock_convert_to_wav:
+            for output_format in ("txt", "srt"):
+                main.process_audio(input_path, str(tmp_path / f"out.{output_format}"), 60, "en-US", output_format,
+                                   str(tmp_path / "progress.jsonl"), "google", None, conversion_cache=conversion_cache)
+        mock_convert_to_wav.assert_called_once()
+        wav_paths = [call[0][0] for call in mock_transcribe.call_args_list]
+        assert wav_paths[0] == wav_paths[1]
+        # The cached file outlives the run
+        assert os.path.exists(wav_paths[0])
+
+@patch('main.transcribe_audio_in_chunks', return_value=[])
+@patch('main._save_transcription_output')
+def test_process_audio_does_not_hash_engine_format_wav(mock_save, mock_transcribe, write_wav, tmp_path):
+    from conversion_cache import ConversionCache
+    input_path = write_wav("talk.wav", frames=b"\x01\x00" * 16000)
+
+    with ConversionCache(str(tmp_path / "cache")) as conversion_cache, patch('main.hash_file') as mock_hash_file:
+        main.process_audio(input_path, "out.txt", 60, "en-US", "txt", None, "google", None, conversion_cache=conversion_cache)
+
+    mock_hash_file.assert_not_called()
+    assert mock_transcribe.call_args[0][0] == input_path
+
+def test_main_transcribes_live_stdin(mock_args, tmp_path, monkeypatch):
+    import numpy as np
+    t = np.arange(16000 * 2) / 16000
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2").tobytes()
+    monkeypatch.setattr(sys, "stdin", MagicMock(buffer=io.BytesIO(tone * 2 + b"\0\0" * 16000)))
+    mock_args.input_audio = "-"
+    mock_args.input_format = "s16le"
+    mock_args.output_text = str(tmp_path / "live.srt")
+    mock_args.output_format = "srt"
+    mock_args.chunk = 2
+
+    with patch('google_engine.recognize', side_effect=["one", "two", "three"]) as mock_recognize:
+        main.main(mock_args)
+
+    assert [call[0][1] for call in mock_recognize.call_args_list] == [16000] * 3
+    with open(mock_args.output_text) as f:
+        assert f.read() == ("1\n00:00:00,000 --> 00:00:02,000\none\n\n"
+                            "2\n00:00:02,000 --> 00:00:04,000\ntwo\n\n"
+                            "3\n00:00:04,000 --> 00:00:05,000\nthree\n")
+
+def test_main_live_input_rejects_resume(mock_args, caplog):
+    mock_args.input_audio = "-"
+    mock_args.resume = "progress.jsonl"
+    with pytest.raises(ValueError, match="--resume cannot be used with live input"):
+        main.main(mock_args)
+
+def test_is_live_input_detects_named_pipes(tmp_path):
+    fifo_path = tmp_path / "live.fifo"
+    os.mkfifo(fifo_path)
+    (tmp_path / "talk.wav").write_bytes(b"RIFF")
+    assert main._is_live_input("-")
+    assert main._is_live_input(str(fifo_path))
+    assert not main._is_live_input(str(tmp_path / "talk.wav"))
+    assert not main._is_live_input(str(tmp_path / "missing.wav"))
+
+@pytest.mark.parametrize("command", [[], ["batch", "--output-dir"]])
+def test_main_converts_into_temp_dir_without_conversion_cache(command, write_wav, tmp_path):
+    input_path = write_wav("stereo.wav", sample_rate=8000, channels=2)
+    temp_dir = tmp_path / "scratch"
+    temp_dir.mkdir()
+    output = str(tmp_path / "out")
+    argv = [input_path, output] if not command else [command[0], input_path, command[1], output]
+    args = parse_arguments(argv + ["--temp-dir", str(temp_dir), "--conversion-cache-size", "0"])
+    converted_in = []
+
+    def transcribe(wav_path, **kwargs):
+        converted_in.append(os.path.dirname(wav_path))
+        return []
+
+    with patch('main.transcribe_audio_in_chunks', side_effect=transcribe), \
+            patch('batch.transcribe_audio_in_chunks', side_effect=transcribe):
+        main.main(args)
+
+    assert converted_in == [str(temp_dir)]
+    # The temporary WAV is removed afterwards
+    assert os.listdir(temp_dir) == []
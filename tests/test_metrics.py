@@ -0,0 +1,63 @@
+import json
+import pytest
+from metrics import Histogram, Metrics
+
+def _chunk(status, start, end):
+    return {"text": "", "start_time": start, "end_time": end, "status": status}
+
+def test_histogram_summary_and_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in [0.05, 0.5, 0.7, 2.0]:
+        histogram.observe(value)
+
+    assert histogram.bucket_counts() == [(0.1, 1), (1.0, 3)]
+    summary = histogram.summary()
+    assert summary["count"] == 4
+    assert summary["sum"] == pytest.approx(3.25)
+    assert summary["max"] == 2.0
+    assert summary["p50"] == 0.7
+
+def test_metrics_summary_counts_chunks_and_real_time_factor():
+    metrics = Metrics("google")
+    metrics.record_chunk(_chunk("ok", 0.0, 60.0))
+    metrics.record_chunk(_chunk("failed", 60.0, 120.0))
+    metrics.observe("engine", 0.4)
+    with metrics.time("formatting"):
+        pass
+
+    summary = metrics.summary()
+    assert summary["chunks"] == {"ok": 1, "failed": 1}
+    assert summary["errors"] == 1
+    assert summary["audio_seconds"] == 120.0
+    assert summary["real_time_factor"] == pytest.approx(summary["wall_seconds"] / 120.0)
+    assert set(summary["stages"]) == {"engine", "formatting"}
+
+def test_metrics_without_audio_has_no_real_time_factor():
+    assert Metrics("google").summary()["real_time_factor"] is None
+
+def test_prometheus_output_labels_stages_by_engine():
+    metrics = Metrics("faster-whisper")
+    metrics.observe("engine", 0.2)
+    metrics.record_chunk(_chunk("ok", 0.0, 1.0))
+    metrics.increment("cache_hits", 2)
+
+    text = metrics.to_prometheus()
+    assert '# TYPE audio_to_text_stage_duration_seconds histogram' in text
+    assert 'audio_to_text_stage_duration_seconds_bucket{engine="faster-whisper",stage="engine",le="0.25"} 1' in text
+    assert 'audio_to_text_stage_duration_seconds_count{engine="faster-whisper",stage="engine"} 1' in text
+    assert 'audio_to_text_chunks_total{engine="faster-whisper",status="ok"} 1' in text
+    assert 'audio_to_text_cache_hits_total{engine="faster-whisper"} 2' in text
+
+@pytest.mark.parametrize("name", ["metrics.json", "metrics.prom"])
+def test_write_picks_format_from_extension(tmp_path, name):
+    metrics = Metrics("google")
+    metrics.observe("conversion", 1.5)
+    path = tmp_path / name
+    metrics.write(str(path))
+
+    content = path.read_text()
+    if name.endswith(".prom"):
+        assert 'stage="conversion"' in content
+    else:
+        assert json.loads(content)["stages"]["conversion"]["count"] == 1
+    assert not (tmp_path / f"{name}.tmp").exists()
@@ -1,5 +1,6 @@
 import pytest
-from output_formatter import format_transcription, to_srt, to_vtt, _format_time
+import json
+from output_formatter import format_transcription, open_writer, open_writers, output_paths, to_srt, to_vtt, _format_time
 
 @pytest.fixture
 def sample_transcribed_chunks():
@@ -51,3 +52,116 @@ def test_to_srt_missing_keys():
 def test_to_vtt_missing_keys():
     with pytest.raises(KeyError):
         to_vtt([{"text": "test"}])
+
+@pytest.fixture
+def chunks_with_silence():
+    return [
+        {"text": "Hello world.", "start_time": 0.0, "end_time": 1.5},
+        {"text": "", "start_time": 1.5, "end_time": 10.0, "silent": True},
+        {"text": "This is a test.", "start_time": 10.0, "end_time": 12.0}
+    ]
+
+def test_format_transcription_txt_skips_silence(chunks_with_silence):
+    assert format_transcription(chunks_with_silence, "txt") == "Hello world. This is a test."
+
+def test_to_srt_skips_silence_and_keeps_timestamps(chunks_with_silence):
+    expected = (
+        "1\n00:00:00,000 --> 00:00:01,500\nHello world.\n\n"
+        "2\n00:00:10,000 --> 00:00:12,000\nThis is a test.\n"
+    )
+    assert to_srt(chunks_with_silence) == expected
+
+def test_to_vtt_skips_silence_and_keeps_timestamps(chunks_with_silence):
+    expected = (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:01.500\nHello world.\n\n"
+        "00:00:10.000 --> 00:00:12.000\nThis is a test.\n"
+    )
+    assert to_vtt(chunks_with_silence) == expected
+
+@pytest.mark.parametrize("output_format", ["txt", "srt", "vtt"])
+def test_streaming_writer_matches_format_transcription(tmp_path, chunks_with_silence, output_format):
+    path = tmp_path / f"out.{output_format}"
+    with open_writer(str(path), output_format) as writer:
+        for chunk in chunks_with_silence:
+            writer.write_chunk(chunk)
+
+    assert path.read_text(encoding="utf-8") == format_transcription(chunks_with_silence, output_format)
+
+def test_streaming_writer_flushes_each_chunk(tmp_path, sample_transcribed_chunks):
+    path = tmp_path / "out.vtt"
+    with open_writer(str(path), "vtt") as writer:
+        assert path.read_text() == "WEBVTT\n"
+        writer.write_chunk(sample_transcribed_chunks[0])
+        assert path.read_text() == "WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nHello world.\n"
+
+def test_open_writer_writes_dash_to_stdout(capsys, sample_transcribed_chunks):
+    with open_writer("-", "srt") as writer:
+        writer.write_chunk(sample_transcribed_chunks[0])
+        assert capsys.readouterr().out == "1\n00:00:00,000 --> 00:00:01,500\nHello world.\n"
+    print("still open")
+    assert capsys.readouterr().out == "still open\n"
+
+def test_output_paths_refuses_several_formats_on_stdout():
+    with pytest.raises(ValueError, match="Only one output format"):
+        output_paths("-", ["txt", "srt"])
+
+def test_open_writer_unsupported_format(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported output format: xyz"):
+        open_writer(str(tmp_path / "out.xyz"), "xyz")
+    assert not (tmp_path / "out.xyz").exists()
+
+@pytest.fixture
+def chunks_with_segments():
+    return [
+        {"text": "Hello there. General Kenobi.", "start_time": 0.0, "end_time": 60.0, "status": "ok", "segments": [
+            {"start": 0.5, "end": 2.0, "text": "Hello there.", "confidence": 0.91,
+             "words": [{"start": 0.5, "end": 1.0, "word": "Hello", "probability": 0.95},
+                       {"start": 1.1, "end": 2.0, "word": "there.", "probability": 0.87}]},
+            {"start": 3.0, "end": 4.25, "text": "General Kenobi.", "confidence": 0.8},
+        ]},
+        {"text": "[RequestError: quota]", "start_time": 60.0, "end_time": 120.0, "status": "failed"},
+    ]
+
+def test_srt_renders_one_cue_per_segment(chunks_with_segments):
+    assert to_srt(chunks_with_segments) == (
+        "1\n00:00:00,500 --> 00:00:02,000\nHello there.\n\n"
+        "2\n00:00:03,000 --> 00:00:04,250\nGeneral Kenobi.\n\n"
+        "3\n00:01:00,000 --> 00:02:00,000\n[RequestError: quota]\n"
+    )
+
+def test_json_keeps_segment_timestamps_confidence_and_words(chunks_with_segments):
+    document = json.loads(format_transcription(chunks_with_segments, "json"))
+    first, second, failed = document["segments"]
+    assert first["confidence"] == 0.91
+    assert first["words"][1] == {"start": 1.1, "end": 2.0, "word": "there.", "probability": 0.87}
+    assert (second["start"], second["end"], second["status"]) == (3.0, 4.25, "ok")
+    assert failed == {"start": 60.0, "end": 120.0, "text": "[RequestError: quota]", "status": "failed"}
+
+def test_json_without_segments_is_valid():
+    assert json.loads(format_transcription([], "json")) == {"segments": []}
+
+def test_jsonl_writes_one_complete_line_per_segment(tmp_path, chunks_with_segments):
+    path = tmp_path / "out.jsonl"
+    with open_writer(str(path), "jsonl") as writer:
+        writer.write_chunk(chunks_with_segments[0])
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["text"] for line in lines] == ["Hello there.", "General Kenobi."]
+
+def test_fan_out_renders_every_format_in_one_pass(tmp_path, chunks_with_segments):
+    paths = output_paths(str(tmp_path / "talk.txt"), ["txt", "srt", "json"])
+    assert paths == {"txt": str(tmp_path / "talk.txt"), "srt": str(tmp_path / "talk.srt"),
+                     "json": str(tmp_path / "talk.json")}
+
+    with open_writers(paths) as writer:
+        writer.write_chunks(chunks_with_segments)
+
+    for output_format, path in paths.items():
+        with open(path, encoding="utf-8") as f:
+            assert f.read() == format_transcription(chunks_with_segments, output_format)
+
+def test_output_paths_single_format_keeps_path():
+    assert output_paths("notes.md", "srt") == {"srt": "notes.md"}
+    assert output_paths("out/talk", ["srt", "vtt"]) == {"srt": "out/talk.srt", "vtt": "out/talk.vtt"}
+    with pytest.raises(ValueError, match="Unsupported output format: doc"):
+        output_paths("talk.txt", ["txt", "doc"])
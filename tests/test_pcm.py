@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+from pcm import pcm_to_float32, resample, float32_to_pcm16, StreamResampler, convert_pcm_blocks
+
+def test_pcm_to_float32_16bit():
+    pcm = np.array([0, 16384, -32768], dtype="<i2").tobytes()
+    samples = pcm_to_float32(pcm, sample_width=2)
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, [0.0, 0.5, -1.0])
+
+def test_pcm_to_float32_downmixes_stereo():
+    pcm = np.array([16384, -16384, 16384, 16384], dtype="<i2").tobytes()
+    samples = pcm_to_float32(pcm, sample_width=2, channels=2)
+    np.testing.assert_allclose(samples, [0.0, 0.5])
+
+def test_pcm_to_float32_24bit_sign_extension():
+    pcm = (-8388608).to_bytes(3, 'little', signed=True) + (4194304).to_bytes(3, 'little', signed=True)
+    samples = pcm_to_float32(pcm, sample_width=3)
+    np.testing.assert_allclose(samples, [-1.0, 0.5])
+
+def test_pcm_to_float32_unsupported_width():
+    with pytest.raises(ValueError, match="Unsupported sample width: 5"):
+        pcm_to_float32(b"\x00" * 5, sample_width=5)
+
+def test_resample_changes_length():
+    samples = np.zeros(8000, dtype=np.float32)
+    assert len(resample(samples, 8000, 16000)) == 16000
+    assert len(resample(samples, 16000, 8000)) == 4000
+    assert resample(samples, 16000, 16000) is samples
+
+def test_float32_to_pcm16_clips():
+    pcm = float32_to_pcm16(np.array([2.0, -2.0, 0.0], dtype=np.float32))
+    assert np.frombuffer(pcm, dtype="<i2").tolist() == [32767, -32767, 0]
+
+def _sine(frequency, sample_rate, seconds=1.0):
+    return (0.5 * np.sin(2 * np.pi * frequency * np.arange(int(sample_rate * seconds)) / sample_rate)).astype(np.float32)
+
+def test_stream_resampler_output_does_not_depend_on_block_size():
+    samples = _sine(440, 44100, seconds=2)
+    whole = StreamResampler(44100)
+    expected = np.concatenate([whole.process(samples), whole.flush()])
+    blocks = StreamResampler(44100)
+    streamed = np.concatenate([blocks.process(samples[i:i + 777]) for i in range(0, len(samples), 777)] + [blocks.flush()])
+
+    assert len(expected) == 32000
+    np.testing.assert_allclose(streamed, expected, atol=1e-6)
+    np.testing.assert_allclose(expected[100:-100], _sine(440, 16000, seconds=2)[100:-100], atol=2e-3)
+
+def test_stream_resampler_filters_frequencies_above_target_nyquist():
+    # A 12 kHz tone cannot be represented at 16 kHz and would fold back to 4 kHz without filtering
+    resampler = StreamResampler(48000)
+    output = np.concatenate([resampler.process(_sine(12000, 48000)), resampler.flush()])
+    assert np.sqrt(np.mean(output ** 2)) < 0.01
+
+def test_convert_pcm_blocks_downmixes_to_16bit_mono():
+    stereo = np.repeat((_sine(440, 32000) * 32767).astype("<i2"), 2).tobytes()
+    output = b"".join(convert_pcm_blocks([stereo[:40000], stereo[40000:]], 2, 2, 32000))
+    assert len(output) == 16000 * 2
@@ -0,0 +1,120 @@
+import threading
+import time
+import pytest
+from concurrent.futures import Future, ThreadPoolExecutor
+from pipeline import ChunkPipeline
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+def _chunks(count, delay=0.0, fail_at=None):
+    for i in range(count):
+        if i == fail_at:
+            raise ValueError("decoder failed")
+        time.sleep(delay)
+        yield i, i * 1000, (i + 1) * 1000, b"pcm"
+
+def test_pipeline_writes_chunks_in_order():
+    written = []
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        def submit(index, pcm, start_ms, end_ms):
+            # Later chunks finish first
+            return executor.submit(lambda: time.sleep(0.05 * (5 - index)) or index)
+        ChunkPipeline(_chunks(5), submit, lambda index, result: written.append((index, result)),
+                      extract_queue_size=3, write_queue_size=2).run()
+    assert written == [(i, i) for i in range(5)]
+
+def test_pipeline_overlaps_extraction_and_recognition():
+    def submit(index, pcm, start_ms, end_ms):
+        time.sleep(0.1)
+        return _done(index)
+
+    start = time.monotonic()
+    ChunkPipeline(_chunks(6, delay=0.1), submit, lambda index, result: None).run()
+    # 6 x (0.1s decode + 0.1s recognize) takes 1.2s in sequence; overlapped about 0.7s
+    assert time.monotonic() - start < 1.0
+
+def test_pipeline_backpressure_bounds_extraction():
+    extracted = []
+    release = threading.Event()
+
+    def chunks():
+        for chunk in _chunks(10):
+            extracted.append(chunk[0])
+            yield chunk
+
+    def submit(index, pcm, start_ms, end_ms):
+        release.wait()
+        return _done(index)
+
+    pipeline = ChunkPipeline(chunks(), submit, lambda index, result: None, extract_queue_size=2)
+    runner = threading.Thread(target=pipeline.run)
+    runner.start()
+    time.sleep(0.3)
+    # One chunk being recognized, two queued and one waiting for queue space
+    assert len(extracted) <= 4
+    assert pipeline.queue_depths()["extract"] == 2
+    release.set()
+    runner.join()
+    assert len(extracted) == 10
+    assert pipeline.queue_stats()["extract"]["max_depth"] == 2
+
+def test_pipeline_writes_chunks_before_extraction_error():
+    written = []
+    pipeline = ChunkPipeline(_chunks(5, fail_at=3), lambda index, *args: _done(index),
+                             lambda index, result: written.append(index))
+    with pytest.raises(ValueError, match="decoder failed"):
+        pipeline.run()
+    assert written == [0, 1, 2]
+
+def test_pipeline_stops_when_writer_fails():
+    def on_chunk_done(index, result):
+        if index == 2:
+            raise OSError("disk full")
+
+    pipeline = ChunkPipeline(_chunks(100), lambda index, *args: _done(index), on_chunk_done)
+    with pytest.raises(OSError, match="disk full"):
+        pipeline.run()
+
+def test_pipeline_caps_unwritten_chunks():
+    futures = []
+
+    def submit(index, pcm, start_ms, end_ms):
+        futures.append(Future())
+        return futures[-1]
+
+    pipeline = ChunkPipeline(_chunks(10), submit, lambda index, result: None, extract_queue_size=5, write_queue_size=2)
+    runner = threading.Thread(target=pipeline.run, daemon=True)
+    runner.start()
+    time.sleep(0.3)
+    submitted = len(futures)
+    while runner.is_alive():
+        for future in list(futures):
+            if not future.done():
+                future.set_result(None)
+        time.sleep(0.01)
+    # The writer waits on the first chunk and two are queued; the fourth is not submitted yet
+    assert submitted == 3
+    assert len(futures) == 10
+
+def test_pipeline_joins_extractor_before_raising():
+    reading = threading.Event()
+    finished_reading = []
+
+    def chunks():
+        yield 0, 0, 1000, b"pcm"
+        reading.set()
+        time.sleep(0.2)
+        finished_reading.append(True)
+        yield 1, 1000, 2000, b"pcm"
+
+    def on_chunk_done(index, result):
+        reading.wait()
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        ChunkPipeline(chunks(), lambda index, *args: _done(index), on_chunk_done).run()
+    # The read in progress finished before run() returned, so the reader can be closed
+    assert finished_reading == [True]
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import pytest
+from progress_journal import ProgressJournal, ResumeMismatchError, load_progress, make_header, hash_file
+
+def _chunk(i):
+    return {"text": f"chunk {i}", "start_time": float(i), "end_time": float(i + 1), "status": "ok"}
+
+@pytest.fixture
+def header():
+    return make_header("abc123", 60, "google", "en-US")
+
+def test_journal_appends_one_line_per_chunk(tmp_path, header):
+    path = str(tmp_path / "progress.jsonl")
+    with ProgressJournal(path, header) as journal:
+        for i in range(3):
+            journal.append(i, _chunk(i))
+
+    with open(path) as f:
+        lines = f.readlines()
+    assert len(lines) == 4
+    assert json.loads(lines[0]) == header
+    assert load_progress(path, header) == ([_chunk(0), _chunk(1), _chunk(2)], 2)
+
+def test_journal_continues_existing_file(tmp_path, header):
+    path = str(tmp_path / "progress.jsonl")
+    with ProgressJournal(path, header) as journal:
+        journal.append(0, _chunk(0))
+    with open(path, "rb") as f:
+        first_run = f.read()
+
+    chunks, last_chunk_index = load_progress(path, header)
+    with ProgressJournal(path, header, chunks, last_chunk_index + 1) as journal:
+        journal.append(1, _chunk(1))
+
+    with open(path, "rb") as f:
+        assert f.read().startswith(first_run)
+    assert load_progress(path, header) == ([_chunk(0), _chunk(1)], 1)
+
+def test_load_ignores_torn_final_record(tmp_path, header):
+    path = str(tmp_path / "progress.jsonl")
+    with ProgressJournal(path, header) as journal:
+        journal.append(0, _chunk(0))
+        journal.append(1, _chunk(1))
+    with open(path, "ab") as f:
+        f.write(b'{"type": "chunk", "index": 2, "text": "half wri')
+
+    chunks, last_chunk_index = load_progress(path, header)
+    assert last_chunk_index == 1
+
+    # Resuming drops the torn bytes before appending
+    with ProgressJournal(path, header, chunks, last_chunk_index + 1) as journal:
+        journal.append(2, _chunk(2))
+    assert load_progress(path, header) == ([_chunk(0), _chunk(1), _chunk(2)], 2)
+
+def test_load_refuses_mismatched_journal(tmp_path, header):
+    path = str(tmp_path / "progress.jsonl")
+    with ProgressJournal(path, header) as journal:
+        journal.append(0, _chunk(0))
+
+    with pytest.raises(ResumeMismatchError, match="input_hash"):
+        load_progress(path, make_header("def456", 60, "google", "en-US"))
+    with pytest.raises(ResumeMismatchError, match="chunk_duration"):
+        load_progress(path, make_header("abc123", 30, "google", "en-US"))
+
+def test_load_reads_old_progress_format(tmp_path, header):
+    path = tmp_path / "progress.json"
+    path.write_text(json.dumps({"transcribed_chunks": [_chunk(0), _chunk(1)], "last_chunk_index": 1}))
+
+    assert load_progress(str(path), header) == ([_chunk(0), _chunk(1)], 1)
+
+def test_journal_replaces_old_progress_format(tmp_path, header):
+    path = tmp_path / "progress.json"
+    path.write_text(json.dumps({"transcribed_chunks": [_chunk(0)], "last_chunk_index": 0}))
+
+    with ProgressJournal(str(path), header, [_chunk(0)], 1) as journal:
+        journal.append(1, _chunk(1))
+
+    assert load_progress(str(path), header) == ([_chunk(0), _chunk(1)], 1)
+
+def test_hash_file(tmp_path):
+    path = tmp_path / "input.bin"
+    path.write_bytes(b"audio")
+    assert hash_file(str(path)) == hashlib.sha256(b"audio").hexdigest()
+
+def test_load_keeps_latest_record_per_chunk(tmp_path, header):
+    path = str(tmp_path / "progress.jsonl")
+    failed = {**_chunk(1), "text": "[RequestError: quota]", "status": "failed"}
+    with ProgressJournal(path, header) as journal:
+        journal.append(0, _chunk(0))
+        journal.append(1, failed)
+        journal.append(2, _chunk(2))
+    chunks, last_chunk_index = load_progress(path, header)
+    with ProgressJournal(path, header, chunks, last_chunk_index + 1) as journal:
+        journal.append(1, _chunk(1))
+
+    assert load_progress(path, header) == ([_chunk(0), _chunk(1), _chunk(2)], 2)
+    with open(path) as f:
+        assert len(f.readlines()) == 5
+
+def test_load_refuses_journal_for_other_time_range(tmp_path):
+    path = str(tmp_path / "progress.jsonl")
+    header = make_header("abc123", 60, "google", "en-US", time_range=[0, 3600000])
+    with ProgressJournal(path, header) as journal:
+        journal.append(0, _chunk(0))
+    with pytest.raises(ResumeMismatchError, match="time_range"):
+        load_progress(path, make_header("abc123", 60, "google", "en-US", time_range=[3600000, 7200000]))
+    assert load_progress(path, header) == ([_chunk(0)], 0)
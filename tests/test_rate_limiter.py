@@ -0,0 +1,33 @@
+import pytest
+import time
+import threading
+from rate_limiter import TokenBucket
+
+def test_token_bucket_allows_initial_burst():
+    bucket = TokenBucket(rate=5, capacity=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+def test_token_bucket_limits_sustained_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # One token is available immediately, the other five arrive at 20 per second
+    assert time.monotonic() - start >= 0.24
+
+def test_token_bucket_is_shared_between_threads():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.19
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError, match="Rate limit must be positive"):
+        TokenBucket(rate=0)
@@ -0,0 +1,42 @@
+import pytest
+from unittest.mock import MagicMock
+from retry import RetryPolicy
+
+class Transient(Exception):
+    pass
+
+def test_delay_grows_exponentially_with_full_jitter(monkeypatch):
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+    policy = RetryPolicy(retries=5, base_delay=0.5, max_delay=3.0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+def test_delay_is_random_below_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
+    assert all(0 <= policy.delay(3) <= 8.0 for _ in range(100))
+
+def test_call_retries_until_success():
+    function = MagicMock(side_effect=[Transient("busy"), Transient("busy"), "done"])
+    sleep = MagicMock()
+
+    result = RetryPolicy(retries=3, base_delay=0.1).call(function, "audio", retry_on=(Transient,), sleep=sleep)
+
+    assert result == ("done", 3)
+    function.assert_called_with("audio")
+    assert sleep.call_count == 2
+
+def test_call_raises_last_error_with_attempts():
+    function = MagicMock(side_effect=Transient("quota"))
+    with pytest.raises(Transient) as error:
+        RetryPolicy(retries=2).call(function, retry_on=(Transient,), sleep=lambda seconds: None)
+    assert error.value.attempts == 3
+    assert function.call_count == 3
+
+def test_call_does_not_retry_other_errors():
+    function = MagicMock(side_effect=KeyError("bug"))
+    with pytest.raises(KeyError):
+        RetryPolicy(retries=5).call(function, retry_on=(Transient,), sleep=lambda seconds: None)
+    assert function.call_count == 1
+
+def test_invalid_policy():
+    with pytest.raises(ValueError, match="Retries must not be negative"):
+        RetryPolicy(retries=-1)
@@ -0,0 +1,113 @@
+import pytest
+import io
+import numpy as np
+from chunk_reader import WavChunkReader, PcmStreamChunkReader
+from segmenter import compute_frame_energy, find_silences, plan_segments, segment_reader
+
+@pytest.fixture
+def create_speech_wav_file(write_wav):
+    def _create_speech_wav_file(filename, pattern, sample_rate=8000):
+        # pattern is a list of (seconds, is_loud); loud parts are a 440 Hz tone, the rest is silence
+        parts = []
+        for seconds, is_loud in pattern:
+            t = np.arange(int(seconds * sample_rate)) / sample_rate
+            parts.append(0.5 * np.sin(2 * np.pi * 440 * t) if is_loud else np.zeros_like(t))
+        return write_wav(filename, sample_rate=sample_rate, frames=np.concatenate(parts) * 32767)
+    return _create_speech_wav_file
+
+def test_compute_frame_energy(create_speech_wav_file):
+    wav_path = create_speech_wav_file("speech.wav", [(1, True), (1, False)])
+    with WavChunkReader(wav_path) as reader:
+        energy_db = compute_frame_energy(reader, frame_ms=100)
+    assert len(energy_db) == 20
+    # A 0.5 amplitude sine is about -9 dBFS; digital silence hits the floor
+    assert np.all(np.abs(energy_db[:10] + 9.0) < 0.5)
+    assert np.all(energy_db[10:] < -150)
+
+def test_find_silences_ignores_short_pauses():
+    energy_db = np.array([-10, -60, -60, -10, -60, -60, -60, -60, -10], dtype=float)
+    assert find_silences(energy_db, threshold_db=-40, min_silence_ms=300, frame_ms=100) == [(400, 800)]
+
+def test_plan_segments_covers_timeline_and_pads_speech():
+    energy_db = np.array([-10] * 20 + [-60] * 30 + [-10] * 20, dtype=float)
+    segments = plan_segments(energy_db, 7000, min_chunk_ms=500, max_chunk_ms=10000, frame_ms=100, padding_ms=200)
+    assert segments == [(0, 2200, True), (2200, 4800, False), (4800, 7000, True)]
+
+def test_plan_segments_leading_and_trailing_silence():
+    energy_db = np.array([-60] * 10 + [-10] * 10 + [-60] * 10, dtype=float)
+    segments = plan_segments(energy_db, 3050, min_chunk_ms=500, max_chunk_ms=10000, frame_ms=100, padding_ms=200)
+    assert segments == [(0, 800, False), (800, 2200, True), (2200, 3050, False)]
+
+def test_plan_segments_splits_long_speech_at_quietest_frame():
+    energy_db = np.full(100, -10.0)
+    energy_db[37] = -30.0  # a dip that is not long enough to count as silence
+    segments = plan_segments(energy_db, 10000, min_chunk_ms=2000, max_chunk_ms=6000, frame_ms=100)
+    # The first cut lands on the dip; the flat remainder is cut as early as min_chunk allows
+    assert segments == [(0, 3750, True), (3750, 5750, True), (5750, 10000, True)]
+
+def test_segment_reader_skips_silence(create_speech_wav_file):
+    wav_path = create_speech_wav_file("speech.wav", [(2, True), (5, False), (3, True)])
+    reader = segment_reader(WavChunkReader(wav_path), min_chunk_duration=1, max_chunk_duration=60)
+    chunks = list(reader.iter_chunks())
+    reader.close()
+
+    assert [(start, end, pcm is not None) for _, start, end, pcm in chunks] == \
+        [(0, 2210, True), (2210, 6790, False), (6790, 10000, True)]
+    assert len(chunks[0][3]) == 2210 * 8 * 2
+
+def _speech_pcm(pattern, sample_rate=8000):
+    parts = []
+    for seconds, is_loud in pattern:
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        parts.append(0.5 * np.sin(2 * np.pi * 440 * t) if is_loud else np.zeros_like(t))
+    return (np.concatenate(parts) * 32767).astype("<i2").tobytes()
+
+def test_segment_reader_segments_streams_as_they_arrive():
+    stream = io.BytesIO(_speech_pcm([(2, True), (5, False), (3, True)]))
+    reader = segment_reader(PcmStreamChunkReader(stream, sample_rate=8000), min_chunk_duration=1, max_chunk_duration=60)
+    chunks = reader.iter_chunks()
+
+    index, start, end, pcm = next(chunks)
+    # The first chunk ends in the pause, long before the stream is used up
+    assert (index, start, end) == (0, 0, 2190)
+    assert len(pcm) == 2190 * 8 * 2
+    assert stream.tell() < 3000 * 8 * 2
+    assert [(start, end, pcm is not None) for _, start, end, pcm in chunks] == [(2190, 6810, False), (6810, 10000, True)]
+    reader.close()
+
+def test_stream_segmenter_pause_shorter_than_padding_does_not_overlap():
+    stream = io.BytesIO(_speech_pcm([(1, True), (0.5, False), (1, True), (0.5, False)]))
+    reader = segment_reader(PcmStreamChunkReader(stream, sample_rate=8000), min_chunk_duration=0.1,
+                            max_chunk_duration=60, min_silence=0.1)
+    chunks = list(reader.iter_chunks())
+    reader.close()
+
+    assert chunks[0][1] == 0 and chunks[-1][2] == 3000
+    assert all(chunks[i][2] == chunks[i + 1][1] for i in range(len(chunks) - 1))
+    # Each chunk carries exactly the audio between its start and end
+    assert all(len(pcm) == (end - start) * 8 * 2 for _, start, end, pcm in chunks if pcm is not None)
+
+def test_stream_segmenter_caps_chunk_length():
+    stream = io.BytesIO(_speech_pcm([(10, True)]))
+    reader = segment_reader(PcmStreamChunkReader(stream, sample_rate=8000), min_chunk_duration=1, max_chunk_duration=4)
+    chunks = list(reader.iter_chunks())
+    reader.close()
+
+    assert chunks[0][1] == 0 and chunks[-1][2] == 10000
+    assert all(end - start <= 4000 for _, start, end, _ in chunks)
+    assert all(chunks[i][2] == chunks[i + 1][1] for i in range(len(chunks) - 1))
+
+def test_stream_segmenter_splits_long_silence():
+    stream = io.BytesIO(_speech_pcm([(10, False)]))
+    reader = segment_reader(PcmStreamChunkReader(stream, sample_rate=8000), min_chunk_duration=1, max_chunk_duration=4)
+    chunks = list(reader.iter_chunks())
+    reader.close()
+
+    assert [(start, end, pcm) for _, start, end, pcm in chunks] == [(0, 4020, None), (4020, 8040, None), (8040, 10000, None)]
+
+def test_segment_reader_plans_within_time_range(create_speech_wav_file):
+    wav_path = create_speech_wav_file("speech.wav", [(2, True), (5, False), (3, True)])
+    reader = segment_reader(WavChunkReader(wav_path, start_ms=4000, end_ms=9000), min_chunk_duration=1, max_chunk_duration=60)
+    reader.close()
+
+    assert reader.segments == [(4000, 6800, False), (6800, 9000, True)]
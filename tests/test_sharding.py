@@ -0,0 +1,99 @@
+import pytest
+import json
+import logging
+from output_formatter import format_transcription
+from progress_journal import ProgressJournal, make_header
+from sharding import parse_shard, shard_time_range, read_shard, merge_shards
+
+def _chunk(start, end, text):
+    return {"text": text, "start_time": float(start), "end_time": float(end), "status": "ok"}
+
+def _write_journal(path, chunks, time_range, input_hash="abc123"):
+    with ProgressJournal(str(path), make_header(input_hash, 60, "google", "en-US", time_range=time_range)) as journal:
+        for index, chunk in enumerate(chunks):
+            journal.append(index, chunk)
+    return str(path)
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    with pytest.raises(ValueError, match="INDEX/COUNT"):
+        parse_shard("2")
+    with pytest.raises(ValueError, match="between 1 and 4"):
+        parse_shard("0/4")
+
+def test_shard_time_range_splits_at_chunk_boundaries(write_wav):
+    wav_path = write_wav("talk.wav", 10.5, sample_rate=1000)
+    # 6 chunks of 2s; the last shard runs to the end of the recording
+    assert [shard_time_range(wav_path, (index, 3), 2) for index in (1, 2, 3)] == [(0, 4), (4, 8), (8, None)]
+    assert [shard_time_range(wav_path, (index, 4), 2) for index in (1, 2, 3, 4)] == [(0, 2), (2, 6), (6, 8), (8, None)]
+
+def test_shard_time_range_within_start_and_end_time(write_wav):
+    wav_path = write_wav("talk.wav", 20, sample_rate=1000)
+    assert shard_time_range(wav_path, (1, 2), 2, start_time=3, end_time=12.5) == (3, 7)
+    assert shard_time_range(wav_path, (2, 2), 2, start_time=3, end_time=12.5) == (7, 12.5)
+
+def test_shard_time_range_more_shards_than_chunks(write_wav, caplog):
+    wav_path = write_wav("talk.wav", 3, sample_rate=1000)
+    with caplog.at_level(logging.WARNING):
+        assert shard_time_range(wav_path, (1, 4), 2) == (0, 0)
+    assert "Shard 1/4 has no chunks" in caplog.text
+
+def test_merge_shards_renumbers_srt_cues(tmp_path):
+    first = _write_journal(tmp_path / "part1.jsonl", [_chunk(0, 60, "one"), _chunk(60, 120, "two")], [0, 120000])
+    second = _write_journal(tmp_path / "part2.jsonl", [_chunk(120, 180, "three")], [120000, None])
+    output = str(tmp_path / "talk.srt")
+
+    # Shards may be given in any order
+    chunks = merge_shards([second, first], output, ["srt", "vtt"])
+
+    assert [chunk["text"] for chunk in chunks] == ["one", "two", "three"]
+    with open(tmp_path / "talk.srt") as f:
+        assert f.read() == format_transcription(chunks, "srt")
+    with open(tmp_path / "talk.vtt") as f:
+        vtt = f.read()
+    assert vtt.count("WEBVTT") == 1
+    assert "00:02:00.000 --> 00:03:00.000\nthree" in vtt
+
+def test_merge_shards_from_subtitle_and_json_outputs(tmp_path):
+    (tmp_path / "part1.srt").write_text(format_transcription([_chunk(0, 1.5, "one"), _chunk(1.5, 3, "two")], "srt"))
+    (tmp_path / "part2.vtt").write_text("WEBVTT\n\n00:03.000 --> 00:04.250\nthree\nlines\n")
+    (tmp_path / "part3.json").write_text(format_transcription([_chunk(5, 6, "four")], "json"))
+    output = str(tmp_path / "talk.srt")
+
+    merge_shards([str(tmp_path / name) for name in ("part3.json", "part2.vtt", "part1.srt")], output, "srt")
+
+    with open(output) as f:
+        assert f.read() == ("1\n00:00:00,000 --> 00:00:01,500\none\n\n2\n00:00:01,500 --> 00:00:03,000\ntwo\n\n"
+                            "3\n00:00:03,000 --> 00:00:04,250\nthree\nlines\n\n4\n00:00:05,000 --> 00:00:06,000\nfour\n")
+
+def test_merge_shards_keeps_overlapping_chunk_once(tmp_path):
+    first = _write_journal(tmp_path / "part1.jsonl", [_chunk(0, 60, "one")], None)
+    (tmp_path / "part1.jsonl.json").write_text(format_transcription([_chunk(0, 60, "one")], "json"))
+    chunks = merge_shards([first, str(tmp_path / "part1.jsonl.json")], str(tmp_path / "talk.txt"))
+    assert len(chunks) == 1
+
+def test_merge_shards_refuses_journals_of_other_inputs(tmp_path):
+    first = _write_journal(tmp_path / "part1.jsonl", [_chunk(0, 60, "one")], [0, 60000], input_hash="abc")
+    second = _write_journal(tmp_path / "part2.jsonl", [_chunk(60, 120, "two")], [60000, None], input_hash="def")
+    with pytest.raises(ValueError, match="different inputs"):
+        merge_shards([first, second], str(tmp_path / "talk.txt"))
+
+def test_read_shard_refuses_plain_text(tmp_path):
+    path = tmp_path / "part1.txt"
+    path.write_text("no timings here")
+    with pytest.raises(ValueError, match="plain text has no timings"):
+        read_shard(str(path))
+
+def test_read_shard_warns_about_unfinished_journal(tmp_path, caplog):
+    path = _write_journal(tmp_path / "part1.jsonl", [_chunk(0, 60, "one")], [0, 180000])
+    with caplog.at_level(logging.WARNING):
+        assert read_shard(path) == [_chunk(0, 60, "one")]
+    assert "stops at 60s of its range ending at 180s" in caplog.text
+
+def test_read_shard_jsonl_keeps_word_timings(tmp_path):
+    segment = {"start": 0.0, "end": 1.0, "text": "hi", "words": [{"start": 0.0, "end": 0.4, "word": "hi"}], "status": "ok"}
+    path = tmp_path / "part1.jsonl"
+    path.write_text(json.dumps(segment) + "\n")
+    chunk = read_shard(str(path))[0]
+    assert chunk["segments"][0]["words"] == segment["words"]
+    assert format_transcription([chunk], "jsonl") == json.dumps(segment) + "\n"
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules only the faster-whisper engine needs; importing them costs hundreds of milliseconds
+WHISPER_MODULES = {"faster_whisper", "ctranslate2", "av"}
+# Generous wall-clock budgets that still catch an engine import creeping back into startup
+HELP_BUDGET_SECONDS = float(os.environ.get("STARTUP_HELP_BUDGET_SECONDS", "1.5"))
+GOOGLE_IMPORT_BUDGET_SECONDS = float(os.environ.get("STARTUP_GOOGLE_BUDGET_SECONDS", "2.0"))
+
+def _run(args):
+    """Runs a fresh interpreter with -X importtime; returns (seconds, imported module names)."""
+    start = time.monotonic()
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    elapsed = time.monotonic() - start
+    modules = {line.rsplit("|", 1)[1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+    return elapsed, modules
+
+def _best_of(runs, args):
+    timings = []
+    for _ in range(runs):
+        elapsed, modules = _run(args)
+        timings.append(elapsed)
+    return min(timings), modules
+
+def test_help_does_not_import_engines():
+    elapsed, modules = _best_of(3, ["main.py", "--help"])
+    assert not modules & WHISPER_MODULES
+    assert "speech_recognition" not in modules
+    assert elapsed < HELP_BUDGET_SECONDS
+
+def test_google_path_does_not_import_faster_whisper():
+    code = "import main, engines; engines.get_engine('google')"
+    elapsed, modules = _best_of(3, ["-c", code])
+    assert "speech_recognition" in modules
+    assert not modules & WHISPER_MODULES
+    assert elapsed < GOOGLE_IMPORT_BUDGET_SECONDS
+
+def test_faster_whisper_is_imported_on_first_use():
+    _, modules = _run(["-c", "import engines; engines.get_engine('faster-whisper')"])
+    assert "faster_whisper" in modules
@@ -1,34 +1,80 @@
 import pytest
+import io
 import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 from unittest.mock import patch, mock_open, MagicMock, ANY
-from transcriber import transcribe_audio_in_chunks, get_audio_duration, load_faster_whisper_model
+import transcriber
+import whisper_engine
+from transcriber import (EngineOptions, OutputOptions, SegmentationOptions, transcribe_audio_in_chunks, get_audio_duration,
+                         load_faster_whisper_model)
+from retry import RetryPolicy
+from chunk_reader import PcmStreamChunkReader
+from transcription_cache import TranscriptionCache
+from progress_journal import load_progress
+from metrics import Metrics
 from pydub import AudioSegment
 import speech_recognition as sr
 import json
+import multiprocessing
+import threading
+import time
+import zlib
+import numpy as np
+
+def _whisper_segment(text, start=0.0, end=1.0, words=None):
+    """Stand-in for a faster_whisper Segment."""
+    return SimpleNamespace(text=f" {text}", start=start, end=end, avg_logprob=-0.25, words=words)
+
+@pytest.fixture
+def google_stub_server():
+    """Local stand-in for the Google speech endpoint that answers after a fixed latency."""
+    class StubHandler(BaseHTTPRequestHandler):
+        latency = 0.2
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(self.latency)
+            # Echo a digest of the payload so each chunk gets a distinct transcript
+            response = json.dumps({"result": [{"alternative": [{"transcript": f"chunk {zlib.crc32(body):08x}"}], "final": True}], "result_index": 0})
+            payload = ('{"result":[]}\n' + response + "\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/speech-api/v2/recognize"
+    server.shutdown()
+    server.server_close()
 
 @pytest.fixture
-def create_dummy_wav_file(tmp_path):
-    def _create_dummy_wav_file(filename, duration_ms=1000, content="dummy content"):
-        file_path = tmp_path / filename
-        # Create a minimal valid WAV file header + dummy data
-        # This is a very basic header for a 1-second, 16-bit, mono, 44.1kHz WAV
-        header = b'RIFF' + (36 + len(content)).to_bytes(4, 'little') + \
-                 b'WAVEfmt ' + (16).to_bytes(4, 'little') + \
-                 (1).to_bytes(2, 'little') + (1).to_bytes(2, 'little') + \
-                 (44100).to_bytes(4, 'little') + (44100 * 2).to_bytes(4, 'little') + \
-                 (2).to_bytes(2, 'little') + (16).to_bytes(2, 'little') + \
-                 b'data' + (len(content)).to_bytes(4, 'little')
-        file_path.write_bytes(header + content.encode())
-        return str(file_path)
+def create_noise_wav_file(write_wav):
+    def _create_noise_wav_file(filename, seconds, sample_rate=8000):
+        # Noise amplitude doubles every second, so no two 1-second chunks are alike
+        rng = np.random.default_rng(0)
+        frames = np.concatenate([rng.integers(-2 ** (s + 4), 2 ** (s + 4), sample_rate) for s in range(seconds)])
+        return write_wav(filename, sample_rate=sample_rate, frames=frames)
+    return _create_noise_wav_file
+
+@pytest.fixture
+def create_dummy_wav_file(write_wav):
+    def _create_dummy_wav_file(filename, duration_ms=1000, sample_rate=8000):
+        # duration_ms of 16-bit mono silence, so the header and frame count are real
+        return write_wav(filename, seconds=duration_ms / 1000, sample_rate=sample_rate)
     return _create_dummy_wav_file
 
-@patch('speech_recognition.Recognizer.recognize_google', return_value="hello world")
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_success(mock_from_wav, mock_recognize_google, create_dummy_wav_file, tmp_path):
+@patch('google_engine.recognize', return_value="hello world")
+def test_transcribe_audio_in_chunks_success(mock_recognize, create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("test.wav", duration_ms=120000) # 2 minutes
-    mock_from_wav.return_value = AudioSegment.silent(duration=120000) # Mock 2 minutes of audio
 
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google", temp_dir=tmp_path)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google")
 
     assert chunks is not None
     assert len(chunks) == 2
@@ -38,46 +84,40 @@ def test_transcribe_audio_in_chunks_success(mock_from_wav, mock_recognize_google
     assert chunks[1]["text"] == "hello world"
     assert chunks[1]["start_time"] == 60.0
     assert chunks[1]["end_time"] == 120.0
-    mock_recognize_google.call_count == 2
+    mock_recognize.call_count == 2
 
-@patch('speech_recognition.Recognizer.recognize_google', side_effect=sr.UnknownValueError)
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_unknown_value_error(mock_from_wav, mock_recognize_google, create_dummy_wav_file, tmp_path):
+@patch('google_engine.recognize', side_effect=sr.UnknownValueError)
+def test_transcribe_audio_in_chunks_unknown_value_error(mock_recognize, create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("test.wav", duration_ms=60000)
-    mock_from_wav.return_value = AudioSegment.silent(duration=60000)
 
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google", temp_dir=tmp_path)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google")
 
     assert chunks is not None
     assert len(chunks) == 1
     assert chunks[0]["text"] == "[Unrecognized Audio]"
 
-@patch('speech_recognition.Recognizer.recognize_google', side_effect=sr.RequestError("API Limit Exceeded"))
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_request_error(mock_from_wav, mock_recognize_google, create_dummy_wav_file, tmp_path):
+@patch('google_engine.recognize', side_effect=sr.RequestError("API Limit Exceeded"))
+def test_transcribe_audio_in_chunks_request_error(mock_recognize, create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("test.wav", duration_ms=60000)
-    mock_from_wav.return_value = AudioSegment.silent(duration=60000)
 
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google", temp_dir=tmp_path)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google")
 
     assert chunks is not None
     assert len(chunks) == 1
     assert "[RequestError: API Limit Exceeded]" in chunks[0]["text"]
 
-@patch('pydub.AudioSegment.from_wav', side_effect=FileNotFoundError)
-def test_transcribe_audio_in_chunks_file_not_found(mock_from_wav, tmp_path):
+def test_transcribe_audio_in_chunks_file_not_found(tmp_path):
     with pytest.raises(FileNotFoundError, match="WAV file not found"):
-        transcribe_audio_in_chunks("non_existent.wav", engine="google", temp_dir=tmp_path)
+        transcribe_audio_in_chunks("non_existent.wav", engine="google")
 
-@patch('pydub.AudioSegment.from_wav', side_effect=Exception("Pydub error"))
-def test_transcribe_audio_in_chunks_pydub_error(mock_from_wav, tmp_path):
+def test_transcribe_audio_in_chunks_invalid_wav(tmp_path):
+    invalid_wav = tmp_path / "test.wav"
+    invalid_wav.write_bytes(b"not a wav file")
     with pytest.raises(ValueError, match="Error loading WAV file"):
-        transcribe_audio_in_chunks("test.wav", engine="google", temp_dir=tmp_path)
+        transcribe_audio_in_chunks(str(invalid_wav), engine="google")
 
-@patch('pydub.AudioSegment.from_wav')
-def test_get_audio_duration_success(mock_from_wav, create_dummy_wav_file):
+def test_get_audio_duration_success(create_dummy_wav_file):
     wav_path = create_dummy_wav_file("test.wav", duration_ms=12345)
-    mock_from_wav.return_value = AudioSegment.silent(duration=12345)
     duration = get_audio_duration(wav_path)
     assert duration == 12.345
 
@@ -85,16 +125,15 @@ def test_get_audio_duration_file_not_found():
     duration = get_audio_duration("non_existent.wav")
     assert duration is None
 
-def test_get_audio_duration_error(mocker):
-    mocker.patch('pydub.AudioSegment.from_wav', side_effect=Exception("Error getting duration"))
-    duration = get_audio_duration("test.wav")
+def test_get_audio_duration_error(tmp_path):
+    invalid_wav = tmp_path / "test.wav"
+    invalid_wav.write_bytes(b"not a wav file")
+    duration = get_audio_duration(str(invalid_wav))
     assert duration is None
 
-@patch('speech_recognition.Recognizer.recognize_google', return_value="resumed text")
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_resume(mock_from_wav, mock_recognize_google, create_dummy_wav_file, tmp_path):
+@patch('google_engine.recognize', return_value="resumed text")
+def test_transcribe_audio_in_chunks_resume(mock_recognize, create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("test.wav", duration_ms=180000) # 3 minutes
-    mock_from_wav.return_value = AudioSegment.silent(duration=180000)
     resume_file = tmp_path / "progress.json"
 
     # Simulate a previous run that completed 1 chunk
@@ -111,8 +150,10 @@ def test_transcribe_audio_in_chunks_resume(mock_from_wav, mock_recognize_google,
 
     # Call transcribe_audio_in_chunks with resume parameters
     chunk_duration = 60
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=chunk_duration, language="en-US", 
-                                        start_chunk_index=1, resume_path=str(resume_file), engine="google", temp_dir=tmp_path, existing_chunks=initial_progress["transcribed_chunks"])
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=chunk_duration, language="en-US",
+                                        start_chunk_index=1, engine="google",
+                                        existing_chunks=initial_progress["transcribed_chunks"],
+                                        output=OutputOptions(resume_path=str(resume_file)))
 
     # Expect only the remaining chunks to be transcribed
     assert chunks is not None
@@ -123,47 +164,61 @@ def test_transcribe_audio_in_chunks_resume(mock_from_wav, mock_recognize_google,
     assert chunks[0]["text"] == "first chunk"
     assert chunks[1]["start_time"] == 60.0
     assert chunks[1]["end_time"] == 2 * chunk_duration
-    assert mock_recognize_google.call_count == 2 # Only 2 new calls
+    assert mock_recognize.call_count == 2 # Only 2 new calls
 
-    # Verify progress file was updated
-    with open(resume_file, 'r') as f:
-        updated_progress = json.load(f)
-        assert updated_progress["last_chunk_index"] == 2 # Last chunk index should be 2 (0-indexed)
-        assert len(updated_progress["transcribed_chunks"]) == 3 # Original + 2 new
+    # The old-format progress file is rewritten as a journal holding all three chunks
+    transcribed_chunks, last_chunk_index = load_progress(str(resume_file))
+    assert last_chunk_index == 2 # Last chunk index should be 2 (0-indexed)
+    assert len(transcribed_chunks) == 3 # Original + 2 new
+    assert transcribed_chunks[0]["text"] == "first chunk"
 
-@patch('transcriber.load_faster_whisper_model')
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_faster_whisper_success(mock_from_wav, mock_load_faster_whisper_model, create_dummy_wav_file, tmp_path):
+@patch('whisper_engine.load_model')
+def test_transcribe_audio_in_chunks_faster_whisper_success(mock_load_faster_whisper_model, create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("test.wav", duration_ms=60000)
-    mock_from_wav.return_value = AudioSegment.silent(duration=60000)
     
     mock_model_instance = MagicMock()
     mock_load_faster_whisper_model.return_value = mock_model_instance
-    mock_model_instance.transcribe.return_value = ([MagicMock(text="faster whisper transcription")], MagicMock())
+    mock_model_instance.transcribe.return_value = ([_whisper_segment("faster whisper transcription")], MagicMock())
 
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="faster-whisper", temp_dir=tmp_path)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="faster-whisper")
 
     assert chunks is not None
     assert len(chunks) == 1
     assert chunks[0]["text"] == "faster whisper transcription"
     mock_load_faster_whisper_model.assert_called_once()
-    mock_model_instance.transcribe.assert_called_once_with(ANY, beam_size=5, language="en-US")
+    # Whisper gets its own code for the BCP-47 tag
+    mock_model_instance.transcribe.assert_called_once_with(ANY, beam_size=5, language="en")
+    samples = mock_model_instance.transcribe.call_args[0][0]
+    assert isinstance(samples, np.ndarray)
+    assert samples.dtype == np.float32
+    assert len(samples) == 60 * 16000  # 8 kHz input resampled to Whisper's 16 kHz
+
+@patch('google_engine.recognize', return_value="in memory")
+def test_transcribe_audio_in_chunks_hands_off_pcm_in_memory(mock_recognize, create_dummy_wav_file, tmp_path):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=2000)
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google")
+
+    assert [chunk["text"] for chunk in chunks] == ["in memory", "in memory"]
+    pcm, sample_rate, language = mock_recognize.call_args[0]
+    assert (sample_rate, language) == (8000, "en-US")
+    # The chunk's samples are posted as they are, one second of 16-bit audio
+    with transcriber.WavChunkReader(wav_path, 1) as reader:
+        assert pcm == reader.read_chunk(1)
+    # No per-chunk temporary files are written next to the input
+    assert os.listdir(tmp_path) == ["test.wav"]
 
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_empty_audio(mock_from_wav, create_dummy_wav_file, tmp_path):
+def test_transcribe_audio_in_chunks_empty_audio(create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("empty.wav", duration_ms=0)
-    mock_from_wav.return_value = AudioSegment.empty()
 
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google", temp_dir=tmp_path)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google")
     assert chunks == []
 
-@patch('pydub.AudioSegment.from_wav')
-def test_transcribe_audio_in_chunks_short_audio(mock_from_wav, create_dummy_wav_file, mocker, tmp_path):
+def test_transcribe_audio_in_chunks_short_audio(create_dummy_wav_file, mocker, tmp_path):
     wav_path = create_dummy_wav_file("short.wav", duration_ms=30000) # 30 seconds
-    mock_from_wav.return_value = AudioSegment.silent(duration=30000)
-    mocker.patch('speech_recognition.Recognizer.recognize_google', return_value="short audio")
+    mocker.patch('google_engine.recognize', return_value="short audio")
 
-    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google", temp_dir=tmp_path)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google")
     assert len(chunks) == 1
     assert chunks[0]["text"] == "short audio"
     assert chunks[0]["start_time"] == 0.0
@@ -172,4 +227,366 @@ def test_transcribe_audio_in_chunks_short_audio(mock_from_wav, create_dummy_wav_
 def test_transcribe_audio_in_chunks_unsupported_engine(create_dummy_wav_file, tmp_path):
     wav_path = create_dummy_wav_file("test.wav")
     with pytest.raises(ValueError, match="Unsupported transcription engine: unsupported_engine"):
-        transcribe_audio_in_chunks(wav_path, engine="unsupported_engine", temp_dir=tmp_path)
+        transcribe_audio_in_chunks(wav_path, engine="unsupported_engine")
+
+@patch('google_engine.recognize', return_value="streamed")
+def test_transcribe_audio_in_chunks_from_stream_reader(mock_recognize, tmp_path):
+    reader = PcmStreamChunkReader(io.BytesIO(b"\x00\x00" * 16000 * 3), sample_rate=16000, chunk_duration=2)
+
+    chunks = transcribe_audio_in_chunks(None, chunk_duration=2, language="en-US", engine="google", reader=reader)
+
+    assert [(chunk["start_time"], chunk["end_time"]) for chunk in chunks] == [(0.0, 2.0), (2.0, 3.0)]
+    assert mock_recognize.call_count == 2
+
+def test_transcribe_audio_in_chunks_concurrent_google_against_stub_server(google_stub_server, create_noise_wav_file, tmp_path):
+    wav_path = create_noise_wav_file("noise.wav", seconds=8)
+
+    start = time.monotonic()
+    sequential = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                            engine_options=EngineOptions(google_endpoint=google_stub_server))
+    sequential_time = time.monotonic() - start
+
+    start = time.monotonic()
+    concurrent = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                            engine_options=EngineOptions(concurrency=4, google_endpoint=google_stub_server))
+    concurrent_time = time.monotonic() - start
+
+    assert len(set(chunk["text"] for chunk in sequential)) == 8
+    assert concurrent == sequential
+    # 8 requests at 0.2s each: ~1.6s one at a time, ~0.4s with 4 in flight
+    assert sequential_time / concurrent_time > 2.5
+
+@patch('google_engine.recognize')
+def test_transcribe_audio_in_chunks_concurrent_progress_advances_over_contiguous_prefix(mock_recognize, create_dummy_wav_file, tmp_path):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=6000)
+    calls = iter(range(6))
+
+    def recognize(flac_data, sample_rate, language, **kwargs):
+        index = next(calls)
+        # The first chunk finishes last, after every later chunk has completed
+        time.sleep(0.3 if index == 0 else 0.01)
+        return f"chunk {index}"
+    mock_recognize.side_effect = recognize
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                        engine_options=EngineOptions(concurrency=3),
+                                        output=OutputOptions(resume_path=str(tmp_path / "progress.jsonl")))
+
+    assert [chunk["start_time"] for chunk in chunks] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    # Journal records are appended in completion order, which must be chunk order
+    with open(tmp_path / "progress.jsonl") as f:
+        records = [json.loads(line) for line in f][1:]
+    assert [record["index"] for record in records] == [0, 1, 2, 3, 4, 5]
+
+@patch('google_engine.recognize', return_value="limited")
+def test_transcribe_audio_in_chunks_rate_limit(mock_recognize, create_dummy_wav_file, tmp_path):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=8000)
+
+    start = time.monotonic()
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                        engine_options=EngineOptions(concurrency=4, rate_limit=5))
+
+    assert len(chunks) == 8
+    # Five requests go out as a burst; the remaining three wait for tokens at 5 per second
+    assert time.monotonic() - start >= 0.55
+
+def test_transcribe_audio_in_chunks_invalid_concurrency(create_dummy_wav_file):
+    wav_path = create_dummy_wav_file("test.wav")
+    with pytest.raises(ValueError, match="Concurrency must be at least 1"):
+        transcribe_audio_in_chunks(wav_path, engine="google", engine_options=EngineOptions(concurrency=0))
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="worker processes must inherit the patched WhisperModel")
+@patch('whisper_engine.WhisperModel')
+def test_transcribe_audio_in_chunks_faster_whisper_workers(mock_whisper_model, create_dummy_wav_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(whisper_engine, "FASTER_WHISPER_MODEL", None)
+    mock_whisper_model.return_value.transcribe.side_effect = \
+        lambda samples, beam_size, language: ([_whisper_segment(f"{len(samples)} samples")], None)
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=5500)
+    resume_file = tmp_path / "progress.json"
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en", engine="faster-whisper",
+                                        engine_options=EngineOptions(workers=2, cpu_threads=1),
+                                        output=OutputOptions(resume_path=str(resume_file)))
+
+    assert [chunk["text"] for chunk in chunks] == ["16000 samples"] * 5 + ["8000 samples"]
+    assert [chunk["start_time"] for chunk in chunks] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    assert load_progress(str(resume_file))[1] == 5
+    # The parent process never loads a model of its own
+    assert whisper_engine.FASTER_WHISPER_MODEL is None
+
+@patch('transcriber.ProcessPoolExecutor')
+@patch('os.cpu_count', return_value=32)
+def test_create_executor_splits_cores_between_whisper_workers(mock_cpu_count, mock_process_pool):
+    whisper_options = {"model_size": "base", "compute_type": "int16", "device": "cpu"}
+    executor, max_in_flight = transcriber.create_executor("faster-whisper", concurrency=1, workers=4, cpu_threads=0,
+                                                          whisper_options=whisper_options)
+
+    assert executor is mock_process_pool.return_value
+    assert max_in_flight == 8
+    assert mock_process_pool.call_args[1]["max_workers"] == 4
+    assert mock_process_pool.call_args[1]["initargs"] == ({**whisper_options, "cpu_threads": 8},)
+
+def test_create_executor_serial_by_default():
+    assert transcriber.create_executor("faster-whisper", concurrency=4, workers=1, cpu_threads=0) == (None, 1)
+    assert transcriber.create_executor("google", concurrency=1, workers=4, cpu_threads=0) == (None, 1)
+
+@patch('whisper_engine.WhisperModel')
+def test_load_faster_whisper_model_cpu_threads(mock_whisper_model, monkeypatch):
+    monkeypatch.setattr(whisper_engine, "FASTER_WHISPER_MODEL", None)
+    model = load_faster_whisper_model(cpu_threads=4)
+    assert model is mock_whisper_model.return_value
+    mock_whisper_model.assert_called_once_with("small", device="cpu", compute_type="int8", cpu_threads=4)
+
+@patch('whisper_engine.WhisperModel')
+def test_transcribe_audio_in_chunks_faster_whisper_model_settings(mock_whisper_model, create_dummy_wav_file, monkeypatch):
+    monkeypatch.setattr(whisper_engine, "FASTER_WHISPER_MODEL", None)
+    mock_whisper_model.return_value.transcribe.return_value = ([_whisper_segment("tuned")], None)
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=2000)
+
+    chunks = transcribe_audio_in_chunks(wav_path, language="en", engine="faster-whisper",
+                                        engine_options=EngineOptions(model_size="base", compute_type="int16", device="cpu",
+                                                                     cpu_threads=2))
+
+    assert chunks[0]["text"] == "tuned"
+    mock_whisper_model.assert_called_once_with("base", device="cpu", compute_type="int16", cpu_threads=2)
+
+@patch('google_engine.recognize', return_value="speech")
+def test_transcribe_audio_in_chunks_vad_skips_silent_regions(mock_recognize, write_wav):
+    sample_rate = 8000
+    tone = (0.5 * np.sin(2 * np.pi * 440 * np.arange(2 * sample_rate) / sample_rate) * 32767).astype("<i2")
+    silence = np.zeros(6 * sample_rate, dtype="<i2")
+    wav_path = write_wav("meeting.wav", sample_rate=sample_rate, frames=np.concatenate([tone, silence, tone]))
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="en-US", engine="google",
+                                        segmentation=SegmentationOptions("vad", min_chunk_duration=1))
+
+    assert mock_recognize.call_count == 2
+    assert [chunk["text"] for chunk in chunks] == ["speech", "", "speech"]
+    assert chunks[1]["silent"] is True
+    assert chunks[0]["start_time"] == 0.0
+    assert chunks[-1]["end_time"] == 10.0
+
+def test_transcribe_audio_in_chunks_unsupported_segmentation(create_dummy_wav_file):
+    wav_path = create_dummy_wav_file("test.wav")
+    with pytest.raises(ValueError, match="Unsupported segmentation: words"):
+        transcribe_audio_in_chunks(wav_path, engine="google", segmentation=SegmentationOptions("words"))
+
+def test_transcribe_audio_in_chunks_takes_settings_by_keyword_only(create_dummy_wav_file):
+    wav_path = create_dummy_wav_file("test.wav")
+    # The old fourth positional argument was start_chunk_index
+    with pytest.raises(TypeError, match="positional"):
+        transcribe_audio_in_chunks(wav_path, 60, "en-US", 1)
+
+@pytest.mark.parametrize("keyword, value, replacement", [
+    ("concurrency", 4, r"engine_options=EngineOptions\(concurrency=...\)"),
+    ("retry_delay", 0, r"retry_policy=RetryPolicy\(base_delay=...\)"),
+    ("resume_path", "progress.jsonl", r"output=OutputOptions\(resume_path=...\)"),
+    ("min_silence", 1.0, r"segmentation=SegmentationOptions\(min_silence=...\)"),
+    ("segmentation", "vad", r"SegmentationOptions\(mode='vad'\)"),
+])
+def test_transcribe_audio_in_chunks_explains_moved_keywords(create_dummy_wav_file, keyword, value, replacement):
+    wav_path = create_dummy_wav_file("test.wav")
+    with pytest.raises(TypeError, match=replacement):
+        transcribe_audio_in_chunks(wav_path, engine="google", **{keyword: value})
+
+@patch('google_engine.recognize', return_value="in memory")
+def test_transcribe_audio_in_chunks_still_accepts_temp_dir(mock_recognize, create_dummy_wav_file, tmp_path):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=1000)
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google", temp_dir=tmp_path)
+    assert [chunk["text"] for chunk in chunks] == ["in memory"]
+    assert os.listdir(tmp_path) == ["test.wav"]
+
+@patch('google_engine.recognize', return_value="cached words")
+def test_transcribe_audio_in_chunks_cache_skips_engine_on_rerun(mock_recognize, create_noise_wav_file, tmp_path):
+    wav_path = create_noise_wav_file("noise.wav", seconds=3)
+    with TranscriptionCache(str(tmp_path / "cache.db")) as cache:
+        first = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google", cache=cache)
+        assert mock_recognize.call_count == 3
+        second = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                            cache=cache, engine_options=EngineOptions(concurrency=2))
+        assert mock_recognize.call_count == 3
+        assert second == first
+        assert (cache.hits, cache.misses) == (3, 3)
+        # A different language is a different cache key
+        transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="id-ID", engine="google", cache=cache)
+        assert mock_recognize.call_count == 6
+
+@patch('google_engine.recognize', side_effect=sr.RequestError("API Limit Exceeded"))
+def test_transcribe_audio_in_chunks_cache_ignores_failures(mock_recognize, create_dummy_wav_file, tmp_path):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=1000)
+    with TranscriptionCache(str(tmp_path / "cache.db")) as cache:
+        chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google", cache=cache)
+        assert chunks[0]["status"] == "failed"
+        transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google", cache=cache)
+        assert mock_recognize.call_count == 2
+        assert cache.size_bytes == 0
+
+@patch('google_engine.recognize', side_effect=["one", sr.RequestError("API Limit Exceeded"), "three"])
+def test_transcribe_audio_in_chunks_records_metrics(mock_recognize, create_noise_wav_file, tmp_path):
+    wav_path = create_noise_wav_file("noise.wav", seconds=3)
+    metrics = Metrics("google")
+
+    transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                               output=OutputOptions(resume_path=str(tmp_path / "progress.jsonl"), metrics=metrics))
+
+    summary = metrics.summary()
+    assert summary["chunks"] == {"ok": 2, "failed": 1}
+    assert summary["errors"] == 1
+    assert summary["audio_seconds"] == 3.0
+    assert {stage: stats["count"] for stage, stats in summary["stages"].items()} == \
+        {"extraction": 3, "engine": 3, "progress_write": 3}
+    assert "queue_extract_max_depth" in summary["gauges"]
+
+@patch('whisper_engine.load_model')
+def test_transcribe_audio_in_chunks_keeps_whisper_segments(mock_load_model, create_dummy_wav_file):
+    words = [SimpleNamespace(start=0.5, end=0.9, word=" hello", probability=0.91234),
+             SimpleNamespace(start=1.0, end=1.4, word=" there", probability=0.8)]
+    mock_load_model.return_value.transcribe.return_value = (
+        [_whisper_segment("hello there", 0.5, 1.4, words), _whisper_segment("again", 1.6, 1.9)], None)
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=4000)
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=2, language="en", engine="faster-whisper",
+                                        engine_options=EngineOptions(word_timestamps=True))
+
+    mock_load_model.return_value.transcribe.assert_called_with(ANY, beam_size=5, language="en", word_timestamps=True)
+    assert chunks[1]["text"] == "hello there again"
+    first, second = chunks[1]["segments"]
+    assert (first["start"], first["end"], first["text"]) == (2.5, 3.4, "hello there")
+    assert first["confidence"] == round(np.exp(-0.25), 4)
+    assert first["words"][0] == {"start": 2.5, "end": 2.9, "word": "hello", "probability": 0.9123}
+    assert "words" not in second
+
+@patch('whisper_engine.load_model')
+def test_transcribe_audio_in_chunks_caches_segments_relative_to_chunk(mock_load_model, create_noise_wav_file, tmp_path):
+    mock_load_model.return_value.transcribe.return_value = ([_whisper_segment("noise", 0.2, 0.8)], None)
+    wav_path = create_noise_wav_file("noise.wav", seconds=2)
+    with TranscriptionCache(str(tmp_path / "cache.db")) as cache:
+        first = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en", engine="faster-whisper", cache=cache)
+        second = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en", engine="faster-whisper", cache=cache)
+
+    assert mock_load_model.return_value.transcribe.call_count == 2
+    assert second == first
+    assert second[1]["segments"][0]["start"] == 1.2
+
+@patch('google_engine.recognize', side_effect=[sr.RequestError("busy"), "recovered"])
+def test_transcribe_audio_in_chunks_retries_request_errors(mock_recognize, create_dummy_wav_file):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=1000)
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                        retry_policy=RetryPolicy(retries=2, base_delay=0))
+
+    assert chunks == [{"text": "recovered", "start_time": 0.0, "end_time": 1.0, "status": "ok", "attempts": 2}]
+
+@patch('google_engine.recognize', side_effect=sr.RequestError("quota"))
+def test_transcribe_audio_in_chunks_records_attempts_of_failed_chunk(mock_recognize, create_dummy_wav_file):
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=1000)
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                        retry_policy=RetryPolicy(retries=2, base_delay=0))
+
+    assert chunks[0]["status"] == "failed"
+    assert chunks[0]["attempts"] == 3
+    assert mock_recognize.call_count == 3
+
+@patch('google_engine.recognize')
+def test_transcribe_audio_in_chunks_does_not_retry_rejected_requests(mock_recognize, create_dummy_wav_file):
+    from google_engine import RequestRejected
+    mock_recognize.side_effect = RequestRejected("recognition request failed: Forbidden (HTTP 403)")
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=1000)
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                        retry_policy=RetryPolicy(retries=2, base_delay=0))
+
+    assert chunks[0]["status"] == "failed"
+    assert "HTTP 403" in chunks[0]["text"]
+    assert "attempts" not in chunks[0]
+    assert mock_recognize.call_count == 1
+
+@patch('google_engine.recognize')
+def test_transcribe_audio_in_chunks_retry_failed_only_redoes_failed_chunks(mock_recognize, create_noise_wav_file, tmp_path):
+    wav_path = create_noise_wav_file("noise.wav", seconds=4)
+    resume_file = str(tmp_path / "progress.jsonl")
+    mock_recognize.side_effect = ["one", sr.RequestError("quota"), "three", sr.RequestError("quota")]
+    transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                               output=OutputOptions(resume_path=resume_file))
+
+    chunks, last_chunk_index = load_progress(resume_file)
+    mock_recognize.side_effect = ["two", "four"]
+    mock_recognize.reset_mock()
+    retried = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="en-US", engine="google",
+                                         existing_chunks=chunks, start_chunk_index=last_chunk_index + 1,
+                                         retry_failed=True, output=OutputOptions(resume_path=resume_file))
+
+    assert [chunk["text"] for chunk in retried] == ["one", "two", "three", "four"]
+    assert all(chunk["status"] == "ok" for chunk in retried)
+    assert mock_recognize.call_count == 2
+    # The second chunk's audio is sent again, not the first one's
+    with transcriber.WavChunkReader(wav_path, 1) as reader:
+        assert mock_recognize.call_args_list[0][0][0] == reader.read_chunk(1)
+    assert load_progress(resume_file)[0] == retried
+
+def _language_detecting_model(language="id"):
+    """Mock WhisperModel whose transcribe() detects `language` when none is given."""
+    model = MagicMock()
+    def transcribe(samples, beam_size, language=None):
+        if language is None:
+            return iter(()), SimpleNamespace(language=detected, language_probability=0.97)
+        return [_whisper_segment(f"{language}: {len(samples)} samples")], None
+    detected = language
+    model.transcribe.side_effect = transcribe
+    return model
+
+@patch('whisper_engine.load_model')
+def test_transcribe_audio_in_chunks_detects_language_once(mock_load_model, create_dummy_wav_file, tmp_path):
+    mock_load_model.return_value = _language_detecting_model("id")
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=3000)
+    resume_path = str(tmp_path / "progress.jsonl")
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="auto", engine="faster-whisper",
+                                        engine_options=EngineOptions(language_detection_seconds=2),
+                                        output=OutputOptions(resume_path=resume_path))
+
+    calls = mock_load_model.return_value.transcribe.call_args_list
+    # One detection pass over the first 2 seconds, then every chunk decodes with the pinned language
+    assert len(calls[0][0][0]) == 2 * 16000 and "language" not in calls[0][1]
+    assert [call[1]["language"] for call in calls[1:]] == ["id"] * 3
+    assert [chunk["text"] for chunk in chunks] == ["id: 16000 samples"] * 3
+    with open(resume_path) as f:
+        header = json.loads(f.readline())
+    assert (header["language"], header["detected_language"]) == ("auto", "id")
+
+@patch('whisper_engine.load_model')
+def test_transcribe_audio_in_chunks_resume_keeps_detected_language(mock_load_model, create_dummy_wav_file, tmp_path):
+    mock_load_model.return_value = _language_detecting_model("en")
+    wav_path = create_dummy_wav_file("test.wav", duration_ms=2000)
+    resume_path = str(tmp_path / "progress.jsonl")
+    first = {"text": "satu", "start_time": 0.0, "end_time": 1.0, "status": "ok"}
+    header = {**transcriber.make_header(None, 1, "faster-whisper", "auto"), "detected_language": "ms"}
+    with transcriber.ProgressJournal(resume_path, header, [first], 1):
+        pass
+
+    chunks = transcribe_audio_in_chunks(wav_path, chunk_duration=1, language="auto", engine="faster-whisper",
+                                        existing_chunks=[first], start_chunk_index=1,
+                                        output=OutputOptions(resume_path=resume_path))
+
+    assert [call[1]["language"] for call in mock_load_model.return_value.transcribe.call_args_list] == ["ms"]
+    assert chunks[1]["text"] == "ms: 16000 samples"
+    chunks, last_index = load_progress(resume_path)
+    assert last_index == 1 and len(chunks) == 2
+
+def test_transcribe_audio_in_chunks_auto_language_needs_detecting_engine(create_dummy_wav_file):
+    wav_path = create_dummy_wav_file("test.wav")
+    with pytest.raises(ValueError, match="google engine cannot detect the language"):
+        transcribe_audio_in_chunks(wav_path, language="auto", engine="google")
+
+@pytest.mark.parametrize("language, whisper_code, google_code", [
+    ("id-ID", "id", "id-ID"),
+    ("en_US", "en", "en-US"),
+    ("zh-Hant-TW", "zh", "zh-Hant-TW"),
+    ("iw-IL", "he", "iw-IL"),
+    ("EN", "en", "EN"),
+])
+def test_engines_normalize_language_codes(language, whisper_code, google_code):
+    import google_engine
+    assert whisper_engine.normalize_language(language) == whisper_code
+    assert google_engine.normalize_language(language) == google_code
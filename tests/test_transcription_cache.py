@@ -0,0 +1,67 @@
+import pytest
+import sqlite3
+from transcription_cache import TranscriptionCache, ROW_OVERHEAD_BYTES
+
+def test_cache_miss_then_hit(tmp_path):
+    with TranscriptionCache(str(tmp_path / "cache.db")) as cache:
+        key = cache.make_key(b"\x01\x02", {"engine": "google", "language": "en-US"})
+        assert cache.get(key) is None
+        cache.put(key, "hello")
+        assert cache.get(key) == "hello"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+def test_cache_key_depends_on_audio_and_settings():
+    settings = {"engine": "faster-whisper", "language": "en", "beam_size": 5}
+    key = TranscriptionCache.make_key(b"audio", settings)
+    assert key == TranscriptionCache.make_key(b"audio", dict(reversed(list(settings.items()))))
+    assert key != TranscriptionCache.make_key(b"other audio", settings)
+    assert key != TranscriptionCache.make_key(b"audio", {**settings, "language": "id"})
+
+def test_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with TranscriptionCache(path) as cache:
+        cache.put("key", "stored text")
+    with TranscriptionCache(path) as cache:
+        assert cache.get("key") == "stored text"
+        assert cache.size_bytes == len("key") + len("stored text") + ROW_OVERHEAD_BYTES
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    entry_size = len("key0") + len("x" * 100) + ROW_OVERHEAD_BYTES
+    with TranscriptionCache(str(tmp_path / "cache.db"), max_size_bytes=entry_size * 3) as cache:
+        for i in range(3):
+            cache.put(f"key{i}", "x" * 100)
+        # Touch key0 so key1 becomes the least recently used entry
+        assert cache.get("key0") is not None
+        cache.put("key3", "x" * 100)
+
+        assert cache.get("key1") is None
+        assert cache.get("key0") is not None
+        assert cache.get("key3") is not None
+        assert cache.size_bytes <= entry_size * 3
+
+def test_cache_invalid_path(tmp_path):
+    with pytest.raises(ValueError, match="Could not open transcription cache"):
+        TranscriptionCache(str(tmp_path / "missing_dir" / "cache.db"))
+
+def test_cache_stores_segments(tmp_path):
+    segments = [{"start": 0.0, "end": 1.5, "text": "hello", "confidence": 0.9}]
+    with TranscriptionCache(str(tmp_path / "cache.db")) as cache:
+        cache.put("with", "hello", segments)
+        cache.put("without", "world")
+        assert cache.lookup("with") == ("hello", segments)
+        assert cache.lookup("without") == ("world", None)
+        assert cache.lookup("missing") is None
+
+def test_cache_adds_segments_column_to_old_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE transcriptions (key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                       "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+    connection.execute("INSERT INTO transcriptions VALUES ('old', 'kept', 10, 0)")
+    connection.commit()
+    connection.close()
+
+    with TranscriptionCache(path) as cache:
+        assert cache.lookup("old") == ("kept", None)
+        cache.put("new", "text", [])
+        assert cache.lookup("new") == ("text", [])
@@ -0,0 +1,81 @@
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+import numpy as np
+import tuning
+from tuning import (host_key, load_profile, resolve_whisper_settings, run_tuning, save_profile, select_best,
+                    synthetic_clip, word_error_rate)
+
+def test_host_key_reflects_vector_extensions():
+    assert "-avx512-" in host_key({"avx2", "avx512f", "fma"})
+    assert "-avx2-" in host_key({"avx2", "fma"})
+    assert "-baseline-" in host_key(set())
+
+def test_synthetic_clip_is_normalised_float32():
+    clip = synthetic_clip(seconds=2)
+    assert clip.dtype == np.float32
+    assert len(clip) == 32000
+    assert 0.1 < np.max(np.abs(clip)) <= 0.5
+
+def test_word_error_rate():
+    assert word_error_rate("the quick brown fox", "The quick brown fox.") == 0.0
+    assert word_error_rate("the quick brown fox", "the quick fox") == 0.25
+    assert word_error_rate("the quick brown fox", "a quick brown dog jumps") == 0.75
+
+@patch('tuning.supported_compute_types', return_value={"int8", "float32"})
+@patch('whisper_engine.WhisperModel')
+def test_run_tuning_benchmarks_every_supported_configuration(mock_whisper_model, mock_supported):
+    mock_whisper_model.return_value.transcribe.return_value = ([SimpleNamespace(text="hello world")], None)
+
+    results = run_tuning(synthetic_clip(seconds=1), ["tiny", "base"], ["int8", "int16", "float32"], [1, 2],
+                         reference="hello there world")
+
+    assert len(results) == 8  # int16 is skipped as unsupported
+    assert {result["compute_type"] for result in results} == {"int8", "float32"}
+    assert all(result["wer"] == pytest.approx(1 / 3) for result in results)
+    mock_whisper_model.assert_any_call("base", device="cpu", compute_type="float32", cpu_threads=2)
+
+@patch('tuning.supported_compute_types', return_value=None)
+@patch('whisper_engine.WhisperModel', side_effect=RuntimeError("model not found"))
+def test_run_tuning_records_failed_configurations(mock_whisper_model, mock_supported):
+    results = run_tuning(synthetic_clip(seconds=1), ["tiny"], ["int8"], [1])
+    assert results == [{"model_size": "tiny", "compute_type": "int8", "device": "cpu", "cpu_threads": 1,
+                        "error": "model not found"}]
+    assert select_best(results) is None
+
+def test_select_best_picks_fastest_within_targets():
+    results = [
+        {"model_size": "tiny", "compute_type": "int8", "cpu_threads": 4, "rtf": 0.05, "wer": 0.40},
+        {"model_size": "base", "compute_type": "int8", "cpu_threads": 4, "rtf": 0.10, "wer": 0.20},
+        {"model_size": "small", "compute_type": "int8", "cpu_threads": 4, "rtf": 0.30, "wer": 0.10},
+        {"model_size": "small", "compute_type": "float32", "error": "unsupported"},
+    ]
+    assert select_best(results, max_wer=0.3)["model_size"] == "base"
+    assert select_best(results, max_wer=0.15)["model_size"] == "small"
+    assert select_best(results, max_rtf=0.2, max_wer=0.15) is None
+
+def test_profile_round_trip_keeps_other_hosts(tmp_path):
+    path = str(tmp_path / "profiles" / "whisper_profile.json")
+    result = {"model_size": "base", "compute_type": "int8", "device": "cpu", "cpu_threads": 8, "rtf": 0.1}
+    save_profile(path, result, host="x86_64-avx2-8cpu")
+    save_profile(path, {**result, "cpu_threads": 16}, host="x86_64-avx512-16cpu")
+
+    assert load_profile(path, host="x86_64-avx2-8cpu")["cpu_threads"] == 8
+    assert load_profile(path, host="x86_64-avx512-16cpu")["cpu_threads"] == 16
+    assert load_profile(path, host="aarch64-baseline-4cpu") is None
+    with open(path) as f:
+        assert len(json.load(f)["hosts"]) == 2
+
+def test_resolve_whisper_settings_prefers_explicit_then_profile(tmp_path):
+    path = str(tmp_path / "whisper_profile.json")
+    save_profile(path, {"model_size": "base", "compute_type": "int16", "device": "cpu", "cpu_threads": 6, "rtf": 0.1})
+
+    assert resolve_whisper_settings(profile_path=path) == \
+        {"model_size": "base", "compute_type": "int16", "device": "cpu", "cpu_threads": 6}
+    assert resolve_whisper_settings(compute_type="float32", cpu_threads=2, profile_path=path) == \
+        {"model_size": "base", "compute_type": "float32", "device": "cpu", "cpu_threads": 2}
+    # The tuned thread count was measured for one process
+    assert resolve_whisper_settings(workers=4, profile_path=path)["cpu_threads"] == 0
+    assert resolve_whisper_settings(profile_path=str(tmp_path / "missing.json")) == \
+        {"model_size": "small", "compute_type": "int8", "device": "cpu", "cpu_threads": 0}
@@ -1,132 +1,544 @@
-import speech_recognition as sr
-from pydub import AudioSegment
 from tqdm import tqdm
 
-from faster_whisper import WhisperModel
-
-import tempfile
-import os
-import json
 import logging
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
 
+from chunk_reader import WavChunkReader, MS_PER_SECOND
+from engines import AUTO_LANGUAGE, EngineRejectedError, EngineRequestError, UnrecognizedAudioError, get_engine
+from rate_limiter import TokenBucket
+from retry import RetryPolicy
+from pipeline import ChunkPipeline
+from progress_journal import ProgressJournal, make_header, read_header, segmentation_settings, DEFAULT_FSYNC_EVERY
 
 
 logger = logging.getLogger(__name__)
 
 
-FASTER_WHISPER_MODEL = None
+# Audio from the start of the range that --language auto detects the language on
+DEFAULT_LANGUAGE_DETECTION_SECONDS = 30
+
+
+def whisper_options(model_size=None, compute_type=None, device=None, cpu_threads=None):
+    """
+    Returns the faster-whisper load_model arguments that were given; settings
+    left as None fall back to the defaults defined in whisper_engine.
+    """
+    options = {"model_size": model_size, "compute_type": compute_type, "device": device, "cpu_threads": cpu_threads}
+    return {name: value for name, value in options.items() if value is not None}
+
+def load_faster_whisper_model(model_size=None, cpu_threads=0, compute_type=None, device=None):
+    """Loads (once per process) and returns the faster-whisper model."""
+    return get_engine("faster-whisper").load_model(**whisper_options(model_size, compute_type, device, cpu_threads))
+
+def _init_whisper_worker(whisper_options):
+    """Process pool initializer: loads the model once per worker process."""
+    load_faster_whisper_model(**whisper_options)
+
+def _shift_segments(segments, offset):
+    """Moves chunk-relative segment (and word) times onto the timeline of the whole recording."""
+    shifted = []
+    for segment in segments:
+        segment = {**segment, "start": round(segment["start"] + offset, 3), "end": round(segment["end"] + offset, 3)}
+        if "words" in segment:
+            segment["words"] = [{**word, "start": round(word["start"] + offset, 3), "end": round(word["end"] + offset, 3)}
+                                for word in segment["words"]]
+        shifted.append(segment)
+    return shifted
+
+def _make_chunk(text, start_ms, end_ms, status, segments=None, attempts=1):
+    chunk = {
+        "text": text,
+        "start_time": start_ms / 1000.0,  # Convert to seconds
+        "end_time": end_ms / 1000.0,      # Convert to seconds
+        "status": status
+    }
+    if segments:
+        chunk["segments"] = _shift_segments(segments, chunk["start_time"])
+    if attempts > 1:
+        chunk["attempts"] = attempts
+    return chunk
+
+def _transcribe_chunk(engine, audio_format, pcm, start_ms, end_ms, language, engine_options=None, retry_policy=None):
+    """
+    Runs one chunk through the engine and returns its result dictionary.
+    audio_format is (sample_rate, sample_width, channels) of the raw pcm, and
+    engine_options are passed to the engine module's transcribe().
+    Engine errors are recorded in the chunk text rather than raised, and the
+    chunk's 'status' is "ok", "unrecognized" or "failed". Segments reported by
+    the engine are kept under 'segments', with times relative to the recording.
+    With a retry_policy, request errors are retried with backoff; chunks that
+    needed more than one call record the number under 'attempts'. Requests
+    the engine rejected are not retried.
+    """
+    if pcm is None:
+        # Silent segment from the silence-aware segmenter: keep its timestamps, skip the engine
+        return {"text": "", "start_time": start_ms / 1000.0, "end_time": end_ms / 1000.0, "status": "ok", "silent": True}
+    status = "ok"
+    segments = None
+    attempts = 1
+    policy = retry_policy or RetryPolicy(retries=0)
+    try:
+        # Only request errors are worth retrying; anything else would fail the same way again
+        result, attempts = policy.call(get_engine(engine).transcribe, pcm, audio_format, language,
+                                       retry_on=(EngineRequestError,), **(engine_options or {}))
+        text, segments = result["text"], result.get("segments")
+    except UnrecognizedAudioError:
+        text = "[Unrecognized Audio]"
+        status = "unrecognized"
+    except EngineRequestError as e:
+        text = f"[RequestError: {e}]"
+        status = "failed"
+        attempts = getattr(e, "attempts", attempts)
+    except EngineRejectedError as e:
+        text = f"[RequestError: {e}]"
+        status = "failed"
+    except Exception as e:
+        text = f"[Error during chunk transcription: {e}]"
+        status = "failed"
+    return _make_chunk(text, start_ms, end_ms, status, segments, attempts)
+
+def _timed_transcribe_chunk(*args):
+    """Runs _transcribe_chunk and returns (chunk, seconds spent in the engine)."""
+    started = time.perf_counter()
+    chunk = _transcribe_chunk(*args)
+    return chunk, time.perf_counter() - started
+
+def _timed_chunks(chunks, metrics):
+    """Passes chunks through, recording how long each took to read under the 'extraction' stage."""
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        metrics.observe("extraction", time.perf_counter() - started)
+        yield chunk
+
+def _retry_then_continue(reader, chunks, retry_indexes, remaining):
+    """Yields the failed chunks at retry_indexes again, read by their stored times, then the remaining chunks."""
+    for index in retry_indexes:
+        start_ms = round(chunks[index]["start_time"] * MS_PER_SECOND)
+        end_ms = round(chunks[index]["end_time"] * MS_PER_SECOND)
+        yield index, start_ms, end_ms, reader.read_window(start_ms, end_ms)
+    yield from remaining
+
+def _cache_settings(engine, language, audio_format, engine_options):
+    """Everything besides the PCM itself that determines a chunk's transcription."""
+    settings = {"engine": engine, "language": language, "audio_format": list(audio_format)}
+    settings.update(get_engine(engine).cache_settings(**engine_options))
+    return settings
+
+def _detect_language(engine, audio_format, pcm, engine_options=None):
+    """Runs the engine's language detection; module-level so worker processes can run it too."""
+    return get_engine(engine).detect_language(pcm, audio_format, **(engine_options or {}))
+
+def detect_language(engine, reader, seconds=DEFAULT_LANGUAGE_DETECTION_SECONDS, executor=None, engine_options=None):
+    """
+    Detects the spoken language on the first `seconds` of the reader's range
+    and returns the engine's code for it, or None if there is no audio. A
+    stream is peeked at, so its chunks still begin at the start. With a
+    process pool, detection runs in a worker, which already holds the model;
+    otherwise engine_options are passed to the engine.
+    """
+    if not hasattr(get_engine(engine), "detect_language"):
+        raise ValueError(f"The {engine} engine cannot detect the language; give a language code or use faster-whisper.")
+    if hasattr(reader, "read_window"):
+        pcm = reader.read_window(reader.start_ms, reader.start_ms + seconds * MS_PER_SECOND)
+    else:
+        pcm = reader.peek_frames(int(seconds * reader.sample_rate))
+    if not pcm:
+        return None
+    audio_format = (reader.sample_rate, reader.sample_width, reader.channels)
+    if isinstance(executor, ProcessPoolExecutor):
+        language, probability = executor.submit(_detect_language, engine, audio_format, pcm).result()
+    else:
+        language, probability = _detect_language(engine, audio_format, pcm, engine_options)
+    logger.info(f"Detected language '{language}' (probability {probability:.2f}) in the first {seconds:g}s; "
+                "using it for every chunk.")
+    return language
+
+def _completed_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+def create_executor(engine, concurrency, workers, cpu_threads, whisper_options=None):
+    """
+    Returns (executor, max_in_flight) for parallel chunk transcription, or
+    (None, 1) when chunks should be transcribed one at a time. whisper_options
+    (model_size, compute_type, device) configure the faster-whisper workers.
+    """
+    if engine == "faster-whisper" and workers > 1:
+        if not cpu_threads:
+            # Split the cores between the workers instead of letting each one claim all of them
+            cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+        worker_options = {**(whisper_options or {}), "cpu_threads": cpu_threads}
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_whisper_worker, initargs=(worker_options,))
+        # Queue one extra chunk per worker so no process idles between chunks
+        return executor, workers * 2
+    if engine == "google" and concurrency > 1:
+        return ThreadPoolExecutor(max_workers=concurrency), concurrency
+    return None, 1
 
+@dataclass
+class EngineOptions:
+    """
+    How chunks are handed to the engine; settings left as None use the engine's
+    defaults. For google, concurrency > 1 keeps that many requests in flight,
+    rate_limit caps requests per second and google_endpoint overrides the API
+    URL. Requests share keep-alive connections (see google_engine.ConnectionPool):
+    google_pool_size are kept open (default: concurrency; 0 opens one per
+    request), and the google timeouts bound connecting and waiting for a
+    response, in seconds. For faster-whisper, workers > 1 decodes chunks in that
+    many processes, each loading the model once with cpu_threads threads
+    (default: cores / workers); model_size, compute_type and device select the
+    model, and word_timestamps adds per-word timings to its segments.
+    language="auto" is detected on the first language_detection_seconds of audio.
+    """
+    concurrency: int = 1
+    rate_limit: Optional[float] = None
+    google_endpoint: Optional[str] = None
+    google_pool_size: Optional[int] = None
+    google_connect_timeout: Optional[float] = None
+    google_read_timeout: Optional[float] = None
+    workers: int = 1
+    cpu_threads: int = 0
+    model_size: Optional[str] = None
+    compute_type: Optional[str] = None
+    device: Optional[str] = None
+    word_timestamps: bool = False
+    language_detection_seconds: float = DEFAULT_LANGUAGE_DETECTION_SECONDS
 
+    def __post_init__(self):
+        if self.concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1, got {self.concurrency}")
+        if self.workers < 1:
+            raise ValueError(f"Workers must be at least 1, got {self.workers}")
+
+    def whisper_options(self):
+        """The faster-whisper load_model arguments (see whisper_options)."""
+        return whisper_options(self.model_size, self.compute_type, self.device, self.cpu_threads)
+
+@dataclass
+class SegmentationOptions:
+    """
+    Where chunk boundaries go. With mode="vad" they are placed in pauses: chunks
+    are between min_chunk_duration and the chunk duration long, and silent
+    stretches (below silence_threshold dBFS for at least min_silence seconds)
+    are returned as empty chunks marked 'silent' without calling the engine.
+    """
+    mode: str = "fixed"
+    min_chunk_duration: float = 5
+    silence_threshold: float = -40.0
+    min_silence: float = 0.5
 
-def load_faster_whisper_model(model_size="small"):
-    global FASTER_WHISPER_MODEL
-    if FASTER_WHISPER_MODEL is None:
-        # You can specify a model size like "tiny", "base", "small", "medium", "large"
-        # or a specific model path.
-        # The first time you run this, it will download the model.
-        FASTER_WHISPER_MODEL = WhisperModel(model_size, device="cpu", compute_type="int8")
-        logger.info(f"Faster Whisper model '{model_size}' loaded.")
-    return FASTER_WHISPER_MODEL
+    def __post_init__(self):
+        if self.mode not in ["fixed", "vad"]:
+            raise ValueError(f"Unsupported segmentation: {self.mode}")
 
-MS_PER_SECOND = 1000
+    def settings(self):
+        """Describes the segmentation for the progress journal header."""
+        return segmentation_settings(self.mode, self.min_chunk_duration, self.silence_threshold, self.min_silence)
 
-def transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="id-ID", start_chunk_index=0, resume_path=None, temp_dir=None, engine="google", existing_chunks=None):
+@dataclass
+class OutputOptions:
     """
-    Transcribes a WAV file in chunks (to avoid overloading the API).
-    chunk_duration is in seconds. Returns a list of dictionaries, each containing
-    'text', 'start_time', and 'end_time'.
+    Where finished chunks go. Progress is appended to the resume_path journal
+    one record per chunk, fsynced every fsync_every records; journal_header
+    identifies the run (see progress_journal.make_header) and defaults to one
+    without an input hash. on_chunk(chunk) is called for every finished chunk in
+    order, after it has been journaled; main uses it to stream the output as it
+    grows. metrics, a metrics.Metrics, receives per-chunk timings of the
+    extraction, cache_lookup, engine, progress_write and formatting (on_chunk)
+    stages and the chunk counts.
     """
-    recognizer = sr.Recognizer()
+    resume_path: Optional[str] = None
+    journal_header: Optional[dict] = None
+    fsync_every: int = DEFAULT_FSYNC_EVERY
+    on_chunk: Optional[Callable] = None
+    metrics: Optional[object] = None
+
+# Keywords of transcribe_audio_in_chunks that moved into the option objects: (argument, class, field)
+_MOVED_KEYWORDS = {
+    **{name: ("engine_options", "EngineOptions", name) for name in [
+        "concurrency", "rate_limit", "google_endpoint", "google_pool_size", "google_connect_timeout",
+        "google_read_timeout", "workers", "cpu_threads", "model_size", "compute_type", "device", "word_timestamps",
+        "language_detection_seconds"]},
+    **{name: ("segmentation", "SegmentationOptions", name) for name in [
+        "min_chunk_duration", "silence_threshold", "min_silence"]},
+    "retries": ("retry_policy", "RetryPolicy", "retries"),
+    "retry_delay": ("retry_policy", "RetryPolicy", "base_delay"),
+    "retry_max_delay": ("retry_policy", "RetryPolicy", "max_delay"),
+    **{name: ("output", "OutputOptions", name) for name in [
+        "resume_path", "journal_header", "fsync_every", "on_chunk", "metrics"]},
+}
 
+def _check_moved_keywords(keywords, segmentation):
+    """Raises TypeError naming the option object that replaced a keyword of the old signature."""
+    for name in keywords:
+        if name not in _MOVED_KEYWORDS:
+            raise TypeError(f"transcribe_audio_in_chunks() got an unexpected keyword argument '{name}'")
+        argument, class_name, field = _MOVED_KEYWORDS[name]
+        raise TypeError(f"transcribe_audio_in_chunks() no longer takes '{name}'; "
+                        f"pass {argument}={class_name}({field}=...) instead.")
+    if isinstance(segmentation, str):
+        raise TypeError(f"segmentation takes a SegmentationOptions; pass SegmentationOptions(mode={segmentation!r}) instead.")
+
+def transcribe_audio_in_chunks(wav_path, chunk_duration=60, language="id-ID", *, engine="google", engine_options=None,
+                               segmentation=None, retry_policy=None, output=None, cache=None, reader=None, pool=None,
+                               existing_chunks=None, start_chunk_index=0, retry_failed=False, start_ms=0, end_ms=None,
+                               wav_offset_ms=0, temp_dir=None, **moved_keywords):
+    """
+    Transcribes a WAV file in chunks of chunk_duration seconds and returns a
+    list of dictionaries, each containing 'text', 'start_time', and 'end_time'.
+    engine_options, segmentation and output are EngineOptions,
+    SegmentationOptions and OutputOptions; a request that fails is retried by
+    retry_policy (see retry.RetryPolicy; default: no retries).
+    If reader is given (e.g. a PcmStreamChunkReader from
+    audio_converter.open_pcm_stream), chunks are read from it instead of wav_path.
+    Otherwise start_ms and end_ms limit the chunks to that part of the recording,
+    and wav_offset_ms is the recording time at which wav_path begins when only
+    part of the recording was decoded into it (see chunk_reader.WavChunkReader).
+    Chunks of existing_chunks are kept and transcription continues at
+    start_chunk_index; with retry_failed, those whose status is "failed" are
+    transcribed again first and replace their earlier results.
+    pool, the (executor, max_in_flight) pair returned by create_executor, shares
+    one worker pool (and its loaded models) across several files; it is not
+    shut down here. cache is an optional TranscriptionCache checked before every
+    engine call.
+    Reading audio, recognition and writing progress run as pipeline stages
+    (see pipeline.ChunkPipeline), so the next chunk is decoded while the
+    current one is being recognized.
+    language is normalized to the engine's code (see engines.py). With
+    language="auto", it is detected once (see detect_language) and used for
+    every chunk; the detected language is recorded in the progress journal, so
+    a resumed run uses it again instead of detecting it on other audio.
+    Chunks are handed to the engines in memory; temp_dir is accepted for
+    compatibility but no per-chunk files are written. Settings that used to be
+    keywords of their own raise TypeError naming the option object to use.
+    """
+    _check_moved_keywords(moved_keywords, segmentation)
+    engine_options = engine_options or EngineOptions()
+    segmentation = segmentation or SegmentationOptions()
+    retry_policy = retry_policy or RetryPolicy(retries=0)
+    output = output or OutputOptions()
+    resume_path, metrics = output.resume_path, output.metrics
     transcribed_chunks = existing_chunks if existing_chunks is not None else []
 
-    if engine not in ["google", "faster-whisper"]:
-        raise ValueError(f"Unsupported transcription engine: {engine}")
+    # Imports the engine now, so a missing dependency fails before any audio is read
+    engine_module = get_engine(engine)
+    requested_language = language
+    if language != AUTO_LANGUAGE:
+        language = engine_module.normalize_language(language)
+    concurrency, workers = engine_options.concurrency, engine_options.workers
+    word_timestamps = engine_options.word_timestamps
+    if concurrency > 1 and engine != "google":
+        logger.warning(f"Concurrent requests are only supported by the google engine; transcribing '{engine}' chunks one at a time.")
+    if workers > 1 and engine != "faster-whisper":
+        logger.warning(f"Worker processes are only supported by the faster-whisper engine; ignoring --workers for '{engine}'.")
+    if word_timestamps and engine != "faster-whisper":
+        logger.warning(f"Word timestamps are only supported by the faster-whisper engine; ignoring them for '{engine}'.")
+        word_timestamps = False
 
-    try:
-        audio = AudioSegment.from_wav(wav_path)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"WAV file not found: {wav_path}")
-    except Exception as e:
-        raise ValueError(f"Error loading WAV file {wav_path}: {e}")
-
-    total_duration_ms = len(audio)  # Total duration in milliseconds
-    chunk_duration_ms = chunk_duration * MS_PER_SECOND
-
-    # Calculate number of chunks
-    num_chunks = int(total_duration_ms / chunk_duration_ms) + (1 if total_duration_ms % chunk_duration_ms > 0 else 0)
-
-    # Process each chunk for recognition
-    for i in tqdm(range(start_chunk_index, num_chunks), unit="chunk", desc="Transcribing"):
-        start_ms = i * chunk_duration_ms
-        end_ms = min((i + 1) * chunk_duration_ms, total_duration_ms)
-        
-        chunk_audio = audio[start_ms:end_ms]
-        
-        # Export chunk to a temporary WAV file for SpeechRecognition
-        temp_chunk_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False, dir=temp_dir)
-        temp_chunk_path = temp_chunk_file.name
-        temp_chunk_file.close()
-        chunk_audio.export(temp_chunk_path, format="wav")
+    rate_limiter = TokenBucket(engine_options.rate_limit) if engine_options.rate_limit else None
 
+    if reader is None:
+        reader = WavChunkReader(wav_path, chunk_duration, start_ms=start_ms, end_ms=end_ms, offset_ms=wav_offset_ms)
+    retry_indexes = [index for index, chunk in enumerate(transcribed_chunks)
+                     if chunk.get("status") == "failed"] if retry_failed else []
+    if retry_indexes and not hasattr(reader, "read_window"):
+        reader.close()
+        raise ValueError("Retrying failed chunks needs a seekable WAV input and cannot be used with streamed audio.")
+    window_reader = reader
+    if segmentation.mode == "vad":
+        from segmenter import segment_reader
         try:
+            reader = segment_reader(reader, segmentation.min_chunk_duration, chunk_duration,
+                                    segmentation.silence_threshold, segmentation.min_silence)
+        except Exception:
+            reader.close()
+            raise
+    total = max(reader.num_chunks - start_chunk_index, 0) + len(retry_indexes) if reader.num_chunks is not None else None
+    if retry_failed:
+        logger.info(f"Retrying {len(retry_indexes)} failed chunks.")
+    audio_format = (reader.sample_rate, reader.sample_width, reader.channels)
+    owns_executor = pool is None
+    model_options = engine_options.whisper_options()
+    executor, max_in_flight = (create_executor(engine, concurrency, workers, engine_options.cpu_threads, model_options)
+                               if owns_executor else pool)
+    session = None
+    if engine == "google":
+        pool_size = concurrency if engine_options.google_pool_size is None else engine_options.google_pool_size
+        timeouts = {"connect_timeout": engine_options.google_connect_timeout,
+                    "read_timeout": engine_options.google_read_timeout}
+        session = engine_module.ConnectionPool(pool_size, **{name: value for name, value in timeouts.items() if value is not None})
+        call_options = {"endpoint": engine_options.google_endpoint, "rate_limiter": rate_limiter, "session": session}
+    else:
+        call_options = {**model_options, "word_timestamps": word_timestamps}
+    # Worker processes already hold their model; they only need the per-call options
+    worker_options = {"word_timestamps": True} if word_timestamps else None
+
+    detected_language = None
+    if language == AUTO_LANGUAGE:
+        # A resumed run keeps the language detected when the journal was started
+        resumed_header = read_header(resume_path) if resume_path and transcribed_chunks and os.path.exists(resume_path) else None
+        detected_language = resumed_header.get("detected_language") if resumed_header else None
+        if detected_language:
+            logger.info(f"Using language '{detected_language}' detected when the transcription started.")
+        else:
             try:
-                with sr.AudioFile(temp_chunk_path) as chunk_source:
-                    audio_data = recognizer.record(chunk_source)
-                    if engine == "google":
-                        text = recognizer.recognize_google(audio_data, language=language)
-                    elif engine == "faster-whisper":
-                        model = load_faster_whisper_model()
-                        segments, info = model.transcribe(temp_chunk_path, beam_size=5, language=language)
-                        text = " ".join([segment.text for segment in segments])
-                    else:
-                        raise ValueError(f"Unsupported transcription engine: {engine}")
-                    transcribed_chunks.append({
-                        "text": text,
-                        "start_time": start_ms / 1000.0,  # Convert to seconds
-                        "end_time": end_ms / 1000.0       # Convert to seconds
-                    })
-            except sr.UnknownValueError:
-                transcribed_chunks.append({
-                    "text": "[Unrecognized Audio]",
-                    "start_time": start_ms / 1000.0,
-                    "end_time": end_ms / 1000.0
-                })
-            except sr.RequestError as e:
-                transcribed_chunks.append({
-                    "text": f"[RequestError: {e}]",
-                    "start_time": start_ms / 1000.0,
-                    "end_time": end_ms / 1000.0
-                })
-            except Exception as e:
-                transcribed_chunks.append({
-                    "text": f"[Error during chunk transcription: {e}]",
-                    "start_time": start_ms / 1000.0,
-                    "end_time": end_ms / 1000.0
-                })
-        finally:
-            # Clean up temporary chunk file
+                detected_language = detect_language(engine, window_reader, engine_options.language_detection_seconds,
+                                                    executor, model_options if engine == "faster-whisper" else None)
+            except Exception:
+                reader.close()
+                if owns_executor and executor is not None:
+                    executor.shutdown()
+                raise
+        # Without audio to detect on there are no chunks either
+        language = detected_language
+
+    journal = None
+    if resume_path:
+        journal_header = output.journal_header
+        if journal_header is None:
+            journal_header = make_header(None, chunk_duration, engine, requested_language, segmentation.settings())
+        if detected_language:
+            journal_header = {**journal_header, "detected_language": detected_language}
+        try:
+            journal = ProgressJournal(resume_path, journal_header, transcribed_chunks, start_chunk_index, output.fsync_every)
+        except Exception:
+            reader.close()
+            raise
+
+    cache_settings = _cache_settings(engine, language, audio_format, call_options)
+    cache_keys = {}
+
+    def cached_chunk(index, pcm, start_ms, end_ms):
+        """Returns the cached result for a chunk, remembering its key on a miss."""
+        if cache is None or pcm is None:
+            return None
+        started = time.perf_counter()
+        key = cache.make_key(pcm, cache_settings)
+        entry = cache.lookup(key)
+        if metrics is not None:
+            metrics.observe("cache_lookup", time.perf_counter() - started)
+            metrics.increment("cache_hits" if entry is not None else "cache_misses")
+        if entry is None:
+            cache_keys[index] = key
+            return None
+        text, segments = entry
+        status = "unrecognized" if text == "[Unrecognized Audio]" else "ok"
+        return _make_chunk(text, start_ms, end_ms, status, segments)
+
+    def transcribe_chunk(pcm, start_ms, end_ms):
+        return _timed_transcribe_chunk(engine, audio_format, pcm, start_ms, end_ms, language, call_options, retry_policy)
+
+    # Futures resolve to (chunk, engine seconds); engine seconds is None when the engine was not called
+    def submit_chunk(index, pcm, start_ms, end_ms):
+        if pcm is None:
+            return _completed_future((_transcribe_chunk(engine, audio_format, pcm, start_ms, end_ms, language), None))
+        cached = cached_chunk(index, pcm, start_ms, end_ms)
+        if cached is not None:
+            return _completed_future((cached, None))
+        if executor is None:
+            return _completed_future(transcribe_chunk(pcm, start_ms, end_ms))
+        if isinstance(executor, ProcessPoolExecutor):
+            # Worker processes use their own model; pass only picklable arguments
+            return executor.submit(_timed_transcribe_chunk, engine, audio_format, pcm, start_ms, end_ms, language,
+                                   worker_options, retry_policy)
+        return executor.submit(transcribe_chunk, pcm, start_ms, end_ms)
+
+    audio_seconds = 0.0
+    started_at = time.monotonic()
+
+    # Chunks flow through extraction, recognition and writing stages; the reader
+    # seeks straight to start_chunk_index so resumed runs never decode the earlier audio.
+    try:
+        with tqdm(total=total, unit="chunk", desc="Transcribing") as progress_bar:
+            def on_chunk_done(index, result):
+                nonlocal audio_seconds
+                chunk, engine_seconds = result
+                if index < len(transcribed_chunks):
+                    # A retried chunk replaces its failed result
+                    transcribed_chunks[index] = chunk
+                else:
+                    transcribed_chunks.append(chunk)
+                audio_seconds += chunk["end_time"] - chunk["start_time"]
+                key = cache_keys.pop(index, None)
+                # Only definite answers are cached; failed requests are retried on the next run
+                if key is not None and chunk["status"] != "failed":
+                    # Segments are cached relative to the chunk, since the same audio may recur anywhere
+                    segments = _shift_segments(chunk["segments"], -chunk["start_time"]) if "segments" in chunk else None
+                    cache.put(key, chunk["text"], segments)
+                # Record progress after each chunk if resume_path is provided
+                if journal is not None:
+                    write_started = time.perf_counter()
+                    journal.append(index, chunk)
+                    if metrics is not None:
+                        metrics.observe("progress_write", time.perf_counter() - write_started)
+                if output.on_chunk is not None:
+                    output_started = time.perf_counter()
+                    output.on_chunk(chunk)
+                    if metrics is not None:
+                        metrics.observe("formatting", time.perf_counter() - output_started)
+                if metrics is not None:
+                    metrics.record_chunk(chunk)
+                    if chunk.get("attempts", 1) > 1:
+                        metrics.increment("retries", chunk["attempts"] - 1)
+                    if engine_seconds is not None:
+                        metrics.observe("engine", engine_seconds)
+                progress_bar.set_postfix(pipeline.queue_depths(), refresh=False)
+                progress_bar.update(1)
+
+            # Decoded chunks queue up to the number the engine can take at once;
+            # beyond that, extraction waits for recognition to catch up. A chunk is
+            # submitted only when the write queue has room, and the writer holds one
+            # more besides its queue, so max_in_flight stays the cap.
+            chunks = _retry_then_continue(window_reader, transcribed_chunks, retry_indexes,
+                                          reader.iter_chunks(start_chunk_index))
+            if metrics is not None:
+                chunks = _timed_chunks(chunks, metrics)
+            pipeline = ChunkPipeline(chunks, submit_chunk, on_chunk_done,
+                                     extract_queue_size=max_in_flight, write_queue_size=max_in_flight - 1)
             try:
-                if os.path.exists(temp_chunk_path):
-                    os.remove(temp_chunk_path)
-            except Exception as cleanup_error:
-                logger.warning(f"Could not remove temporary file {temp_chunk_path}: {cleanup_error}")
-        # Save progress after each chunk if resume_path is provided
-        if resume_path:
-            progress_data = {
-                'transcribed_chunks': transcribed_chunks,
-                'last_chunk_index': i
-            }
-            with open(resume_path, 'w') as f:
-                json.dump(progress_data, f)
+                pipeline.run()
+            finally:
+                if owns_executor and executor is not None:
+                    executor.shutdown()
+    finally:
+        reader.close()
+        if journal is not None:
+            journal.close()
+        if session is not None:
+            session.close()
+
+    if cache is not None:
+        logger.info(f"Transcription cache: {cache.hits} hits, {cache.misses} misses.")
+    elapsed = time.monotonic() - started_at
+    if audio_seconds and elapsed > 0:
+        logger.info(f"Transcribed {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+                    f"({audio_seconds / elapsed:.2f} audio seconds per wall second).")
+    # A queue that stays full points at the stage it feeds as the bottleneck
+    depths = ", ".join(f"{name} {stats['mean_depth']:.1f} avg / {stats['max_depth']} max of {stats['capacity']}"
+                       for name, stats in pipeline.queue_stats().items())
+    logger.info(f"Pipeline queue depths: {depths}.")
+    if metrics is not None:
+        for name, stats in pipeline.queue_stats().items():
+            metrics.set_gauge(f"queue_{name}_mean_depth", stats["mean_depth"])
+            metrics.set_gauge(f"queue_{name}_max_depth", stats["max_depth"])
     return transcribed_chunks
+
 def get_audio_duration(wav_path):
     """
     Returns the duration of the audio file in seconds.
     """
     try:
-        audio = AudioSegment.from_wav(wav_path)
-        return len(audio) / MS_PER_SECOND
+        with WavChunkReader(wav_path) as reader:
+            return reader.total_duration_ms / MS_PER_SECOND
     except FileNotFoundError:
         logger.warning(f"Audio file not found for duration check: {wav_path}")
         return None
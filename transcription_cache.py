@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE_MB = 512
+# Approximate per-row overhead (key, timestamps, index entries) counted towards the size cap
+ROW_OVERHEAD_BYTES = 128
+# Eviction frees space down to this fraction of the size cap
+EVICTION_TARGET = 0.9
+
+
+class TranscriptionCache:
+    """
+    On-disk cache of chunk transcriptions in SQLite, keyed by a hash of the
+    chunk's PCM together with the engine settings that produced the text.
+    The least recently used entries are evicted once the stored size passes
+    max_size_bytes. hits and misses count lookups made through this instance.
+    """
+
+    def __init__(self, path, max_size_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS transcriptions ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS transcriptions_last_used ON transcriptions (last_used)")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(transcriptions)")]
+            if "segments" not in columns:
+                # Caches created before segments were stored gain the column; their rows keep NULL
+                self._connection.execute("ALTER TABLE transcriptions ADD COLUMN segments TEXT")
+            self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+        except sqlite3.Error as e:
+            raise ValueError(f"Could not open transcription cache '{path}': {e}")
+
+    @staticmethod
+    def make_key(pcm, settings):
+        """Hashes the chunk PCM together with the settings dictionary that affect its transcription."""
+        digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+        digest.update(b"\0")
+        digest.update(pcm)
+        return digest.hexdigest()
+
+    def lookup(self, key):
+        """Returns (text, segments) cached for key, or None on a miss. segments is None if none were stored."""
+        with self._lock:
+            row = self._connection.execute("SELECT text, segments FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute("UPDATE transcriptions SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def get(self, key):
+        """Returns the cached text for key, or None on a miss."""
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key, text, segments=None):
+        segments_json = json.dumps(segments, ensure_ascii=False) if segments is not None else None
+        size = len(key) + len(text.encode("utf-8")) + len((segments_json or "").encode("utf-8")) + ROW_OVERHEAD_BYTES
+        with self._lock:
+            previous = self._connection.execute("SELECT size FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, text, segments, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, text, segments_json, size, time.time())
+            )
+            self._size += size - (previous[0] if previous else 0)
+            if self._size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Deletes least recently used entries until the cache is back under its size
+        cap, leaving some headroom so the next few inserts do not evict again.
+        """
+        target = self.max_size_bytes * EVICTION_TARGET
+        evicted = []
+        cursor = self._connection.execute("SELECT key, size FROM transcriptions ORDER BY last_used, rowid")
+        for key, size in cursor:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        cursor.close()
+        self._connection.executemany("DELETE FROM transcriptions WHERE key = ?", evicted)
+        logger.debug(f"Evicted {len(evicted)} entries from transcription cache '{self.path}'.")
+
+    @property
+    def size_bytes(self):
+        return self._size
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
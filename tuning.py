@@ -0,0 +1,245 @@
+import itertools
+import json
+import logging
+import os
+import platform
+import re
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from chunk_reader import WavChunkReader
+from engines import get_engine
+from pcm import ENGINE_SAMPLE_RATE, pcm_to_float32, resample
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "audio-to-text", "whisper_profile.json")
+PROFILE_VERSION = 1
+# Model sizes compared when a reference transcript lets accuracy be measured
+DEFAULT_TUNE_MODEL_SIZES = ["tiny", "base", "small", "medium"]
+DEFAULT_TUNE_COMPUTE_TYPES = ["int8", "int8_float32", "int16", "float32"]
+SYNTHETIC_CLIP_SECONDS = 30
+# Audio transcribed once before timing so one-time allocations are not measured
+WARMUP_SECONDS = 5
+# CPU extensions that decide which CTranslate2 kernels run, best first
+ISA_LEVELS = [("avx512", "avx512f"), ("avx2", "avx2")]
+
+
+def cpu_flags():
+    """Returns the instruction set flags of the first CPU, or an empty set where they are not exposed."""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def host_key(flags=None):
+    """
+    Names the class of host a tuning result applies to, e.g. "x86_64-avx512-32cpu".
+    Nodes with the same architecture, vector extensions and core count share a profile entry.
+    """
+    flags = cpu_flags() if flags is None else flags
+    isa = next((name for name, flag in ISA_LEVELS if flag in flags), "baseline")
+    return f"{platform.machine() or 'unknown'}-{isa}-{os.cpu_count() or 1}cpu"
+
+
+def synthetic_clip(seconds=SYNTHETIC_CLIP_SECONDS, sample_rate=ENGINE_SAMPLE_RATE, seed=0):
+    """
+    Returns a float32 clip with a speech-like structure: voiced harmonics with
+    a wandering pitch, syllable-rate amplitude modulation, pauses and noise.
+    Its transcript is meaningless, but the model does the same amount of work.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 150 + 50 * np.sin(2 * np.pi * 0.3 * t) + 20 * np.sin(2 * np.pi * 1.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    pauses = (np.sin(2 * np.pi * 0.25 * t) > -0.7).astype(np.float64)
+    clip = 0.3 * voiced * syllables * pauses + 0.01 * rng.standard_normal(len(t))
+    return (clip / np.max(np.abs(clip))).astype(np.float32) * 0.5
+
+
+def load_clip(path):
+    """Reads a WAV clip as 16 kHz mono float32 samples."""
+    with WavChunkReader(path) as reader:
+        pcm = reader.read_window(0, reader.total_duration_ms)
+        return resample(pcm_to_float32(pcm, reader.sample_width, reader.channels), reader.sample_rate)
+
+
+def _words(text):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance between two transcripts, divided by the reference length."""
+    reference_words, hypothesis_words = _words(reference), _words(hypothesis)
+    if not reference_words:
+        return 0.0 if not hypothesis_words else 1.0
+    previous = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, 1):
+        current = [i]
+        for j, hypothesis_word in enumerate(hypothesis_words, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (reference_word != hypothesis_word)))
+        previous = current
+    return previous[-1] / len(reference_words)
+
+
+def default_thread_counts(cores=None):
+    """One thread, half the cores and all of them."""
+    cores = cores or os.cpu_count() or 1
+    return sorted({1, max(1, cores // 2), cores})
+
+
+def supported_compute_types(device):
+    """Returns the compute types CTranslate2 supports on this host, or None if that cannot be queried."""
+    try:
+        import ctranslate2
+        return set(ctranslate2.get_supported_compute_types(device))
+    except Exception as e:
+        logger.debug(f"Could not query supported compute types: {e}")
+        return None
+
+
+def _transcribe_samples(model, samples, language):
+    segments, _ = model.transcribe(samples, beam_size=get_engine("faster-whisper").WHISPER_BEAM_SIZE, language=language)
+    # Segments are generated lazily; joining them runs the decoding
+    return " ".join(segment.text for segment in segments).strip()
+
+
+def benchmark_configuration(samples, model_size, compute_type, cpu_threads, device="cpu", language=None, repeats=1):
+    """
+    Loads one model configuration and times it on samples (16 kHz float32).
+    Returns a result dictionary with the real-time factor ('rtf', processing
+    seconds per audio second; lower is faster) of the best of `repeats` runs.
+    """
+    load_started = time.monotonic()
+    model = get_engine("faster-whisper").WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+    load_seconds = time.monotonic() - load_started
+    _transcribe_samples(model, samples[:WARMUP_SECONDS * ENGINE_SAMPLE_RATE], language)
+
+    timings = []
+    for _ in range(max(1, repeats)):
+        started = time.monotonic()
+        text = _transcribe_samples(model, samples, language)
+        timings.append(time.monotonic() - started)
+    return {
+        "model_size": model_size,
+        "compute_type": compute_type,
+        "device": device,
+        "cpu_threads": cpu_threads,
+        "rtf": min(timings) / (len(samples) / ENGINE_SAMPLE_RATE),
+        "load_seconds": load_seconds,
+        "text": text,
+    }
+
+
+def run_tuning(samples, model_sizes, compute_types, thread_counts, device="cpu", language=None,
+               reference=None, repeats=1):
+    """
+    Benchmarks every combination of model size, compute type and thread count.
+    Configurations that fail to load (an unsupported compute type, a model that
+    cannot be downloaded) are recorded with an 'error' instead of a timing.
+    With a reference transcript, each result also carries its word error rate.
+    """
+    supported = supported_compute_types(device)
+    if supported is not None:
+        skipped = [compute_type for compute_type in compute_types if compute_type not in supported]
+        if skipped:
+            logger.info(f"Skipping compute types not supported on this {device}: {', '.join(skipped)}")
+        compute_types = [compute_type for compute_type in compute_types if compute_type in supported]
+
+    results = []
+    for model_size, compute_type, cpu_threads in itertools.product(model_sizes, compute_types, thread_counts):
+        try:
+            result = benchmark_configuration(samples, model_size, compute_type, cpu_threads, device, language, repeats)
+        except Exception as e:
+            logger.warning(f"Could not benchmark {model_size}/{compute_type}/{cpu_threads} threads: {e}")
+            results.append({"model_size": model_size, "compute_type": compute_type, "device": device,
+                            "cpu_threads": cpu_threads, "error": str(e)})
+            continue
+        if reference is not None:
+            result["wer"] = word_error_rate(reference, result["text"])
+        logger.info(f"{model_size}/{compute_type}/{cpu_threads} threads: RTF {result['rtf']:.3f}"
+                    + (f", WER {result['wer']:.3f}" if "wer" in result else ""))
+        results.append(result)
+    return results
+
+
+def select_best(results, max_rtf=None, max_wer=None):
+    """Returns the fastest result that meets the speed and accuracy targets, or None."""
+    qualifying = [
+        result for result in results
+        if "error" not in result
+        and (max_rtf is None or result["rtf"] <= max_rtf)
+        and (max_wer is None or "wer" not in result or result["wer"] <= max_wer)
+    ]
+    return min(qualifying, key=lambda result: result["rtf"]) if qualifying else None
+
+
+def _read_profile(path):
+    try:
+        with open(path, "r") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {"version": PROFILE_VERSION, "hosts": {}}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable tuning profile '{path}': {e}")
+        return {"version": PROFILE_VERSION, "hosts": {}}
+    profile.setdefault("hosts", {})
+    return profile
+
+
+def save_profile(path, result, host=None):
+    """Stores a tuning result as the settings for this host class, keeping other hosts' entries."""
+    host = host or host_key()
+    profile = _read_profile(path)
+    entry = {key: result[key] for key in ("model_size", "compute_type", "device", "cpu_threads", "rtf")}
+    if "wer" in result:
+        entry["wer"] = result["wer"]
+    entry["cpu_flags"] = sorted(flag for flag in cpu_flags() if flag.startswith(("avx", "fma", "neon", "asimd")))
+    entry["tuned_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    profile["hosts"][host] = entry
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(temp_path, path)
+    return entry
+
+
+def load_profile(path, host=None):
+    """Returns the tuned settings for this host class, or None if it has not been tuned."""
+    if not path or not os.path.exists(path):
+        return None
+    return _read_profile(path)["hosts"].get(host or host_key())
+
+
+def resolve_whisper_settings(model_size=None, compute_type=None, device=None, cpu_threads=0, workers=1,
+                             profile_path=DEFAULT_PROFILE_PATH):
+    """
+    Returns faster-whisper settings as a dictionary with model_size,
+    compute_type, device and cpu_threads. Explicit values win, then the tuned
+    profile for this host, then the built-in defaults. The tuned thread count
+    is only used with a single worker, since it was measured for one process.
+    """
+    tuned = load_profile(profile_path) or {}
+    if tuned:
+        logger.info(f"Using tuned faster-whisper settings for {host_key()} from '{profile_path}'.")
+    if not cpu_threads and workers == 1:
+        cpu_threads = tuned.get("cpu_threads", 0)
+    whisper = get_engine("faster-whisper")
+    return {
+        "model_size": model_size or tuned.get("model_size", whisper.DEFAULT_WHISPER_MODEL_SIZE),
+        "compute_type": compute_type or tuned.get("compute_type", whisper.WHISPER_COMPUTE_TYPE),
+        "device": device or tuned.get("device", whisper.WHISPER_DEVICE),
+        "cpu_threads": cpu_threads,
+    }
@@ -0,0 +1,89 @@
+import logging
+import math
+
+from faster_whisper import WhisperModel
+
+from pcm import pcm_to_float32, resample
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WHISPER_MODEL_SIZE = "small"
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_DEVICE = "cpu"
+WHISPER_BEAM_SIZE = 5
+
+FASTER_WHISPER_MODEL = None
+# Whisper's codes for languages whose ISO 639-1 or legacy Google code differs
+WHISPER_LANGUAGE_ALIASES = {"iw": "he", "in": "id", "jv": "jw", "nb": "no", "fil": "tl"}
+
+
+def load_model(model_size=DEFAULT_WHISPER_MODEL_SIZE, cpu_threads=0, compute_type=WHISPER_COMPUTE_TYPE, device=WHISPER_DEVICE):
+    """Loads the process-wide model on first use; later calls return it whatever their arguments."""
+    global FASTER_WHISPER_MODEL
+    if FASTER_WHISPER_MODEL is None:
+        # You can specify a model size like "tiny", "base", "small", "medium", "large"
+        # or a specific model path.
+        # The first time you run this, it will download the model.
+        # cpu_threads=0 lets CTranslate2 pick the thread count itself.
+        FASTER_WHISPER_MODEL = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        logger.info(f"Faster Whisper model '{model_size}' loaded ({device}, {compute_type}).")
+    return FASTER_WHISPER_MODEL
+
+
+def _segment_dict(segment):
+    """Converts a faster-whisper segment to plain data; times are relative to the chunk start."""
+    result = {
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text.strip(),
+        # Mean token probability of the segment, from its average log probability
+        "confidence": round(math.exp(segment.avg_logprob), 4),
+    }
+    if segment.words:
+        result["words"] = [
+            {"start": word.start, "end": word.end, "word": word.word.strip(), "probability": round(word.probability, 4)}
+            for word in segment.words
+        ]
+    return result
+
+
+def transcribe(pcm, audio_format, language, word_timestamps=False, **whisper_options):
+    """
+    Transcribes one chunk and returns {"text": ..., "segments": [...]}.
+    whisper_options are load_model arguments, used if no model is loaded yet.
+    """
+    sample_rate, sample_width, channels = audio_format
+    model = load_model(**whisper_options)
+    samples = resample(pcm_to_float32(pcm, sample_width, channels), sample_rate)
+    decode_options = {"word_timestamps": True} if word_timestamps else {}
+    segments, info = model.transcribe(samples, beam_size=WHISPER_BEAM_SIZE, language=language, **decode_options)
+    segments = [_segment_dict(segment) for segment in segments]
+    return {"text": " ".join(segment["text"] for segment in segments), "segments": segments}
+
+
+def normalize_language(language):
+    """Maps a BCP-47 tag such as 'id-ID' or 'en_US' to the code Whisper expects ('id', 'en')."""
+    code = language.replace("_", "-").split("-")[0].lower()
+    return WHISPER_LANGUAGE_ALIASES.get(code, code)
+
+
+def detect_language(pcm, audio_format, **whisper_options):
+    """
+    Returns (language, probability) for the speech in pcm. faster-whisper
+    detects the language before decoding, and the segments are never
+    consumed, so this costs one pass of the encoder over the first 30 seconds.
+    """
+    sample_rate, sample_width, channels = audio_format
+    model = load_model(**whisper_options)
+    samples = resample(pcm_to_float32(pcm, sample_width, channels), sample_rate)
+    _, info = model.transcribe(samples, beam_size=WHISPER_BEAM_SIZE)
+    return info.language, info.language_probability
+
+
+def cache_settings(model_size=DEFAULT_WHISPER_MODEL_SIZE, compute_type=WHISPER_COMPUTE_TYPE, device=WHISPER_DEVICE, cpu_threads=0,
+                   word_timestamps=False):
+    # The thread count changes speed, not the text
+    settings = {"model": model_size, "compute_type": compute_type, "device": device, "beam_size": WHISPER_BEAM_SIZE}
+    if word_timestamps:
+        settings["word_timestamps"] = True
+    return settings